@@ -19,6 +19,35 @@ const QueueDisplay = ({ departmentId }) => {
   }, []);
 
   useEffect(() => {
+    const applyQueueData = (result) => {
+      if (result.success) {
+        setDepartmentName(result.departmentName);
+        setCurrentPatient(result.current);
+        setWaitingPatients(result.waiting);
+        setError('');
+      } else {
+        setError(result.error || 'Unknown error');
+      }
+      setLoading(false);
+    };
+
+    // Push: the server sends the queue whenever it changes
+    if (typeof EventSource !== 'undefined') {
+      const source = new EventSource(
+        `http://localhost:5000/api/queue/display/${departmentId}/stream`
+      );
+      source.onmessage = (event) => applyQueueData(JSON.parse(event.data));
+      source.onerror = () => {
+        // EventSource reconnects by itself; only report while it is down
+        if (source.readyState !== EventSource.OPEN) {
+          setError('Connection error');
+          setLoading(false);
+        }
+      };
+      return () => source.close();
+    }
+
+    // Fallback for browsers without EventSource: poll
     const fetchQueueData = async () => {
       try {
         const response = await fetch(
@@ -29,20 +58,10 @@ const QueueDisplay = ({ departmentId }) => {
           throw new Error('Failed to fetch queue data');
         }
 
-        const result = await response.json();
-        
-        if (result.success) {
-          setDepartmentName(result.departmentName);
-          setCurrentPatient(result.current);
-          setWaitingPatients(result.waiting);
-          setError('');
-        } else {
-          setError(result.error || 'Unknown error');
-        }
+        applyQueueData(await response.json());
       } catch (err) {
         console.error('Queue fetch error:', err);
         setError('Connection error');
-      } finally {
         setLoading(false);
       }
     };
@@ -186,7 +205,7 @@ const QueueDisplay = ({ departmentId }) => {
 
       <div className="queue-refresh-indicator">
         <div className="queue-refresh-dot"></div>
-        Auto-refreshing
+        Live
       </div>
     </div>
   );
@@ -0,0 +1,212 @@
+"""
+CliCare Testing - Statistical Regression Detector
+Compares per-request latency between stored runs (results_store) endpoint by
+endpoint, so a slowdown that still sits under the fixed PASS/FAIL targets is
+caught.
+
+For each (suite, stage, endpoint):
+  - Bootstrap CIs for the candidate/baseline ratio of p50 and p95 latency
+    (resampling done as one index matrix per batch in NumPy)
+  - One-sided Mann-Whitney U test (candidate slower than baseline),
+    Holm-corrected across endpoints
+
+An endpoint is flagged when the corrected p-value is below --alpha AND the
+lower CI bound of the p50 or p95 ratio exceeds 1 + --min-effect.
+Exits 1 when any regression is flagged, 2 when there is nothing to compare.
+
+Usage:
+  python compare_runs.py --suite healthcare_interface --last 5
+  python compare_runs.py --baseline RUN_A RUN_B --candidate RUN_C
+"""
+
+import argparse
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+from confidence import bootstrap_percentiles
+from results_store import load_samples, list_runs
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+N_BOOTSTRAP = 10000
+CONFIDENCE = 0.95
+ALPHA = 0.01
+MIN_EFFECT = 0.10              # ignore slowdowns smaller than 10% even if significant
+MIN_SAMPLES = 8                # per side, per endpoint
+RANDOM_SEED = 42
+
+# ============================================================================
+# STATISTICS
+# ============================================================================
+
+def ratio_ci(baseline, candidate, percentiles=(50, 95), n_boot=N_BOOTSTRAP, confidence=CONFIDENCE, rng=None):
+    """Point estimate and percentile-bootstrap CI of candidate/baseline for each percentile"""
+    rng = rng or np.random.default_rng(RANDOM_SEED)
+    base_boot = bootstrap_percentiles(baseline, percentiles, n_boot, rng)
+    cand_boot = bootstrap_percentiles(candidate, percentiles, n_boot, rng)
+    ratios = cand_boot / np.where(base_boot == 0, np.nan, base_boot)
+
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.nanpercentile(ratios, [tail, 100 - tail], axis=0)
+    point = np.percentile(candidate, percentiles) / np.percentile(baseline, percentiles)
+    return point, low, high
+
+def mann_whitney_greater(baseline, candidate):
+    """
+    One-sided Mann-Whitney U (H1: candidate tends to be larger)
+    Normal approximation with tie correction and continuity correction
+    Returns (U statistic of the candidate sample, p-value)
+    """
+    baseline = np.asarray(baseline, dtype=float)
+    candidate = np.asarray(candidate, dtype=float)
+    n1, n2 = candidate.size, baseline.size
+    combined = np.concatenate([candidate, baseline])
+
+    # Average ranks for ties
+    ranks = pd.Series(combined).rank(method='average').to_numpy()
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+
+    _, tie_counts = np.unique(combined, return_counts=True)
+    n = n1 + n2
+    tie_term = ((tie_counts ** 3) - tie_counts).sum() / (n * (n - 1))
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return u, 1.0
+
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    p_value = 0.5 * math.erfc(z / math.sqrt(2))
+    return u, p_value
+
+def holm_adjust(p_values):
+    """Holm-Bonferroni adjusted p-values (same order as input)"""
+    p_values = np.asarray(p_values, dtype=float)
+    m = p_values.size
+    order = np.argsort(p_values)
+    adjusted = np.empty(m)
+    running_max = 0.0
+    for rank, idx in enumerate(order):
+        running_max = max(running_max, (m - rank) * p_values[idx])
+        adjusted[idx] = min(1.0, running_max)
+    return adjusted
+
+# ============================================================================
+# COMPARISON
+# ============================================================================
+
+def load_latencies(run_ids, suite=None):
+    """Per-request latency samples for the given runs"""
+    df = load_samples(suite, columns=['run_id', 'suite', 'stage', 'endpoint', 'success', 'latency_ms'])
+    df = df[df['run_id'].isin(run_ids) & df['latency_ms'].notna()].copy()
+    df['endpoint'] = df['endpoint'].fillna('-')
+    return df
+
+def compare_runs(baseline_runs, candidate_runs, suite=None, alpha=ALPHA, min_effect=MIN_EFFECT,
+                 n_boot=N_BOOTSTRAP, confidence=CONFIDENCE):
+    """One row per endpoint with CIs, p-values and a regression flag"""
+    df = load_latencies(list(baseline_runs) + list(candidate_runs), suite)
+    df['side'] = np.where(df['run_id'].isin(candidate_runs), 'candidate', 'baseline')
+    rng = np.random.default_rng(RANDOM_SEED)
+
+    rows = []
+    for (suite_name, stage, endpoint), group in df.groupby(['suite', 'stage', 'endpoint']):
+        baseline = group.loc[group['side'] == 'baseline', 'latency_ms'].to_numpy()
+        candidate = group.loc[group['side'] == 'candidate', 'latency_ms'].to_numpy()
+        if baseline.size < MIN_SAMPLES or candidate.size < MIN_SAMPLES:
+            continue
+
+        point, low, high = ratio_ci(baseline, candidate, (50, 95), n_boot, confidence, rng)
+        _, p_value = mann_whitney_greater(baseline, candidate)
+
+        rows.append({
+            'suite': suite_name,
+            'stage': stage,
+            'endpoint': endpoint,
+            'baseline_n': baseline.size,
+            'candidate_n': candidate.size,
+            'baseline_p50_ms': np.percentile(baseline, 50),
+            'candidate_p50_ms': np.percentile(candidate, 50),
+            'baseline_p95_ms': np.percentile(baseline, 95),
+            'candidate_p95_ms': np.percentile(candidate, 95),
+            'p50_ratio': point[0], 'p50_ratio_low': low[0], 'p50_ratio_high': high[0],
+            'p95_ratio': point[1], 'p95_ratio_low': low[1], 'p95_ratio_high': high[1],
+            'p_value': p_value
+        })
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+
+    results['p_value_holm'] = holm_adjust(results['p_value'])
+    effect_floor = 1 + min_effect
+    results['regression'] = (results['p_value_holm'] < alpha) & (
+        (results['p50_ratio_low'] > effect_floor) | (results['p95_ratio_low'] > effect_floor)
+    )
+    return results
+
+def resolve_last_runs(suite, last):
+    """Latest run as candidate, the `last` runs before it as baseline"""
+    runs = list_runs(suite)
+    if suite is None or len(runs) < 2:
+        return [], []
+    run_ids = runs['run_id'].tolist()
+    return run_ids[-(last + 1):-1], run_ids[-1:]
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect latency regressions between stored harness runs")
+    parser.add_argument('--suite', help="Suite name, e.g. healthcare_interface")
+    parser.add_argument('--baseline', nargs='+', help="Baseline run ids")
+    parser.add_argument('--candidate', nargs='+', help="Candidate run ids")
+    parser.add_argument('--last', type=int, default=5, help="With --suite only: compare latest run against the N before it")
+    parser.add_argument('--alpha', type=float, default=ALPHA)
+    parser.add_argument('--min-effect', type=float, default=MIN_EFFECT)
+    parser.add_argument('--bootstrap', type=int, default=N_BOOTSTRAP)
+    parser.add_argument('--output', help="Optional CSV path for the full comparison table")
+    args = parser.parse_args(argv)
+
+    if args.baseline and args.candidate:
+        baseline_runs, candidate_runs = args.baseline, args.candidate
+    else:
+        baseline_runs, candidate_runs = resolve_last_runs(args.suite, args.last)
+
+    if not baseline_runs or not candidate_runs:
+        print("❌ Need baseline and candidate runs (--baseline/--candidate, or --suite with at least two stored runs)")
+        return 2
+
+    print(f"🔬 Baseline: {', '.join(baseline_runs)}")
+    print(f"🔬 Candidate: {', '.join(candidate_runs)}")
+
+    results = compare_runs(baseline_runs, candidate_runs, args.suite, args.alpha, args.min_effect, args.bootstrap)
+    if results.empty:
+        print(f"❌ No endpoint has at least {MIN_SAMPLES} latency samples on both sides")
+        return 2
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+    print(f"\n{'ENDPOINT':<40} {'p50 ratio (CI)':<24} {'p95 ratio (CI)':<24} {'p (Holm)':<10} RESULT")
+    for _, row in results.iterrows():
+        label = f"{row['stage']} {row['endpoint']}"[:39]
+        p50 = f"{row['p50_ratio']:.2f} ({row['p50_ratio_low']:.2f}-{row['p50_ratio_high']:.2f})"
+        p95 = f"{row['p95_ratio']:.2f} ({row['p95_ratio_low']:.2f}-{row['p95_ratio_high']:.2f})"
+        status = '🚨 REGRESSION' if row['regression'] else '✅ OK'
+        print(f"{label:<40} {p50:<24} {p95:<24} {row['p_value_holm']:<10.4f} {status}")
+
+    regressions = int(results['regression'].sum())
+    if regressions:
+        print(f"\n🚨 {regressions} endpoint(s) regressed (alpha={args.alpha}, min effect={args.min_effect:.0%})")
+        return 1
+
+    print(f"\n✅ No significant latency regressions across {len(results)} endpoint(s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
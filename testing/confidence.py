@@ -0,0 +1,197 @@
+"""
+CliCare Testing - Shared Confidence Interval Metrics
+Wilson and bootstrap confidence intervals for the success-rate metrics
+(WPRSR, HKRCR, QRCVA, LRGSR, PHRA, DUSR, FFCR, QRA, PAVR, ...) and for
+latency percentiles, so 25-50 trial point percentages are reported with
+their uncertainty.
+
+All bootstrap work is batched in NumPy:
+  - rates resample as one Binomial(n, p_hat) matrix covering every metric
+    (identical in distribution to resampling the 0/1 outcomes)
+  - percentiles / means / macro scores resample as index matrices,
+    built in batches capped at MAX_MATRIX_CELLS
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CONFIDENCE = 0.95
+N_BOOTSTRAP = 10000
+MAX_MATRIX_CELLS = 5_000_000   # resample matrices are built in batches under this size
+RANDOM_SEED = 42               # fixed so identical results give identical summaries
+
+# ============================================================================
+# CORE INTERVALS
+# ============================================================================
+
+def _z_score(confidence):
+    """Two-sided normal quantile without requiring SciPy"""
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+def _tails(confidence):
+    """Lower/upper percentile cut points for a two-sided interval"""
+    tail = (1 - confidence) / 2 * 100
+    return [tail, 100 - tail]
+
+def wilson_interval(successes, totals, confidence=CONFIDENCE):
+    """Wilson score interval in percent; works element-wise on arrays"""
+    successes = np.asarray(successes, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    z = _z_score(confidence)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = successes / totals
+        denom = 1 + z ** 2 / totals
+        centre = (p + z ** 2 / (2 * totals)) / denom
+        margin = z * np.sqrt(p * (1 - p) / totals + z ** 2 / (4 * totals ** 2)) / denom
+    low = np.where(totals > 0, np.clip(centre - margin, 0, 1) * 100, np.nan)
+    high = np.where(totals > 0, np.clip(centre + margin, 0, 1) * 100, np.nan)
+    return low, high
+
+def bootstrap_rate_intervals(successes, totals, n_boot=N_BOOTSTRAP, confidence=CONFIDENCE, rng=None):
+    """Percentile-bootstrap intervals in percent for many rates in one Binomial draw"""
+    rng = rng or np.random.default_rng(RANDOM_SEED)
+    successes = np.asarray(successes, dtype=float)
+    totals = np.asarray(totals, dtype=np.int64)
+    safe_totals = np.maximum(totals, 1)
+    p_hat = np.clip(successes / safe_totals, 0, 1)
+
+    draws = rng.binomial(safe_totals[:, None], p_hat[:, None], size=(totals.size, n_boot))
+    low, high = np.percentile(draws / safe_totals[:, None] * 100, _tails(confidence), axis=1)
+    return np.where(totals > 0, low, np.nan), np.where(totals > 0, high, np.nan)
+
+def _resample_batches(n, n_boot, rng):
+    """Yield (start, stop, index matrix) batches covering n_boot resamples of size n"""
+    batch = max(1, min(n_boot, MAX_MATRIX_CELLS // max(n, 1)))
+    for start in range(0, n_boot, batch):
+        stop = min(start + batch, n_boot)
+        yield start, stop, rng.integers(0, n, size=(stop - start, n))
+
+def bootstrap_percentiles(values, percentiles, n_boot=N_BOOTSTRAP, rng=None):
+    """Bootstrap distribution of percentiles, shape (n_boot, len(percentiles))"""
+    rng = rng or np.random.default_rng(RANDOM_SEED)
+    values = np.asarray(values, dtype=float)
+    out = np.empty((n_boot, len(percentiles)))
+    for start, stop, idx in _resample_batches(values.size, n_boot, rng):
+        out[start:stop] = np.percentile(values[idx], percentiles, axis=1).T
+    return out
+
+def bootstrap_means(values, n_boot=N_BOOTSTRAP, rng=None):
+    """Bootstrap distribution of the mean, shape (n_boot,)"""
+    rng = rng or np.random.default_rng(RANDOM_SEED)
+    values = np.asarray(values, dtype=float)
+    out = np.empty(n_boot)
+    for start, stop, idx in _resample_batches(values.size, n_boot, rng):
+        out[start:stop] = values[idx].mean(axis=1)
+    return out
+
+def bootstrap_macro_scores(y_true, y_pred, labels, n_boot=N_BOOTSTRAP, rng=None):
+    """
+    Bootstrap distribution of macro precision / recall / F1 (percent), shape (n_boot, 3)
+    Matches the per-label definition used in the reports: labels are those seen
+    in the (resampled) truth or predictions, and a label with no predictions
+    (or no true cases) scores 0 but still counts in the average
+    """
+    rng = rng or np.random.default_rng(RANDOM_SEED)
+    code = {label: i for i, label in enumerate(labels)}
+    t = np.array([code[v] for v in y_true])
+    p = np.array([code[v] for v in y_pred])
+    k = len(labels)
+
+    out = np.empty((n_boot, 3))
+    for start, stop, idx in _resample_batches(t.size, n_boot, rng):
+        rows = stop - start
+        tt, pp = t[idx], p[idx]
+        offsets = (np.arange(rows) * k)[:, None]
+        # One bincount per quantity over all resamples, offset so each row gets its own k bins
+        tp = np.bincount((offsets + tt)[tt == pp], minlength=rows * k).reshape(rows, k)
+        predicted = np.bincount((offsets + pp).ravel(), minlength=rows * k).reshape(rows, k)
+        actual = np.bincount((offsets + tt).ravel(), minlength=rows * k).reshape(rows, k)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(predicted > 0, tp / predicted * 100, 0)
+            recall = np.where(actual > 0, tp / actual * 100, 0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0)
+        present = (predicted + actual) > 0
+        n_present = present.sum(axis=1)
+        out[start:stop] = np.column_stack([(score * present).sum(axis=1) / n_present
+                                           for score in (precision, recall, f1)])
+    return out
+
+# ============================================================================
+# EXECUTIVE SUMMARY BLOCK
+# ============================================================================
+
+def _interval(low, high):
+    """[low, high] rounded for JSON, with NaN as null"""
+    return [None if np.isnan(low) else round(float(low), 2), None if np.isnan(high) else round(float(high), 2)]
+
+def summary_intervals(rates=None, latencies=None, means=None, percentiles=(50, 95),
+                      confidence=CONFIDENCE, n_boot=N_BOOTSTRAP):
+    """
+    Confidence interval block for an executive summary JSON
+      rates:     {name: (successes, total)}      -> Wilson + bootstrap, percent
+      latencies: {name: [values_ms]}             -> bootstrap CI per percentile
+      means:     {name: [values]}                -> bootstrap CI of the mean
+    """
+    rng = np.random.default_rng(RANDOM_SEED)
+    block = {'confidence': confidence, 'bootstrap_resamples': n_boot}
+
+    if rates:
+        names = list(rates)
+        successes = np.array([rates[n][0] for n in names], dtype=float)
+        totals = np.array([rates[n][1] for n in names], dtype=float)
+        wilson_low, wilson_high = wilson_interval(successes, totals, confidence)
+        boot_low, boot_high = bootstrap_rate_intervals(successes, totals, n_boot, confidence, rng)
+        block['rates'] = {
+            name: {
+                'value': round(float(successes[i] / totals[i] * 100), 2) if totals[i] else None,
+                'successes': int(successes[i]),
+                'total': int(totals[i]),
+                'wilson': _interval(wilson_low[i], wilson_high[i]),
+                'bootstrap': _interval(boot_low[i], boot_high[i])
+            }
+            for i, name in enumerate(names)
+        }
+
+    if latencies:
+        block['latency_ms'] = {}
+        for name, values in latencies.items():
+            values = np.asarray([v for v in values if v is not None], dtype=float)
+            values = values[~np.isnan(values)]
+            if values.size == 0:
+                continue
+            boot = bootstrap_percentiles(values, percentiles, n_boot, rng)
+            lows, highs = np.percentile(boot, _tails(confidence), axis=0)
+            point = np.percentile(values, percentiles)
+            block['latency_ms'][name] = {'n': int(values.size)}
+            for j, pct in enumerate(percentiles):
+                block['latency_ms'][name][f"p{pct}"] = {
+                    'value': round(float(point[j]), 2),
+                    'ci': _interval(lows[j], highs[j])
+                }
+
+    if means:
+        block['means'] = {}
+        for name, values in means.items():
+            values = np.asarray(values, dtype=float)
+            if values.size == 0:
+                continue
+            low, high = np.percentile(bootstrap_means(values, n_boot, rng), _tails(confidence))
+            block['means'][name] = {'value': round(float(values.mean()), 2), 'n': int(values.size),
+                                    'ci': _interval(low, high)}
+
+    return block
+
+def macro_score_intervals(y_true, y_pred, labels, confidence=CONFIDENCE, n_boot=N_BOOTSTRAP):
+    """Bootstrap CIs for macro precision / recall / F1, for the department summary"""
+    if len(y_true) == 0:
+        return {}
+    boot = bootstrap_macro_scores(y_true, y_pred, labels, n_boot, np.random.default_rng(RANDOM_SEED))
+    lows, highs = np.percentile(boot, _tails(confidence), axis=0)
+    return {name: {'ci': _interval(lows[i], highs[i])} for i, name in enumerate(['precision', 'recall', 'f1_score'])}
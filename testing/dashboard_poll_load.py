@@ -0,0 +1,167 @@
+"""
+CliCare Testing - Dashboard Poller Load Scenario
+200 dashboards polling /api/admin/dashboard-stats (and
+/api/healthcare/dashboard-stats when a staff token is given) at the same
+time, run twice:
+
+  uncached  every poll sends ?cache=off, so every request runs the queries
+  cached    the short-TTL single-flight cache in server.js: one request per
+            key and TTL reaches Supabase, the rest are hits or coalesced
+
+Database load is the sum of the X-Supabase-Calls header over all polls, so
+start the server with call tracing and a rate limit that lets the pollers
+through:
+
+  SUPABASE_CALL_TRACE=1 RATE_LIMIT_MAX=100000 node server.js
+  python dashboard_poll_load.py [--pollers 200] [--duration 30] [--interval 1]
+Needs CLICARE_ADMIN_TOKEN (and optionally CLICARE_STAFF_TOKEN).
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import requests
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_BASE = "http://localhost:5000"
+OUTPUT_DIR = "dashboard_poll_results"
+
+POLLERS = 200                # simultaneous dashboards
+DURATION_SECONDS = 30        # per phase
+POLL_INTERVAL_SECONDS = 1.0  # pause between one dashboard's polls
+STAFF_SHARE = 0.5            # share of pollers on the healthcare dashboard when a staff token is given
+PHASES = [('uncached', {'cache': 'off'}), ('cached', {})]
+
+# ============================================================================
+# POLLING
+# ============================================================================
+
+def poll_dashboard(endpoint, token, params, stop_at, interval, rows):
+    """One dashboard: poll until stop_at, appending one row per request"""
+    session = requests.Session()
+    session.headers['Authorization'] = f'Bearer {token}'
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{API_BASE}/{endpoint}", params=params, timeout=30)
+            status = response.status_code
+            calls = response.headers.get('X-Supabase-Calls')
+            cache = response.headers.get('X-Cache', 'none')
+        except requests.exceptions.RequestException:
+            status, calls, cache = 'error', None, 'none'
+        rows.append({
+            'endpoint': endpoint,
+            'status': status,
+            'response_time_ms': (time.perf_counter() - start) * 1000,
+            'supabase_calls': int(calls) if calls is not None else None,
+            'cache': cache
+        })
+        time.sleep(interval)
+
+def run_phase(name, params, admin_token, staff_token, pollers, duration, interval):
+    """Start every poller at once and collect their requests"""
+    targets = [("api/admin/dashboard-stats", admin_token)]
+    if staff_token:
+        targets.append(("api/healthcare/dashboard-stats", staff_token))
+    n_staff = int(pollers * STAFF_SHARE) if staff_token else 0
+
+    rows = []  # list.append is atomic, so the threads share it without a lock
+    stop_at = time.monotonic() + duration
+    threads = []
+    for i in range(pollers):
+        endpoint, token = targets[1] if i < n_staff else targets[0]
+        threads.append(threading.Thread(target=poll_dashboard, daemon=True,
+                                        args=(endpoint, token, params, stop_at, interval, rows)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    df = pd.DataFrame(rows)
+    df.insert(0, 'phase', name)
+    return df
+
+def summarize(df, duration):
+    """Per phase and endpoint: throughput, latency, cache outcome and Supabase calls"""
+    summary = []
+    for (phase, endpoint), group in df.groupby(['phase', 'endpoint'], sort=False):
+        ok = group[group['status'] == 200]
+        latencies = ok['response_time_ms'].to_numpy(dtype=float)
+        p50, p95 = np.percentile(latencies, [50, 95]) if latencies.size else (np.nan, np.nan)
+        cache = Counter(group['cache'])
+        calls = group['supabase_calls'].dropna()
+        summary.append({
+            'phase': phase,
+            'endpoint': endpoint,
+            'requests': len(group),
+            'errors': int((group['status'] != 200).sum()),
+            'throughput_rps': round(len(group) / duration, 1),
+            'p50_ms': round(p50, 1),
+            'p95_ms': round(p95, 1),
+            'cache_miss': cache.get('miss', 0),
+            'cache_hit': cache.get('hit', 0),
+            'cache_coalesced': cache.get('coalesced', 0),
+            'supabase_calls': int(calls.sum()) if len(calls) else None,
+            'supabase_calls_per_request': round(calls.mean(), 3) if len(calls) else None
+        })
+    return pd.DataFrame(summary)
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dashboard-stats load with and without the short-TTL cache")
+    parser.add_argument('--pollers', type=int, default=POLLERS)
+    parser.add_argument('--duration', type=float, default=DURATION_SECONDS, help="Seconds per phase")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL_SECONDS)
+    parser.add_argument('--admin-token', default=os.environ.get('CLICARE_ADMIN_TOKEN'))
+    parser.add_argument('--staff-token', default=os.environ.get('CLICARE_STAFF_TOKEN'))
+    args = parser.parse_args(argv)
+
+    if not args.admin_token:
+        print("❌ An admin token is required (--admin-token or CLICARE_ADMIN_TOKEN)")
+        return 2
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    frames = []
+    for name, params in PHASES:
+        print(f"📊 {name}: {args.pollers} pollers for {args.duration:.0f}s...")
+        frames.append(run_phase(name, params, args.admin_token, args.staff_token,
+                                args.pollers, args.duration, args.interval))
+    df = pd.concat(frames, ignore_index=True)
+    summary = summarize(df, args.duration)
+
+    df.to_csv(f"{OUTPUT_DIR}/dashboard_poll_requests.csv", index=False)
+    summary.to_csv(f"{OUTPUT_DIR}/dashboard_poll_summary.csv", index=False)
+
+    print(f"\n{'PHASE':<9} {'ENDPOINT':<32} {'REQ':>6} {'ERR':>4} {'P50':>8} {'P95':>8} "
+          f"{'MISS':>5} {'HIT':>6} {'COAL':>5} {'DB CALLS':>9}")
+    for _, row in summary.iterrows():
+        calls = '-' if pd.isna(row['supabase_calls']) else int(row['supabase_calls'])
+        print(f"{row['phase']:<9} {row['endpoint']:<32} {row['requests']:>6} {row['errors']:>4} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['cache_miss']:>5} {row['cache_hit']:>6} "
+              f"{row['cache_coalesced']:>5} {calls:>9}")
+
+    totals = summary.groupby('phase')['supabase_calls'].sum(min_count=1)
+    if totals.notna().all() and totals.get('uncached'):
+        reduction = (1 - totals['cached'] / totals['uncached']) * 100
+        print(f"\n✅ Supabase calls: {int(totals['uncached'])} uncached → {int(totals['cached'])} cached "
+              f"({reduction:.1f}% less database load)")
+    else:
+        print("\n⚠️ No X-Supabase-Calls headers - restart the server with SUPABASE_CALL_TRACE=1 to measure database load")
+    print(f"✅ Results saved to {OUTPUT_DIR}/")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
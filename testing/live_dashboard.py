@@ -0,0 +1,219 @@
+"""
+CliCare Testing - Live Run Dashboard (Server-Sent Events)
+Streams rolling throughput, error rate and latency percentiles while a test
+run is in progress.
+
+  http://127.0.0.1:8765/          minimal HTML page
+  http://127.0.0.1:8765/events    SSE stream (one JSON snapshot per tick)
+  http://127.0.0.1:8765/snapshot  latest snapshot as JSON
+
+The request threads only append a tuple to a deque. A background thread
+drains it once per tick, aggregates the rolling window and publishes one
+pre-serialized snapshot that every SSE client receives, so watching a run
+does not slow it down.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import telemetry
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DASHBOARD_HOST = os.environ.get('CLICARE_DASHBOARD_HOST', '127.0.0.1')
+DASHBOARD_PORT = int(os.environ.get('CLICARE_DASHBOARD_PORT', '8765'))
+WINDOW_SECONDS = 60        # rolling window for throughput / error rate / percentiles
+TICK_SECONDS = 1.0         # aggregation and SSE push interval
+
+# ============================================================================
+# AGGREGATION (off the request path)
+# ============================================================================
+
+_inbox = deque()           # appended by request threads, drained by the aggregator only
+_window = deque()          # (timestamp, suite, endpoint, ok, latency_ms) inside WINDOW_SECONDS
+_totals = {'requests': 0, 'errors': 0}
+_snapshot = {'json': '{}', 'seq': 0}
+_published = threading.Condition()
+_started_at = time.monotonic()
+_running = False
+
+def _sink(suite, endpoint, status, latency_ms, worker):
+    """Request-path sink: one O(1) append, nothing else"""
+    _inbox.append((time.monotonic(), suite, endpoint, status, latency_ms))
+
+def _is_error(status):
+    return not (isinstance(status, int) and 200 <= status < 400)
+
+def _stats(rows, span):
+    """Throughput, error rate and percentiles for a list of window rows"""
+    latencies = np.array([r[4] for r in rows if r[4] is not None], dtype=float)
+    errors = sum(1 for r in rows if not r[3])
+    stats = {
+        'requests': len(rows),
+        'throughput_rps': round(len(rows) / span, 2) if span > 0 else 0.0,
+        'error_rate': round(errors / len(rows) * 100, 2) if rows else 0.0
+    }
+    if latencies.size:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        stats.update({'p50_ms': round(p50, 1), 'p95_ms': round(p95, 1), 'p99_ms': round(p99, 1)})
+    return stats
+
+def _aggregate_once():
+    """Drain the inbox, trim the window and publish a new snapshot"""
+    now = time.monotonic()
+
+    while _inbox:
+        ts, suite, endpoint, status, latency_ms = _inbox.popleft()
+        ok = not _is_error(status)
+        _totals['requests'] += 1
+        _totals['errors'] += 0 if ok else 1
+        _window.append((ts, suite, endpoint, ok, latency_ms))
+
+    cutoff = now - WINDOW_SECONDS
+    while _window and _window[0][0] < cutoff:
+        _window.popleft()
+
+    span = min(WINDOW_SECONDS, now - _started_at)
+    rows = list(_window)
+    by_endpoint = {}
+    for row in rows:
+        by_endpoint.setdefault((row[1], row[2]), []).append(row)
+
+    snapshot = {
+        'time': datetime.now().strftime('%H:%M:%S'),
+        'elapsed_s': round(now - _started_at, 1),
+        'window_s': WINDOW_SECONDS,
+        'totals': dict(_totals),
+        'overall': _stats(rows, span),
+        'endpoints': [
+            {'suite': suite, 'endpoint': endpoint, **_stats(endpoint_rows, span)}
+            for (suite, endpoint), endpoint_rows in sorted(by_endpoint.items())
+        ]
+    }
+
+    with _published:
+        _snapshot['json'] = json.dumps(snapshot)
+        _snapshot['seq'] += 1
+        _published.notify_all()
+
+def _aggregator_loop():
+    while _running:
+        _aggregate_once()
+        time.sleep(TICK_SECONDS)
+
+# ============================================================================
+# HTTP / SSE
+# ============================================================================
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>CliCare Test Run</title>
+<style>
+body { font-family: sans-serif; margin: 24px; color: #222; }
+.cards { display: flex; gap: 16px; margin-bottom: 20px; }
+.card { border: 1px solid #ddd; border-radius: 6px; padding: 12px 18px; min-width: 120px; }
+.card b { display: block; font-size: 1.6em; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border-bottom: 1px solid #eee; padding: 6px 10px; text-align: right; }
+th:nth-child(-n+2), td:nth-child(-n+2) { text-align: left; }
+.bad { color: #c0392b; }
+</style></head>
+<body>
+<h2>CliCare Test Run <small id="time"></small></h2>
+<div class="cards">
+  <div class="card">Throughput<b id="rps">-</b>req/s</div>
+  <div class="card">Error rate<b id="err">-</b>%</div>
+  <div class="card">p50<b id="p50">-</b>ms</div>
+  <div class="card">p95<b id="p95">-</b>ms</div>
+  <div class="card">Total<b id="total">-</b>requests</div>
+</div>
+<table><thead><tr><th>Suite</th><th>Endpoint</th><th>req/s</th><th>Errors %</th>
+<th>p50 ms</th><th>p95 ms</th><th>p99 ms</th><th>n</th></tr></thead><tbody id="rows"></tbody></table>
+<script>
+const fmt = v => (v === undefined ? '-' : v);
+new EventSource('/events').onmessage = (e) => {
+  const s = JSON.parse(e.data);
+  document.getElementById('time').textContent = s.time + ' (' + s.window_s + 's window)';
+  document.getElementById('rps').textContent = fmt(s.overall.throughput_rps);
+  document.getElementById('err').textContent = fmt(s.overall.error_rate);
+  document.getElementById('p50').textContent = fmt(s.overall.p50_ms);
+  document.getElementById('p95').textContent = fmt(s.overall.p95_ms);
+  document.getElementById('total').textContent = s.totals.requests;
+  document.getElementById('rows').innerHTML = s.endpoints.map(r =>
+    `<tr><td>${r.suite}</td><td>${r.endpoint}</td><td>${r.throughput_rps}</td>` +
+    `<td class="${r.error_rate > 0 ? 'bad' : ''}">${r.error_rate}</td>` +
+    `<td>${fmt(r.p50_ms)}</td><td>${fmt(r.p95_ms)}</td><td>${fmt(r.p99_ms)}</td><td>${r.requests}</td></tr>`
+  ).join('');
+};
+</script>
+</body></html>
+"""
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    """Serves the page, the SSE stream and the JSON snapshot"""
+
+    def log_message(self, format, *args):
+        pass  # keep the test output readable
+
+    def _send(self, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/':
+            self._send(DASHBOARD_HTML, 'text/html; charset=utf-8')
+        elif self.path == '/snapshot':
+            self._send(_snapshot['json'], 'application/json')
+        elif self.path == '/events':
+            self._stream_events()
+        else:
+            self.send_error(404)
+
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'keep-alive')
+        self.end_headers()
+
+        last_seq = -1
+        try:
+            while _running:
+                with _published:
+                    _published.wait_for(lambda: _snapshot['seq'] != last_seq, timeout=15)
+                    payload, last_seq = _snapshot['json'], _snapshot['seq']
+                self.wfile.write(f"data: {payload}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # browser tab closed
+
+def start_dashboard(host=DASHBOARD_HOST, port=DASHBOARD_PORT):
+    """Start the aggregator and HTTP server on daemon threads (idempotent)"""
+    global _running
+    if _running:
+        return
+    _running = True
+
+    telemetry.add_sink(_sink)
+    threading.Thread(target=_aggregator_loop, name='dashboard-aggregator', daemon=True).start()
+
+    try:
+        server = ThreadingHTTPServer((host, port), DashboardHandler)
+    except OSError as e:
+        print(f"⚠️ Live dashboard unavailable on {host}:{port}: {e}")
+        return
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='dashboard-http', daemon=True).start()
+    print(f"📡 Live dashboard: http://{host}:{port}/")
@@ -0,0 +1,226 @@
+"""
+CliCare Testing - Event-Loop Stall Probe
+Requests /api/health every 20ms on a background thread while any scenario
+runs. /api/health does no database work, so its latency above the quiet
+baseline is time the request waited for the server's event loop. Spikes
+are lined up with the background job runs the server records
+(/api/debug/background-jobs: cleanupExpiredRegistrations,
+cleanupUnusedQueueAndVisits, cleanupExpiredHealthAssessments,
+markInactiveStaffOffline, activateScheduledQueues) and the worst stall each
+job caused is reported.
+
+  python test1_registration.py --stall-probe     # alongside any test script
+  python run_all.py --stall-probe
+  python loop_stall_probe.py --duration 3600     # standalone, next to other load
+
+The report is written to loop_stall_results/ when the run ends. The job
+runs are admin-only, so set CLICARE_ADMIN_TOKEN.
+
+HealthProbe is the /api/health sampler itself; cleanup_soak.py and
+slow_upload_load.py run their own instances of it.
+"""
+
+import argparse
+import atexit
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_BASE = "http://localhost:5000"
+OUTPUT_DIR = "loop_stall_results"
+ADMIN_TOKEN = os.environ.get('CLICARE_ADMIN_TOKEN')
+
+PROBE_INTERVAL_SECONDS = 0.02
+STALL_THRESHOLD_MS = 50        # latency above the baseline median that counts as a stall
+JOB_MARGIN_MS = 250            # a stall this close to a job run is attributed to it
+
+# ============================================================================
+# PROBE
+# ============================================================================
+
+_state = {'probe': None, 'job_since': 0, 'clock_offset_ms': 0.0}
+
+class HealthProbe(threading.Thread):
+    """
+    Requests /api/health every `interval` seconds until stop()
+    Each sample records sent_at (epoch ms), latency_ms and status ('error' when
+    the request failed), the current `phase` if one is set, and whatever
+    `extra(response)` returns (response is None on failure)
+    """
+
+    def __init__(self, interval=PROBE_INTERVAL_SECONDS, extra=None):
+        super().__init__(name='health-probe', daemon=True)
+        self.interval = interval
+        self.extra = extra
+        self.phase = None
+        self.samples = []          # appended by the probe thread only
+        self.running = True
+
+    def run(self):
+        session = requests.Session()
+        while self.running:
+            phase = self.phase     # taken at send, so a stalled request counts for the phase it started in
+            sent = time.time() * 1000
+            start = time.perf_counter()
+            try:
+                response = session.get(f"{API_BASE}/api/health", timeout=30)
+                status = response.status_code
+            except requests.exceptions.RequestException:
+                response, status = None, 'error'
+            sample = {'sent_at': sent, 'latency_ms': (time.perf_counter() - start) * 1000, 'status': status}
+            if phase is not None:
+                sample['phase'] = phase
+            if self.extra:
+                sample.update(self.extra(response))
+            self.samples.append(sample)
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.join()
+
+def _job_runs(since=0):
+    """Server job runs after id `since` plus the server clock at the time of the call"""
+    sent = time.time() * 1000
+    response = requests.get(f"{API_BASE}/api/debug/background-jobs", params={'since': since},
+                            headers={'Authorization': f'Bearer {ADMIN_TOKEN}'}, timeout=15)
+    received = time.time() * 1000
+    if response.status_code != 200:
+        return None, None
+    body = response.json()
+    # Server clock minus local clock, assuming the reply was stamped halfway through the round trip
+    offset = body['server_time'] - (sent + received) / 2
+    return body, offset
+
+def start_probe():
+    """Start probing on a daemon thread and write the report at exit (idempotent)"""
+    if _state['probe']:
+        return
+    try:
+        body, offset = _job_runs(10 ** 12)
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Stall probe unavailable: {e}")
+        return
+    if body is None:
+        print("⚠️ Stall probe unavailable: /api/debug/background-jobs is missing or CLICARE_ADMIN_TOKEN "
+              "is not an admin token")
+        return
+
+    _state.update(probe=HealthProbe(), job_since=body['latest_id'], clock_offset_ms=offset)
+    _state['probe'].start()
+    atexit.register(stop_probe)
+    print(f"🩺 Event-loop stall probe: /api/health every {PROBE_INTERVAL_SECONDS * 1000:.0f}ms")
+
+def stop_probe():
+    """Stop probing, line spikes up with job runs and save the report"""
+    probe = _state['probe']
+    if not probe:
+        return None
+    _state['probe'] = None
+    probe.stop()
+
+    body, offset = _job_runs(_state['job_since'])
+    runs = pd.DataFrame(body['runs'] if body else [], columns=['id', 'job', 'started_at', 'duration_ms', 'ok'])
+    offset = _state['clock_offset_ms'] if offset is None else (offset + _state['clock_offset_ms']) / 2
+    samples = pd.DataFrame(probe.samples, columns=['sent_at', 'latency_ms', 'status'])
+    if samples.empty:
+        return None
+
+    stalls, jobs = analyse(samples, runs, offset)
+    save_report(samples, stalls, jobs, runs)
+    return jobs
+
+# ============================================================================
+# ANALYSIS
+# ============================================================================
+
+def analyse(samples, runs, clock_offset_ms=0.0):
+    """Stall intervals and the worst stall per job"""
+    samples = samples.copy()
+    samples['server_sent_at'] = samples['sent_at'] + clock_offset_ms
+    baseline = float(np.median(samples['latency_ms']))
+    samples['excess_ms'] = samples['latency_ms'] - baseline
+
+    stalls = samples[samples['excess_ms'] >= STALL_THRESHOLD_MS].copy()
+    stalls['job'] = None
+    runs = runs.copy()
+    runs['ended_at'] = runs['started_at'] + runs['duration_ms']
+
+    # A stall belongs to the job whose run overlaps the probe request (with a margin)
+    for i, stall in stalls.iterrows():
+        begin, end = stall['server_sent_at'], stall['server_sent_at'] + stall['latency_ms']
+        overlapping = runs[(runs['started_at'] - JOB_MARGIN_MS <= end) & (runs['ended_at'] + JOB_MARGIN_MS >= begin)]
+        if not overlapping.empty:
+            stalls.at[i, 'job'] = ','.join(sorted(set(overlapping['job'])))
+
+    rows = []
+    for job, job_runs in runs.groupby('job'):
+        job_stalls = stalls[stalls['job'].fillna('').str.split(',').apply(lambda jobs: job in jobs)]
+        rows.append({
+            'job': job,
+            'runs': len(job_runs),
+            'mean_run_ms': round(job_runs['duration_ms'].mean(), 1),
+            'max_run_ms': round(job_runs['duration_ms'].max(), 1),
+            'stalls': len(job_stalls),
+            'worst_stall_ms': round(job_stalls['excess_ms'].max(), 1) if len(job_stalls) else 0.0,
+            'total_stall_ms': round(job_stalls['excess_ms'].sum(), 1)
+        })
+    unattributed = stalls[stalls['job'].isna()]
+    rows.append({'job': '(no job running)', 'runs': None, 'mean_run_ms': None, 'max_run_ms': None,
+                 'stalls': len(unattributed),
+                 'worst_stall_ms': round(unattributed['excess_ms'].max(), 1) if len(unattributed) else 0.0,
+                 'total_stall_ms': round(unattributed['excess_ms'].sum(), 1)})
+
+    jobs = pd.DataFrame(rows).sort_values('worst_stall_ms', ascending=False)
+    jobs.insert(1, 'baseline_ms', round(baseline, 1))
+    return stalls, jobs
+
+def save_report(samples, stalls, jobs, runs):
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+    samples.to_csv(f"{OUTPUT_DIR}/health_probe_samples.csv", index=False)
+    stalls.to_csv(f"{OUTPUT_DIR}/stalls.csv", index=False)
+    runs.to_csv(f"{OUTPUT_DIR}/background_job_runs.csv", index=False)
+    jobs.to_csv(f"{OUTPUT_DIR}/stalls_by_job.csv", index=False)
+
+    latencies = samples['latency_ms'].to_numpy(dtype=float)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"\n🩺 Event-loop stall probe: {len(samples)} probes, p50 {p50:.1f}ms, p99 {p99:.1f}ms, "
+          f"max {latencies.max():.1f}ms, {len(stalls)} stalls ≥ {STALL_THRESHOLD_MS}ms over baseline")
+    print(f"  {'JOB':<34} {'RUNS':>5} {'MAX RUN':>10} {'STALLS':>7} {'WORST':>9}")
+    for _, row in jobs.iterrows():
+        runs_text = '-' if pd.isna(row['runs']) else int(row['runs'])
+        max_run = '-' if pd.isna(row['max_run_ms']) else f"{row['max_run_ms']:.0f}ms"
+        print(f"  {row['job']:<34} {runs_text:>5} {max_run:>10} {row['stalls']:>7} {row['worst_stall_ms']:>7.1f}ms")
+    print(f"  Saved to {OUTPUT_DIR}/")
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Probe the server event loop and attribute stalls to background jobs")
+    parser.add_argument('--duration', type=float, default=600, help="Seconds to probe")
+    args = parser.parse_args(argv)
+
+    start_probe()
+    if not _state['probe']:
+        return 2
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    stop_probe()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
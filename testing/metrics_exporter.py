@@ -0,0 +1,158 @@
+"""
+CliCare Testing - OpenMetrics Exporter
+Exposes the harness request counters and latency histograms at
+http://127.0.0.1:9108/metrics so the load generator can be scraped like a
+server. Series are labelled suite, endpoint, status and worker.
+
+Each request thread writes only to its own dictionary (no lock on the
+request path); a scrape merges every thread's dictionary into the text
+exposition.
+
+Enable with --metrics or CLICARE_METRICS=1 on any test script.
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import telemetry
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+METRICS_HOST = os.environ.get('CLICARE_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('CLICARE_METRICS_PORT', '9108'))
+METRIC_PREFIX = 'clicare_harness'
+# Latency histogram upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# ============================================================================
+# PER-THREAD COUNTERS
+# ============================================================================
+
+# Per series: [requests, observed latencies, latency sum (s), count per bucket..., count above last bucket]
+_COUNT, _OBSERVED, _SUM, _FIRST_BUCKET = 0, 1, 2, 3
+
+_local = threading.local()
+_thread_tables = []                 # every thread's table, appended once per thread
+_register_lock = threading.Lock()   # taken only the first time a thread records
+_running = False
+
+def _table():
+    """This thread's series table, registered on first use"""
+    table = getattr(_local, 'table', None)
+    if table is None:
+        table = _local.table = {}
+        with _register_lock:
+            _thread_tables.append(table)
+    return table
+
+def _sink(suite, endpoint, status, latency_ms, worker):
+    """Request-path sink: update this thread's own series without locking"""
+    table = _table()
+    key = (suite, endpoint, str(status), worker)
+    series = table.get(key)
+    if series is None:
+        series = table[key] = [0, 0, 0.0] + [0] * (len(BUCKETS) + 1)
+    series[_COUNT] += 1
+    if latency_ms is not None:
+        seconds = latency_ms / 1000
+        series[_OBSERVED] += 1
+        series[_SUM] += seconds
+        series[_FIRST_BUCKET + bisect_left(BUCKETS, seconds)] += 1
+
+# ============================================================================
+# SCRAPE
+# ============================================================================
+
+def _merged_series():
+    """Sum every thread's table; copies are taken so writers never block"""
+    with _register_lock:
+        tables = list(_thread_tables)
+    merged = {}
+    for table in tables:
+        for key, series in list(table.items()):
+            values = list(series)
+            total = merged.get(key)
+            if total is None:
+                merged[key] = values
+            else:
+                for i, value in enumerate(values):
+                    total[i] += value
+    return merged
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(key, extra=''):
+    suite, endpoint, status, worker = key
+    labels = (f'suite="{_escape(suite)}",endpoint="{_escape(endpoint)}",'
+              f'status="{_escape(status)}",worker="{_escape(worker)}"')
+    return '{' + labels + extra + '}'
+
+def render_openmetrics():
+    """Current counters and histograms in OpenMetrics text format"""
+    series = sorted(_merged_series().items())
+    requests_name = f'{METRIC_PREFIX}_requests'
+    duration_name = f'{METRIC_PREFIX}_request_duration_seconds'
+
+    lines = [f'# TYPE {requests_name} counter',
+             f'# HELP {requests_name} Requests issued by the test harness.']
+    for key, values in series:
+        lines.append(f'{requests_name}_total{_labels(key)} {values[_COUNT]}')
+
+    lines += [f'# TYPE {duration_name} histogram',
+              f'# UNIT {duration_name} seconds',
+              f'# HELP {duration_name} Client-side request latency.']
+    for key, values in series:
+        if not values[_OBSERVED]:
+            continue
+        cumulative = 0
+        for i, bound in enumerate(BUCKETS):
+            cumulative += values[_FIRST_BUCKET + i]
+            le = ',le="%s"' % bound
+            lines.append(f'{duration_name}_bucket{_labels(key, le)} {cumulative}')
+        le = ',le="+Inf"'
+        lines.append(f'{duration_name}_bucket{_labels(key, le)} {values[_OBSERVED]}')
+        lines.append(f'{duration_name}_count{_labels(key)} {values[_OBSERVED]}')
+        lines.append(f'{duration_name}_sum{_labels(key)} {values[_SUM]:.6f}')
+
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves /metrics for the scraper"""
+
+    def log_message(self, format, *args):
+        pass  # keep the test output readable
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_openmetrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_exporter(host=METRICS_HOST, port=METRICS_PORT):
+    """Register the sink and serve /metrics on a daemon thread (idempotent)"""
+    global _running
+    if _running:
+        return
+    _running = True
+
+    telemetry.add_sink(_sink)
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Metrics exporter unavailable on {host}:{port}: {e}")
+        return
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    print(f"📈 OpenMetrics endpoint: http://{host}:{port}/metrics")
@@ -0,0 +1,94 @@
+"""
+CliCare Testing - Shared Figure Rendering Stage
+Defers matplotlib imports until a figure is actually drawn, forces the
+headless Agg backend, and renders each figure in a process pool. Workers are
+started with forkserver (spawn where it is unavailable), never fork: run_all
+calls render_figures from several stage threads at once, and forking a
+multithreaded process can leave a child holding another thread's lock.
+
+Pass --no-plots (or set CLICARE_NO_PLOTS=1) to any test script to skip
+figure rendering entirely.
+"""
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+PLOTS_ENABLED = '--no-plots' not in sys.argv and os.environ.get('CLICARE_NO_PLOTS') != '1'
+MAX_PLOT_WORKERS = int(os.environ.get('CLICARE_PLOT_WORKERS', '0')) or None  # None = one per figure, capped at CPU count
+
+# ============================================================================
+# LAZY IMPORTS
+# ============================================================================
+
+def pyplot():
+    """Import matplotlib.pyplot on first use with the headless Agg backend"""
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+# ============================================================================
+# RENDERING STAGE
+# ============================================================================
+
+def _pool_context():
+    """Start method for the rendering pool: forkserver where available, otherwise spawn"""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+def figure_job(func, *args, **kwargs):
+    """Describe one figure to render: a module-level plotting function and its arguments"""
+    return (func, args, kwargs)
+
+def _render_job(func, args, kwargs):
+    """Worker entry point - runs a single plotting function"""
+    pyplot()
+    func(*args, **kwargs)
+    return func.__name__
+
+def render_figures(jobs, max_workers=None):
+    """
+    Render figure jobs in a process pool and return the jobs that succeeded
+    Failures are reported per figure and never abort the test run
+    """
+    jobs = [job for job in jobs if job is not None]
+
+    if not jobs:
+        return []
+
+    if not PLOTS_ENABLED:
+        print(f"⏭️  Skipping {len(jobs)} figure(s) (--no-plots)")
+        return []
+
+    workers = max_workers or MAX_PLOT_WORKERS or min(len(jobs), os.cpu_count() or 1)
+    rendered = []
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            futures = {pool.submit(_render_job, *job): job for job in jobs}
+
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    rendered.append(futures[future])
+                except Exception as e:
+                    print(f"⚠️ Visualization generation failed ({futures[future][0].__name__}): {e}")
+    except Exception as e:
+        # Pool could not start (e.g. restricted environment) - fall back to in-process rendering
+        print(f"⚠️ Process pool unavailable ({e}), rendering figures serially")
+        rendered = []
+        for job in jobs:
+            try:
+                _render_job(*job)
+                rendered.append(job)
+            except Exception as job_error:
+                print(f"⚠️ Visualization generation failed ({job[0].__name__}): {job_error}")
+
+    return rendered
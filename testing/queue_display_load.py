@@ -0,0 +1,225 @@
+"""
+CliCare Testing - Queue Display Polling vs Push
+Simulates wall-mounted queue displays for one department and runs two phases:
+
+  poll  every display requests /api/queue/display/:departmentId every 5s
+        (what QueueDisplay.js used to do)
+  push  every display holds /api/queue/display/:departmentId/stream open and
+        only receives the queue when it changes
+
+Per phase it reports server CPU time (from /api/health), Supabase calls made
+for the displays (from the call traces, so start the server with
+SUPABASE_CALL_TRACE=1) and what the displays received. With --toggle-queue-id
+and a staff token, one queue entry is flipped between waiting and in_progress
+during both phases so the push phase has changes to deliver; its original
+status is restored afterwards.
+
+The call traces are admin-only: set CLICARE_ADMIN_TOKEN, otherwise the
+Supabase call columns are left empty.
+
+Usage:
+  SUPABASE_CALL_TRACE=1 RATE_LIMIT_MAX=100000 QUEUE_DISPLAY_MAX_STREAMS_PER_IP=1000 \
+    QUEUE_DISPLAY_STREAM_RATE_MAX=1000 node server.js
+  python queue_display_load.py --department 1 [--displays 100] [--duration 60]
+                               [--toggle-queue-id Q --staff-token T]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_BASE = "http://localhost:5000"
+OUTPUT_DIR = "queue_display_results"
+ADMIN_TOKEN = os.environ.get('CLICARE_ADMIN_TOKEN')
+
+DISPLAYS = 100
+DURATION_SECONDS = 60         # per phase
+POLL_INTERVAL_SECONDS = 5     # QueueDisplay.js polling interval
+TOGGLE_INTERVAL_SECONDS = 10  # queue status changes while a phase runs
+DISPLAY_ROUTE = '/api/queue/display/'
+
+# ============================================================================
+# SERVER SIDE MEASUREMENTS
+# ============================================================================
+
+def server_cpu_ms():
+    """User + system CPU time the server process has used so far"""
+    process = requests.get(f"{API_BASE}/api/health", timeout=10).json().get('process')
+    if not process:
+        return None
+    return process['cpu_user_ms'] + process['cpu_system_ms']
+
+def latest_trace_id():
+    response = requests.get(f"{API_BASE}/api/debug/supabase-calls", params={'since': 10 ** 12},
+                            headers={'Authorization': f'Bearer {ADMIN_TOKEN}'}, timeout=15)
+    return response.json().get('latest_id', 0) if response.status_code == 200 else None
+
+def display_supabase_calls(since):
+    """Supabase calls and traced requests for the display routes after trace id `since`"""
+    if since is None:
+        return None, None, False
+    traces = requests.get(f"{API_BASE}/api/debug/supabase-calls", params={'since': since},
+                          headers={'Authorization': f'Bearer {ADMIN_TOKEN}'}, timeout=15).json()['traces']
+    truncated = bool(traces) and traces[0]['id'] > since + 1
+    display = [t for t in traces if DISPLAY_ROUTE in t['route']]
+    return sum(t['supabase_calls'] for t in display), len(display), truncated
+
+# ============================================================================
+# DISPLAYS
+# ============================================================================
+
+def polling_display(department, stop_at, rows):
+    """One display polling like the old QueueDisplay.js"""
+    session = requests.Session()
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        try:
+            status = session.get(f"{API_BASE}{DISPLAY_ROUTE}{department}", timeout=30).status_code
+        except requests.exceptions.RequestException:
+            status = 'error'
+        rows.append({'display_event': 'poll', 'status': status,
+                     'response_time_ms': (time.perf_counter() - start) * 1000})
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+def push_display(department, stop_at, rows, streams):
+    """One display holding the SSE stream open; run_phase closes it at stop_at"""
+    start = time.perf_counter()
+    try:
+        response = requests.get(f"{API_BASE}{DISPLAY_ROUTE}{department}/stream", stream=True, timeout=(10, 60))
+        streams.append(response)
+        rows.append({'display_event': 'connect', 'status': response.status_code,
+                     'response_time_ms': (time.perf_counter() - start) * 1000})
+        for line in response.iter_lines(decode_unicode=True):
+            if time.monotonic() >= stop_at:
+                break
+            if line and line.startswith('data:'):
+                rows.append({'display_event': 'push', 'status': 200, 'response_time_ms': None})
+    except (requests.exceptions.RequestException, AttributeError, ValueError):
+        if time.monotonic() < stop_at:
+            rows.append({'display_event': 'connect', 'status': 'error', 'response_time_ms': None})
+
+def queue_toggler(queue_id, token, stop_at):
+    """Flip one queue entry between waiting and in_progress until stop_at"""
+    headers = {'Authorization': f'Bearer {token}'}
+    url = f"{API_BASE}/api/healthcare/queue/{queue_id}/status"
+    status = 'in_progress'
+    while time.monotonic() < stop_at:
+        requests.patch(url, json={'status': status}, headers=headers, timeout=15)
+        status = 'waiting' if status == 'in_progress' else 'in_progress'
+        time.sleep(TOGGLE_INTERVAL_SECONDS)
+
+# ============================================================================
+# PHASES
+# ============================================================================
+
+def run_phase(mode, department, displays, duration, toggle_queue_id=None, staff_token=None):
+    """Run every display for `duration` seconds and measure the server"""
+    target = polling_display if mode == 'poll' else push_display
+    rows = []  # list.append is atomic, so the display threads share it without a lock
+    since = latest_trace_id()
+    cpu_before = server_cpu_ms()
+
+    stop_at = time.monotonic() + duration
+    streams = []
+    args = (department, stop_at, rows) if mode == 'poll' else (department, stop_at, rows, streams)
+    threads = [threading.Thread(target=target, args=args, daemon=True) for _ in range(displays)]
+    if toggle_queue_id and staff_token:
+        threads.append(threading.Thread(target=queue_toggler, daemon=True,
+                                        args=(toggle_queue_id, staff_token, stop_at)))
+    for thread in threads:
+        thread.start()
+    time.sleep(max(0.0, stop_at - time.monotonic()))
+    for response in list(streams):
+        response.close()  # unblocks the push displays waiting for the next event
+    for thread in threads:
+        thread.join(POLL_INTERVAL_SECONDS + 30)
+
+    cpu_after = server_cpu_ms()
+    calls, traced, truncated = display_supabase_calls(since)
+    if truncated:
+        print("⚠️ The server's trace buffer wrapped - Supabase calls are a lower bound; shorten --duration")
+
+    df = pd.DataFrame(rows, columns=['display_event', 'status', 'response_time_ms'])
+    df.insert(0, 'mode', mode)
+    received = df[df['display_event'].isin(['poll', 'push']) & (df['status'] == 200)]
+    latencies = df.loc[df['display_event'] == ('poll' if mode == 'poll' else 'connect'),
+                       'response_time_ms'].dropna().to_numpy(dtype=float)
+    summary = {
+        'mode': mode,
+        'displays': displays,
+        'duration_s': duration,
+        'http_requests': int((df['display_event'] != 'push').sum()),
+        'updates_received': len(received),
+        'errors': int((df['status'] != 200).sum()),
+        'p50_ms': round(np.percentile(latencies, 50), 1) if latencies.size else None,
+        'p95_ms': round(np.percentile(latencies, 95), 1) if latencies.size else None,
+        'server_cpu_ms': round(cpu_after - cpu_before, 1) if None not in (cpu_before, cpu_after) else None,
+        'supabase_calls': calls,
+        'traced_display_requests': traced
+    }
+    return df, summary
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare polling and push for the queue displays")
+    parser.add_argument('--department', required=True, help="department_id shown on the displays")
+    parser.add_argument('--displays', type=int, default=DISPLAYS)
+    parser.add_argument('--duration', type=float, default=DURATION_SECONDS, help="Seconds per phase")
+    parser.add_argument('--toggle-queue-id', help="queue_id to flip between waiting and in_progress")
+    parser.add_argument('--staff-token', default=os.environ.get('CLICARE_STAFF_TOKEN'))
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+    if args.toggle_queue_id and not args.staff_token:
+        print("⚠️ --toggle-queue-id needs a staff token; running without queue changes")
+
+    frames, summaries = [], []
+    for mode in ['poll', 'push']:
+        print(f"📺 {mode}: {args.displays} displays for {args.duration:.0f}s...")
+        df, summary = run_phase(mode, args.department, args.displays, args.duration,
+                                args.toggle_queue_id, args.staff_token)
+        frames.append(df)
+        summaries.append(summary)
+
+    if args.toggle_queue_id and args.staff_token:
+        requests.patch(f"{API_BASE}/api/healthcare/queue/{args.toggle_queue_id}/status",
+                       json={'status': 'waiting'}, headers={'Authorization': f'Bearer {args.staff_token}'},
+                       timeout=15)
+
+    summary = pd.DataFrame(summaries)
+    pd.concat(frames, ignore_index=True).to_csv(f"{OUTPUT_DIR}/queue_display_events.csv", index=False)
+    summary.to_csv(f"{OUTPUT_DIR}/queue_display_summary.csv", index=False)
+
+    print(f"\n{'MODE':<5} {'HTTP REQ':>9} {'UPDATES':>8} {'ERR':>5} {'P50':>8} {'P95':>8} {'CPU MS':>9} {'DB CALLS':>9}")
+    for _, row in summary.iterrows():
+        fmt = lambda v, spec: '-' if pd.isna(v) else format(v, spec)
+        print(f"{row['mode']:<5} {row['http_requests']:>9} {row['updates_received']:>8} {row['errors']:>5} "
+              f"{fmt(row['p50_ms'], '.1f'):>8} {fmt(row['p95_ms'], '.1f'):>8} "
+              f"{fmt(row['server_cpu_ms'], '.0f'):>9} {fmt(row['supabase_calls'], '.0f'):>9}")
+
+    poll, push = summaries
+    if poll['supabase_calls'] and push['supabase_calls'] is not None:
+        print(f"\n✅ Supabase calls: {poll['supabase_calls']} polling → {push['supabase_calls']} push")
+    else:
+        print("\n⚠️ No call traces - restart the server with SUPABASE_CALL_TRACE=1 to count database calls")
+    if poll['server_cpu_ms'] and push['server_cpu_ms'] is not None:
+        print(f"✅ Server CPU: {poll['server_cpu_ms']:.0f} ms polling → {push['server_cpu_ms']:.0f} ms push")
+    print(f"✅ Results saved to {OUTPUT_DIR}/")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+CliCare Testing - Kiosk Offline Registration Replay
+Generates kiosk backlogs (registrations queued while a kiosk was offline) and
+replays each one twice:
+
+  single  one POST /api/patient/register per registration, as kiosks do today
+  batch   POST /api/patient/register-batch in chunks of --batch-size
+
+Backlogs mix in repeats of an earlier registration in the same backlog
+(the kiosk retried before it lost the connection) and incomplete forms. Both
+modes replay the same backlog, each under its own names, emails and phone
+numbers, so the per-item status of the batch endpoint is diffed against what
+the single endpoint answered (replay_status_diff.csv). Reports wall time,
+registrations per second, status mismatches and, when the server runs with
+SUPABASE_CALL_TRACE=1, Supabase calls per registration.
+
+Run:
+  python registration_replay.py [--backlogs 50,200,500] [--batch-size 200]
+                                [--duplicate-rate 0.05] [--invalid-rate 0.02]
+The replays create real patients; cleanup SQL is written to the output
+directory.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+import requests
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_BASE = "http://localhost:5000"
+OUTPUT_DIR = "registration_replay_results"
+
+BACKLOG_SIZES = [50, 200, 500]
+BATCH_SIZE = 200                 # the endpoint accepts up to 500
+DUPLICATE_RATE = 0.05
+INVALID_RATE = 0.02
+PATIENT_MARKER = 'Replay Patient'
+FALLBACK_SYMPTOMS = ['Fever', 'Cough', 'Headache', 'Chest Pain', 'Annual Check-up']
+
+# ============================================================================
+# BACKLOG GENERATION
+# ============================================================================
+
+def available_symptoms():
+    """Symptoms with an active department mapping"""
+    try:
+        response = requests.get(f"{API_BASE}/api/symptom-department-mapping", timeout=15)
+        symptoms = sorted({m['symptom_name'] for m in response.json()['mappings']})
+        return symptoms or FALLBACK_SYMPTOMS
+    except (requests.exceptions.RequestException, ValueError, KeyError):
+        return FALLBACK_SYMPTOMS
+
+def generate_backlog(size, symptoms, duplicate_rate, invalid_rate, rng):
+    """One kiosk backlog without identities; a repeat shares the `identity` of the item it copies"""
+    backlog = []
+    for i in range(size):
+        if backlog and rng.random() < duplicate_rate:
+            backlog.append(dict(rng.choice(backlog)))
+            continue
+        registration = {
+            "identity": i,
+            "birthday": f"{rng.randint(1950, 2010)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            "age": rng.randint(16, 75),
+            "sex": rng.choice(['Male', 'Female']),
+            "address": f"{i} Replay St, Test City",
+            "symptoms": rng.sample(symptoms, k=min(len(symptoms), rng.randint(1, 2))),
+            "duration": "2 days",
+            "severity": rng.choice(['Mild', 'Moderate', 'Severe'])
+        }
+        if i % 4 == 0:
+            registration.update(emergency_contact_name="Replay Contact", emergency_contact_relationship="Sibling",
+                                emergency_contact_no=f"07{rng.randrange(10 ** 9):09d}")
+        if rng.random() < invalid_rate:
+            registration.pop('address')
+        backlog.append(registration)
+    return backlog
+
+def with_identities(backlog, mode, rng):
+    """The backlog under names, emails and phone numbers of its own, so the two replays never collide"""
+    run = f"{mode}{int(time.time())}"
+    phones = {}
+    registrations = []
+    for i, item in enumerate(backlog):
+        registration = {key: value for key, value in item.items() if key != 'identity'}
+        identity = item['identity']
+        phones.setdefault(identity, f"07{rng.randrange(10 ** 9):09d}")
+        registration.update(client_ref=f"{run}-{i}", name=f"{PATIENT_MARKER} {run} {identity}",
+                            contact_no=phones[identity], email=f"replay.{run}.{identity}@testclicare.com")
+        registrations.append(registration)
+    return registrations
+
+# ============================================================================
+# REPLAYS
+# ============================================================================
+
+def supabase_calls(response):
+    calls = response.headers.get('X-Supabase-Calls')
+    return int(calls) if calls is not None else None
+
+def replay_single(backlog):
+    """One POST per registration; returns per-item outcomes"""
+    session = requests.Session()
+    outcomes = []
+    for registration in backlog:
+        start = time.perf_counter()
+        response = session.post(f"{API_BASE}/api/patient/register", json=registration, timeout=60)
+        body = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else {}
+        if response.status_code == 201:
+            status = 'registered'
+        elif response.status_code == 400 and body.get('field'):
+            status = 'duplicate'
+        elif response.status_code == 400:
+            status = 'invalid'
+        else:
+            status = 'failed'
+        outcomes.append({'client_ref': registration['client_ref'], 'status': status,
+                         'http_status': response.status_code,
+                         'response_time_ms': (time.perf_counter() - start) * 1000,
+                         'supabase_calls': supabase_calls(response),
+                         'queue_number': (body.get('queue') or {}).get('queue_no')})
+    return outcomes
+
+def replay_batch(backlog, batch_size):
+    """Chunks of `batch_size` through the batch endpoint; returns per-item outcomes"""
+    session = requests.Session()
+    outcomes = []
+    for i in range(0, len(backlog), batch_size):
+        chunk = backlog[i:i + batch_size]
+        start = time.perf_counter()
+        response = session.post(f"{API_BASE}/api/patient/register-batch", json={'registrations': chunk}, timeout=600)
+        elapsed = (time.perf_counter() - start) * 1000
+        calls = supabase_calls(response)
+        if response.status_code != 200:
+            print(f"⚠️  API Error: {response.status_code} - {response.text[:200]}")
+            outcomes.extend({'client_ref': r['client_ref'], 'status': 'failed', 'http_status': response.status_code,
+                             'response_time_ms': elapsed / len(chunk), 'supabase_calls': None,
+                             'queue_number': None} for r in chunk)
+            continue
+        for result in response.json()['results']:
+            outcomes.append({'client_ref': result['client_ref'], 'status': result['status'], 'http_status': 200,
+                             'response_time_ms': elapsed / len(chunk),
+                             'supabase_calls': calls / len(chunk) if calls is not None else None,
+                             'queue_number': result.get('queue_number')})
+    return outcomes
+
+def replay(size, args, symptoms, rng):
+    """Replay one backlog of `size` both ways; returns the per-item rows, the summaries and the status diff"""
+    backlog = generate_backlog(size, symptoms, args.duplicate_rate, args.invalid_rate, rng)
+    rows, summaries = [], []
+    for mode in ['single', 'batch']:
+        registrations = with_identities(backlog, mode, rng)
+        start = time.perf_counter()
+        outcomes = (replay_single(registrations) if mode == 'single'
+                    else replay_batch(registrations, args.batch_size))
+        wall_s = time.perf_counter() - start
+
+        df = pd.DataFrame(outcomes)
+        df.insert(0, 'item', range(len(df)))   # both replays answer in backlog order
+        df.insert(0, 'mode', mode)
+        df.insert(0, 'backlog', size)
+        rows.append(df)
+        counts = df['status'].value_counts()
+        summaries.append({
+            'backlog': size,
+            'mode': mode,
+            'wall_s': round(wall_s, 2),
+            'registrations_per_s': round(size / wall_s, 1) if wall_s else None,
+            'registered': int(counts.get('registered', 0)),
+            'duplicate': int(counts.get('duplicate', 0)),
+            'invalid': int(counts.get('invalid', 0)),
+            'failed': int(counts.get('failed', 0)),
+            'supabase_calls_per_registration': round(df['supabase_calls'].sum() / size, 2)
+                                               if df['supabase_calls'].notna().any() else None
+        })
+        print(f"  {mode:<6} {size:>5} registrations in {wall_s:6.2f}s ({summaries[-1]['registrations_per_s']}/s)")
+
+    single, batch = rows
+    diff = single[['backlog', 'item', 'status']].merge(batch[['item', 'status']], on='item',
+                                                        suffixes=('_single', '_batch'))
+    diff = diff[diff['status_single'] != diff['status_batch']]
+    for summary in summaries:
+        summary['status_mismatches'] = len(diff)
+    if len(diff):
+        print(f"  ⚠️  {len(diff)} item(s) got a different status from the batch endpoint")
+    return rows, summaries, diff
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay kiosk offline backlogs one by one and in batches")
+    parser.add_argument('--backlogs', default=','.join(str(s) for s in BACKLOG_SIZES), help="Backlog sizes")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--duplicate-rate', type=float, default=DUPLICATE_RATE)
+    parser.add_argument('--invalid-rate', type=float, default=INVALID_RATE)
+    parser.add_argument('--seed', type=int, default=46, help="Random seed for the generated backlogs")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    rng = random.Random(args.seed)
+    symptoms = available_symptoms()
+    frames, summaries, diffs = [], [], []
+    for size in sorted(int(s) for s in args.backlogs.split(',')):
+        print(f"📦 Backlog of {size}")
+        rows, summary, diff = replay(size, args, symptoms, rng)
+        frames.extend(rows)
+        summaries.extend(summary)
+        diffs.append(diff)
+
+    summary = pd.DataFrame(summaries)
+    pd.concat(frames, ignore_index=True).to_csv(f"{OUTPUT_DIR}/replay_items.csv", index=False)
+    pd.concat(diffs, ignore_index=True).to_csv(f"{OUTPUT_DIR}/replay_status_diff.csv", index=False)
+    summary.to_csv(f"{OUTPUT_DIR}/replay_summary.csv", index=False)
+    with open(f"{OUTPUT_DIR}/replay_summary.json", 'w') as f:
+        json.dump({
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'batch_size': args.batch_size,
+            'duplicate_rate': args.duplicate_rate,
+            'invalid_rate': args.invalid_rate,
+            'summary': summary.to_dict(orient='records')
+        }, f, indent=2, default=str)
+    with open(f"{OUTPUT_DIR}/replay_cleanup.sql", 'w') as f:
+        f.write(f"""-- Remove the replayed patients
+DELETE FROM queue WHERE visit_id IN (SELECT visit_id FROM visit WHERE patient_id IN (
+    SELECT id FROM outpatient WHERE name LIKE '{PATIENT_MARKER}%'));
+DELETE FROM visit WHERE patient_id IN (SELECT id FROM outpatient WHERE name LIKE '{PATIENT_MARKER}%');
+DELETE FROM emergency_contact WHERE patient_id IN (SELECT id FROM outpatient WHERE name LIKE '{PATIENT_MARKER}%');
+DELETE FROM outpatient WHERE name LIKE '{PATIENT_MARKER}%';
+""")
+
+    print(f"\n{'BACKLOG':>8} {'MODE':<7} {'WALL S':>8} {'REG/S':>8} {'OK':>5} {'DUP':>5} {'INV':>5} {'FAIL':>5} "
+          f"{'CALLS/REG':>10} {'MISMATCH':>9}")
+    for _, row in summary.iterrows():
+        calls = '-' if pd.isna(row['supabase_calls_per_registration']) else f"{row['supabase_calls_per_registration']:.2f}"
+        print(f"{row['backlog']:>8} {row['mode']:<7} {row['wall_s']:>8.2f} {row['registrations_per_s']:>8.1f} "
+              f"{row['registered']:>5} {row['duplicate']:>5} {row['invalid']:>5} {row['failed']:>5} {calls:>10} "
+              f"{row['status_mismatches']:>9}")
+    print(f"\n✅ Results saved to {OUTPUT_DIR}/ (cleanup SQL: replay_cleanup.sql)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+CliCare Testing - Append-Only Columnar Results Store
+Every test script appends its per-request samples as one Parquet file per
+run, partitioned Hive-style by suite and date:
+
+    results_store/suite=<suite>/date=<YYYY-MM-DD>/<run_id>.parquet
+
+Files are never rewritten, so history across runs is preserved. Trend
+queries read only the partitions and columns they need through
+pyarrow.dataset.
+
+Set CLICARE_RESULTS_STORE to move the store, and CLICARE_RUN_ID to share one
+run id across several scripts.
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # store is optional - scripts still run without pyarrow
+    pa = ds = pq = None
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RESULTS_STORE_DIR = os.environ.get('CLICARE_RESULTS_STORE', 'results_store')
+RUN_ID = os.environ.get('CLICARE_RUN_ID') or f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+# Columns every sample row carries, whatever the suite
+BASE_COLUMNS = ['run_id', 'suite', 'stage', 'endpoint', 'recorded_at', 'success', 'latency_ms']
+
+# Per-suite union of all file schemas, so readers never open every file footer
+SCHEMA_FILE = '_schema.arrow'
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def _normalize_frame(df):
+    """Give columns stable Arrow types so partitions from different runs unify"""
+    df = df.copy()
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            # Integer columns become float64 so a later run with missing values still unifies
+            df[column] = series.astype('float64')
+        elif series.dtype == object:
+            df[column] = series.map(
+                lambda v: None if v is None or (isinstance(v, float) and pd.isna(v))
+                else json.dumps(v, default=str) if isinstance(v, (list, dict))
+                else str(v)
+            )
+    return df
+
+def _unify(schemas):
+    """Merge Arrow schemas, widening types where runs disagree"""
+    try:
+        return pa.unify_schemas(schemas, promote_options='permissive')
+    except TypeError:  # pyarrow < 14
+        return pa.unify_schemas(schemas)
+
+def _read_suite_schema(suite_path):
+    """Suite schema sidecar, or None for stores written before it existed"""
+    try:
+        with open(os.path.join(suite_path, SCHEMA_FILE), 'rb') as f:
+            return pa.ipc.read_schema(pa.py_buffer(f.read()))
+    except OSError:
+        return None
+
+def _update_suite_schema(suite_path, schema):
+    """Merge a newly written file's schema into the suite schema sidecar"""
+    existing = _read_suite_schema(suite_path)
+    merged = _unify([existing, schema]) if existing is not None else schema
+    tmp_path = os.path.join(suite_path, SCHEMA_FILE + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(merged.serialize().to_pybytes())
+    os.replace(tmp_path, os.path.join(suite_path, SCHEMA_FILE))
+
+def append_samples(suite, samples, stage=None, endpoint=None, latency_column=None, success_column=None, run_id=None):
+    """
+    Append per-request samples for one suite/stage of the current run
+    `latency_column` / `success_column` are copied into the common latency_ms /
+    success columns for trend queries
+    Returns the written file path, or None if nothing was stored
+    """
+    if pa is None:
+        print("⚠️ pyarrow not installed - per-request samples not stored (pip install pyarrow)")
+        return None
+
+    df = samples.copy() if isinstance(samples, pd.DataFrame) else pd.DataFrame(list(samples))
+    if df.empty:
+        return None
+
+    now = datetime.utcnow()
+    df['run_id'] = run_id or RUN_ID
+    df['suite'] = suite
+    df['stage'] = stage or df.get('stage', suite)
+    if endpoint is not None or 'endpoint' not in df:
+        df['endpoint'] = endpoint
+    df['recorded_at'] = pd.Timestamp(now)
+    if success_column in df:
+        df['success'] = df[success_column].fillna(False).astype(bool)
+    elif 'success' not in df:
+        df['success'] = None
+    df['latency_ms'] = df[latency_column] if latency_column in df else None
+
+    df = df[BASE_COLUMNS + [c for c in df.columns if c not in BASE_COLUMNS]]
+    table = pa.Table.from_pandas(_normalize_frame(df).drop(columns=['suite']), preserve_index=False)
+
+    partition_dir = os.path.join(RESULTS_STORE_DIR, f"suite={suite}", f"date={now:%Y-%m-%d}")
+    os.makedirs(partition_dir, exist_ok=True)
+
+    # Append-only: a second write from the same run gets its own file
+    file_name = f"{df['run_id'].iloc[0]}-{df['stage'].iloc[0]}"
+    path = os.path.join(partition_dir, f"{file_name}.parquet")
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(partition_dir, f"{file_name}-{suffix}.parquet")
+        suffix += 1
+
+    pq.write_table(table, path, compression='zstd')
+    _update_suite_schema(os.path.dirname(partition_dir), table.schema)
+    print(f"🗄️  Stored {len(df)} samples: {path}")
+    return path
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def _partition_files(suite=None, days=None):
+    """Parquet files for the requested suite and date window, without opening them"""
+    if not os.path.isdir(RESULTS_STORE_DIR):
+        return [], []
+
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d') if days else None
+    suites = [f"suite={suite}"] if suite else sorted(os.listdir(RESULTS_STORE_DIR))
+
+    files, schemas = [], []
+    for suite_dir in suites:
+        suite_path = os.path.join(RESULTS_STORE_DIR, suite_dir)
+        if not os.path.isdir(suite_path):
+            continue
+        schemas.append(_read_suite_schema(suite_path))
+        for date_dir in sorted(os.listdir(suite_path)):
+            if cutoff and date_dir.split('=', 1)[-1] < cutoff:
+                continue
+            date_path = os.path.join(suite_path, date_dir)
+            if os.path.isdir(date_path):
+                files.extend(os.path.join(date_path, f) for f in sorted(os.listdir(date_path)) if f.endswith('.parquet'))
+    return files, schemas
+
+def load_samples(suite=None, days=None, columns=None, filter=None):
+    """
+    Load stored samples as a DataFrame
+    Pruning happens on the directory layout first, then on columns and the
+    optional pyarrow filter expression, so only the needed data is decoded
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to read the results store (pip install pyarrow)")
+
+    files, schemas = _partition_files(suite, days)
+    if not files:
+        return pd.DataFrame(columns=columns or BASE_COLUMNS)
+
+    if any(s is None for s in schemas):
+        # Store written before the schema sidecar existed - fall back to the file footers
+        schemas = [pq.read_schema(f) for f in files]
+
+    partitioning = ds.partitioning(pa.schema([('suite', pa.string()), ('date', pa.string())]), flavor='hive')
+    schema = _unify(schemas + [partitioning.schema])
+
+    dataset = ds.dataset(files, schema=schema, format='parquet', partitioning=partitioning,
+                         partition_base_dir=RESULTS_STORE_DIR)
+    if columns:
+        columns = [c for c in columns if c in schema.names]
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+def list_runs(suite=None, days=None):
+    """One row per stored run: run_id, suite, first sample time and sample count"""
+    df = load_samples(suite, days, columns=['run_id', 'suite', 'recorded_at'])
+    if df.empty:
+        return df
+    return (df.groupby(['run_id', 'suite'])
+              .agg(recorded_at=('recorded_at', 'min'), samples=('recorded_at', 'size'))
+              .reset_index()
+              .sort_values('recorded_at'))
@@ -0,0 +1,396 @@
+"""
+CliCare - Unified Test Runner (all objectives)
+Models every suite as one DAG of stages with declared dependencies.
+Independent stages (OCR, department, registration/navigation, healthcare,
+chatbot) run concurrently; outputs such as the staff token, the admin token
+and the lab-request patient IDs are handed to dependent stages instead of
+being re-created. All suites share one run id in the results store and
+run history.
+
+Whole-run wall time is reported against the sum of the stage times (what a
+serial run of the same stages would have cost).
+
+Run: python run_all.py [--only ocr,department] [--max-workers 6] [--include-upload [--concurrent]] [--no-plots] [--dashboard] [--metrics] [--stall-probe]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+# One run id for every suite in this invocation (read by results_store on import)
+os.environ.setdefault('CLICARE_RUN_ID', f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}")
+
+import test1_department
+import test1_ocr
+import test1_registration
+import test2_healthcare
+import test2_outpatient
+import test3_chatbot
+import test3_privacy
+from telemetry import start_sinks
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+OUTPUT_DIR = "run_all_results"
+MAX_WORKERS = 6
+
+# Unattended: the per-script confirmation prompts are skipped
+test3_chatbot.CONFIRM_BEFORE_START = False
+test3_privacy.CONFIRM_BEFORE_START = False
+
+# ============================================================================
+# STAGE MODEL
+# ============================================================================
+
+class Stage:
+    """One node of the test DAG: func(outputs) -> output shared with dependents"""
+
+    def __init__(self, name, suite, func, deps=(), resource=None, interactive=False):
+        self.name = name
+        self.suite = suite
+        self.func = func
+        self.deps = tuple(deps)
+        self.resource = resource        # stages sharing a resource never overlap (e.g. AI rate limit)
+        self.interactive = interactive  # needs the terminal (OTP entry) - run up front on the main thread
+
+class StageFailed(Exception):
+    """A stage could not produce its output (failed login, unreachable backend, ...)"""
+
+def _require(value, message):
+    """Return value, or fail the stage if it is empty"""
+    if not value:
+        raise StageFailed(message)
+    return value
+
+# ============================================================================
+# STAGE FUNCTIONS
+# ============================================================================
+
+def health_check(outputs):
+    """Backend connectivity gate for every stage that calls the API"""
+    return _require(test1_department.make_api_request("api/health"), "Backend not reachable")
+
+# Objective 1 - OCR (no backend dependency)
+def ocr_tests(outputs):
+    """4.1.2 OCR extraction tests"""
+    test1_ocr.create_output_directory()
+    return test1_ocr.test_ocr_performance()
+
+def ocr_report(outputs):
+    """OCR executive summary and figure"""
+    report = test1_ocr.generate_ocr_report(outputs['ocr_tests'])
+    test1_ocr.render_ocr_figures(outputs['ocr_tests'])
+    return report
+
+# Objective 1 - Department assignment
+def department_tests(outputs):
+    """4.1.1 Department assignment tests"""
+    test1_department.create_output_directory()
+    return test1_department.test_department_assignment()
+
+def department_report(outputs):
+    """Department executive summary, figures and cleanup"""
+    report = test1_department.generate_department_report(outputs['department_tests'])
+    test1_department.render_department_figures(outputs['department_tests'])
+    if test1_department.CLEANUP_AFTER_TEST and not test1_department.USE_BATCH_PREDICTION:
+        test1_department.cleanup_department_test_data()
+    return report
+
+# Objective 1 - Registration and navigation
+def registration_tests(outputs):
+    """4.1.3 Registration, QR verification and navigation map tests"""
+    test1_registration.create_output_directory()
+    return test1_registration.test_registration_system_performance()
+
+def registration_report(outputs):
+    """Registration executive summary, figure and cleanup"""
+    report = test1_registration.generate_registration_report(outputs['registration_tests'])
+    if test1_registration.CLEANUP_AFTER_TEST:
+        test1_registration.cleanup_registration_test_data()
+    return report
+
+# Objective 2 - Healthcare provider interface (strict chain)
+def staff_auth(outputs):
+    """Staff login shared by the healthcare chain"""
+    token, staff_data = test2_healthcare.authenticate_staff()
+    _require(token, "Staff authentication failed")
+    return {'token': token, 'staff_data': staff_data}
+
+def lab_request_generation(outputs):
+    """LRGSR - creates the patients and lab requests reused downstream"""
+    test2_healthcare.create_output_directory()
+    auth = outputs['staff_auth']
+    return test2_healthcare.test_lab_request_generation(auth['token'], auth['staff_data'])
+
+def patient_history_retrieval(outputs):
+    """PHRA - reads back the patients created by lab_request_generation"""
+    auth = outputs['staff_auth']
+    return test2_healthcare.test_patient_history_retrieval(auth['token'], auth['staff_data'],
+                                                           outputs['lab_request_generation'])
+
+def healthcare_report(outputs):
+    """Healthcare interface executive summary, figure and cleanup"""
+    lrgsr_results = outputs['lab_request_generation']
+    phra_results = outputs['patient_history_retrieval']
+    report = test2_healthcare.generate_healthcare_interface_report(lrgsr_results, phra_results)
+    test2_healthcare.render_healthcare_interface_figures(lrgsr_results, phra_results)
+    if test2_healthcare.CLEANUP_AFTER_TEST:
+        test2_healthcare.cleanup_healthcare_interface_test_data()
+    return report
+
+# Objective 2 - Document upload (patient OTP login is interactive)
+def patient_auth(outputs):
+    """Patient OTP login (prompts for the code)"""
+    token, patient_data = test2_outpatient.authenticate_patient()
+    _require(token, "Patient authentication failed")
+    return {'token': token, 'patient_data': patient_data}
+
+def document_upload_tests(outputs):
+    """DUSR / FFCR upload tests"""
+    test2_outpatient.create_output_directory()
+    auth = outputs['patient_auth']
+    results = test2_outpatient.test_document_upload_performance(auth['token'], auth['patient_data']['patient_id'])
+    if test2_outpatient.CONCURRENT_STRESS:
+        results['concurrent_stress'] = test2_outpatient.test_concurrent_upload_stress(
+            auth['token'], auth['patient_data']['patient_id'])
+    return results
+
+def document_upload_report(outputs):
+    """Document upload executive summary and figure"""
+    report = test2_outpatient.generate_document_upload_report(outputs['document_upload_tests'])
+    test2_outpatient.render_document_upload_figures(outputs['document_upload_tests'])
+    return report
+
+# Objective 3 - Chatbot and privacy share one admin login and the AI rate limit
+def admin_auth(outputs):
+    """Admin login shared by the chatbot and privacy suites"""
+    return _require(test3_chatbot.authenticate(), "Admin authentication failed")
+
+def chatbot_tests(outputs):
+    """QRA / NLUR chatbot performance tests"""
+    test3_chatbot.create_output_dir()
+    return _require(test3_chatbot.test_chatbot_performance(outputs['admin_auth']), "Chatbot test returned no result")
+
+def privacy_tests(outputs):
+    """PAVR privacy compliance tests"""
+    test3_privacy.create_output_dir()
+    return _require(test3_privacy.test_chatbot_privacy_compliance(outputs['admin_auth']),
+                    "Privacy test returned no result")
+
+def build_stages(include_upload=False):
+    """The full test DAG"""
+    stages = [
+        Stage('health_check', 'backend', health_check),
+
+        Stage('ocr_tests', 'ocr', ocr_tests),
+        Stage('ocr_report', 'ocr', ocr_report, deps=['ocr_tests']),
+
+        Stage('department_tests', 'department', department_tests, deps=['health_check']),
+        Stage('department_report', 'department', department_report, deps=['department_tests']),
+
+        Stage('registration_tests', 'registration', registration_tests, deps=['health_check']),
+        Stage('registration_report', 'registration', registration_report, deps=['registration_tests']),
+
+        Stage('staff_auth', 'healthcare', staff_auth, deps=['health_check']),
+        Stage('lab_request_generation', 'healthcare', lab_request_generation, deps=['staff_auth']),
+        Stage('patient_history_retrieval', 'healthcare', patient_history_retrieval,
+              deps=['staff_auth', 'lab_request_generation']),
+        Stage('healthcare_report', 'healthcare', healthcare_report,
+              deps=['lab_request_generation', 'patient_history_retrieval']),
+
+        Stage('admin_auth', 'chatbot', admin_auth, deps=['health_check']),
+        Stage('chatbot_tests', 'chatbot', chatbot_tests, deps=['admin_auth'], resource='ai_analyze'),
+        Stage('privacy_tests', 'privacy', privacy_tests, deps=['admin_auth'], resource='ai_analyze'),
+    ]
+
+    if include_upload:
+        stages += [
+            Stage('patient_auth', 'document_upload', patient_auth, interactive=True),
+            Stage('document_upload_tests', 'document_upload', document_upload_tests, deps=['health_check', 'patient_auth']),
+            Stage('document_upload_report', 'document_upload', document_upload_report, deps=['document_upload_tests']),
+        ]
+
+    return stages
+
+def select_stages(stages, suites):
+    """Keep the stages of the requested suites plus everything they depend on"""
+    by_name = {stage.name: stage for stage in stages}
+    keep = set()
+
+    def visit(name):
+        if name not in keep:
+            keep.add(name)
+            for dep in by_name[name].deps:
+                visit(dep)
+
+    for stage in stages:
+        if stage.suite in suites:
+            visit(stage.name)
+    return [stage for stage in stages if stage.name in keep]
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+def run_dag(stages, max_workers=MAX_WORKERS):
+    """Run stages as soon as their dependencies succeed; returns per-stage records"""
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stage(s): {', '.join(missing)}")
+
+    outputs = {}
+    records = {}
+    resource_locks = {stage.resource: threading.Lock() for stage in stages if stage.resource}
+    run_start = time.perf_counter()
+
+    def execute(stage):
+        lock = resource_locks.get(stage.resource)
+        if lock:
+            lock.acquire()
+        started = time.perf_counter()
+        try:
+            output = stage.func(outputs)
+            status, error = 'PASS', None
+        except Exception as e:
+            output, status, error = None, 'FAIL', str(e)
+        finally:
+            if lock:
+                lock.release()
+        finished = time.perf_counter()
+        return output, {
+            'stage': stage.name,
+            'suite': stage.suite,
+            'deps': list(stage.deps),
+            'status': status,
+            'error': error,
+            'start_s': round(started - run_start, 3),
+            'duration_s': round(finished - started, 3)
+        }
+
+    # Interactive stages need the terminal, so they run first, one at a time
+    for stage in [s for s in stages if s.interactive]:
+        print(f"\n▶️  [{stage.suite}] {stage.name} (interactive)")
+        outputs[stage.name], records[stage.name] = execute(stage)
+
+    pending = [s for s in stages if not s.interactive]
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # Skip stages whose dependencies failed or were skipped
+            for stage in list(pending):
+                if any(records.get(dep, {}).get('status') in ('FAIL', 'SKIPPED') for dep in stage.deps):
+                    pending.remove(stage)
+                    records[stage.name] = {'stage': stage.name, 'suite': stage.suite, 'deps': list(stage.deps),
+                                           'status': 'SKIPPED', 'error': 'dependency failed',
+                                           'start_s': None, 'duration_s': 0.0}
+                    print(f"⏭️  [{stage.suite}] {stage.name} skipped (dependency failed)")
+
+            # Launch everything whose dependencies have all passed
+            for stage in list(pending):
+                if all(records.get(dep, {}).get('status') == 'PASS' for dep in stage.deps):
+                    pending.remove(stage)
+                    print(f"\n▶️  [{stage.suite}] {stage.name}")
+                    running[pool.submit(execute, stage)] = stage
+
+            if not running:
+                if pending:
+                    # Nothing running and nothing launchable: a dependency cycle
+                    for stage in pending:
+                        records[stage.name] = {'stage': stage.name, 'suite': stage.suite, 'deps': list(stage.deps),
+                                               'status': 'SKIPPED', 'error': 'unresolvable dependency',
+                                               'start_s': None, 'duration_s': 0.0}
+                    pending = []
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                outputs[stage.name], records[stage.name] = future.result()
+                record = records[stage.name]
+                icon = '✅' if record['status'] == 'PASS' else '❌'
+                detail = f" - {record['error']}" if record['error'] else ''
+                print(f"{icon} [{stage.suite}] {stage.name} finished in {record['duration_s']:.1f}s{detail}")
+
+    wall_time = time.perf_counter() - run_start
+    return [records[stage.name] for stage in stages], outputs, wall_time
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def print_dag_report(records, wall_time):
+    """Per-stage timeline plus wall time vs serial sum"""
+    serial_sum = sum(r['duration_s'] for r in records)
+
+    print(f"\n{'='*80}")
+    print("UNIFIED TEST RUN - STAGE TIMELINE")
+    print(f"{'='*80}")
+    print(f"{'STAGE':<28} {'SUITE':<16} {'START (s)':>10} {'TIME (s)':>10}  STATUS")
+    for r in sorted(records, key=lambda r: (r['start_s'] is None, r['start_s'] or 0)):
+        start = f"{r['start_s']:.1f}" if r['start_s'] is not None else '-'
+        print(f"{r['stage']:<28} {r['suite']:<16} {start:>10} {r['duration_s']:>10.1f}  {r['status']}")
+
+    speedup = serial_sum / wall_time if wall_time > 0 else 0
+    print(f"\n⏱️  Wall time:        {wall_time:.1f}s")
+    print(f"⏱️  Serial stage sum: {serial_sum:.1f}s")
+    print(f"🚀 Speedup:          {speedup:.2f}x")
+
+    return {
+        'run_id': os.environ['CLICARE_RUN_ID'],
+        'test_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'wall_time_s': round(wall_time, 3),
+        'serial_sum_s': round(serial_sum, 3),
+        'speedup': round(speedup, 2),
+        'stages': records
+    }
+
+def main(argv=None):
+    """Build, filter and run the DAG, then save the stage timeline"""
+    parser = argparse.ArgumentParser(description="Run all CliCare test suites as a dependency graph")
+    parser.add_argument('--only', help="Comma-separated suites: ocr,department,registration,healthcare,chatbot,privacy,document_upload")
+    parser.add_argument('--max-workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--include-upload', action='store_true',
+                        help="Include the document upload suite (asks for the patient OTP up front)")
+    parser.add_argument('--concurrent', action='store_true',
+                        help="Add the concurrent upload stress run to the document upload suite (handled by test2_outpatient)")
+    parser.add_argument('--no-plots', action='store_true', help="Skip figure rendering (handled by plot_renderer)")
+    parser.add_argument('--dashboard', action='store_true', help="Stream live metrics over SSE (handled by telemetry)")
+    parser.add_argument('--metrics', action='store_true', help="Expose OpenMetrics on /metrics (handled by telemetry)")
+    parser.add_argument('--stall-probe', action='store_true', help="Attribute event-loop stalls to server jobs (handled by telemetry)")
+    args = parser.parse_args(argv)
+    start_sinks()
+
+    stages = build_stages(include_upload=args.include_upload or (args.only and 'document_upload' in args.only))
+    if args.only:
+        stages = select_stages(stages, {s.strip() for s in args.only.split(',')})
+
+    print("\n" + "="*80)
+    print("CLICARE - UNIFIED TEST RUN (ALL OBJECTIVES)")
+    print("="*80)
+    print(f"Run ID: {os.environ['CLICARE_RUN_ID']}")
+    print(f"Stages: {len(stages)}  Max concurrent: {args.max_workers}")
+    print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    records, _, wall_time = run_dag(stages, args.max_workers)
+    summary = print_dag_report(records, wall_time)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with open(f"{OUTPUT_DIR}/dag_summary.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"\n📁 Stage timeline saved to: {OUTPUT_DIR}/dag_summary.json")
+
+    return 0 if all(r['status'] == 'PASS' for r in records) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
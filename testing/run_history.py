@@ -0,0 +1,215 @@
+"""
+CliCare Testing - Run History Catalogue (SQLite)
+Every test script records one row per run with its git commit, config and
+headline metrics (WPRSR, HKRCR, LRGSR, PHRA, DUSR, QRA, PAVR, latency p95s),
+so trend questions never need the *_executive_summary.json files re-parsed.
+
+Run IDs match the results store (results_store.RUN_ID), so a catalogue row
+can be joined back to its per-request samples.
+
+Usage:
+  python run_history.py runs [--suite healthcare_interface] [--last 20]
+  python run_history.py metrics [--suite healthcare_interface]
+  python run_history.py trend patient_history_p95_ms [--suite healthcare_interface] [--last 30]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+import numpy as np
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RUN_HISTORY_DB = os.environ.get('CLICARE_RUN_HISTORY_DB', 'run_history.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT NOT NULL,
+    suite       TEXT NOT NULL,
+    started_at  TEXT NOT NULL,
+    git_commit  TEXT,
+    status      TEXT,
+    config      TEXT,
+    PRIMARY KEY (run_id, suite)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_suite_started ON runs (suite, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+
+-- started_at is denormalized so "last N runs of a metric" is a single index range scan
+CREATE TABLE IF NOT EXISTS run_metrics (
+    run_id      TEXT NOT NULL,
+    suite       TEXT NOT NULL,
+    metric      TEXT NOT NULL,
+    value       REAL,
+    started_at  TEXT NOT NULL,
+    PRIMARY KEY (run_id, suite, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_metrics_metric_started ON run_metrics (metric, started_at);
+CREATE INDEX IF NOT EXISTS idx_metrics_suite_metric_started ON run_metrics (suite, metric, started_at);
+"""
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def connect(db_path=None):
+    """Open the catalogue, creating tables and indexes on first use"""
+    conn = sqlite3.connect(db_path or RUN_HISTORY_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def current_git_commit():
+    """Short commit hash of the working tree, with -dirty if it has local changes"""
+    try:
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd,
+                                capture_output=True, text=True, timeout=5).stdout.strip()
+        if not commit:
+            return None
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=cwd, timeout=5).returncode != 0
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def config_snapshot(namespace):
+    """UPPERCASE configuration constants of a script (pass globals())"""
+    return {
+        name: value for name, value in namespace.items()
+        if name.isupper() and isinstance(value, (str, int, float, bool, tuple, list))
+    }
+
+def latency_metrics(prefix, values):
+    """p50/p95/p99 of a latency series as {prefix}_pXX_ms metrics"""
+    values = np.asarray([v for v in values if v is not None], dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {f"{prefix}_p50_ms": p50, f"{prefix}_p95_ms": p95, f"{prefix}_p99_ms": p99}
+
+def record_run(suite, metrics, config=None, status=None, run_id=None, db_path=None):
+    """Insert (or replace) this run's catalogue row and headline metrics"""
+    from results_store import RUN_ID  # imported here so the query CLI stays fast
+    run_id = run_id or RUN_ID
+    started_at = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+
+    try:
+        conn = connect(db_path)
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, suite, started_at, git_commit, status, config) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, suite, started_at, current_git_commit(), status,
+                 json.dumps(config or {}, default=str, sort_keys=True))
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO run_metrics (run_id, suite, metric, value, started_at) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, suite, metric, None if value is None else float(value), started_at)
+                 for metric, value in metrics.items()]
+            )
+        conn.close()
+        print(f"📚 Run {run_id} recorded in {db_path or RUN_HISTORY_DB} ({len(metrics)} metrics)")
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not record run history: {e}")
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+def list_runs(conn, suite=None, last=20):
+    """Most recent catalogue rows, newest first"""
+    sql = "SELECT run_id, suite, started_at, git_commit, status FROM runs"
+    params = []
+    if suite:
+        sql += " WHERE suite = ?"
+        params.append(suite)
+    sql += " ORDER BY started_at DESC LIMIT ?"
+    return conn.execute(sql, params + [last]).fetchall()
+
+def list_metrics(conn, suite=None):
+    """Distinct (suite, metric) pairs that have been recorded"""
+    if suite:
+        return conn.execute("SELECT DISTINCT suite, metric FROM run_metrics WHERE suite = ? ORDER BY metric",
+                            (suite,)).fetchall()
+    return conn.execute("SELECT DISTINCT suite, metric FROM run_metrics ORDER BY suite, metric").fetchall()
+
+def metric_trend(conn, metric, suite=None, last=30):
+    """Last N values of a metric, newest first"""
+    sql = ("SELECT m.run_id, m.suite, m.started_at, r.git_commit, m.value FROM run_metrics m "
+           "JOIN runs r ON r.run_id = m.run_id AND r.suite = m.suite WHERE m.metric = ?")
+    params = [metric]
+    if suite:
+        sql += " AND m.suite = ?"
+        params.append(suite)
+    sql += " ORDER BY m.started_at DESC LIMIT ?"
+    return conn.execute(sql, params + [last]).fetchall()
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the CliCare test run history")
+    parser.add_argument('--db', default=RUN_HISTORY_DB, help="SQLite catalogue path")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    runs_cmd = sub.add_parser('runs', help="List recent runs")
+    runs_cmd.add_argument('--suite')
+    runs_cmd.add_argument('--last', type=int, default=20)
+
+    metrics_cmd = sub.add_parser('metrics', help="List recorded metric names")
+    metrics_cmd.add_argument('--suite')
+
+    trend_cmd = sub.add_parser('trend', help="Show a metric over the last N runs")
+    trend_cmd.add_argument('metric', help="e.g. patient_history_p95_ms, lrgsr, dusr")
+    trend_cmd.add_argument('--suite')
+    trend_cmd.add_argument('--last', type=int, default=30)
+
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ No run history at {args.db} - run a test script first")
+        return 1
+
+    conn = connect(args.db)
+
+    if args.command == 'runs':
+        rows = list_runs(conn, args.suite, args.last)
+        print(f"{'RUN ID':<26} {'SUITE':<24} {'STARTED (UTC)':<20} {'COMMIT':<16} STATUS")
+        for run_id, suite, started_at, commit, status in rows:
+            print(f"{run_id:<26} {suite:<24} {started_at:<20} {commit or '-':<16} {status or '-'}")
+
+    elif args.command == 'metrics':
+        for suite, metric in list_metrics(conn, args.suite):
+            print(f"{suite:<24} {metric}")
+
+    elif args.command == 'trend':
+        rows = metric_trend(conn, args.metric, args.suite, args.last)
+        if not rows:
+            print(f"❌ No values recorded for '{args.metric}' (see: python run_history.py metrics)")
+            return 1
+
+        print(f"📈 {args.metric} over the last {len(rows)} run(s)")
+        print(f"{'RUN ID':<26} {'SUITE':<24} {'STARTED (UTC)':<20} {'COMMIT':<16} VALUE")
+        for run_id, suite, started_at, commit, value in rows:
+            shown = f"{value:.2f}" if value is not None else '-'
+            print(f"{run_id:<26} {suite:<24} {started_at:<20} {commit or '-':<16} {shown}")
+
+        values = np.array([row[4] for row in rows if row[4] is not None], dtype=float)
+        if values.size:
+            print(f"\nLatest: {values[0]:.2f}  Median: {np.median(values):.2f}  "
+                  f"Min: {values.min():.2f}  Max: {values.max():.2f}")
+
+    conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,7 @@ const QRCode = require('qrcode');
 const multer = require('multer');
 const fs = require('fs');
 const path = require('path');
+const { AsyncLocalStorage } = require('async_hooks');
 require('dotenv').config();
 
 const app = express();
@@ -24,7 +25,122 @@ const SUPABASE_ANON_KEY = process.env.REACT_APP_SUPABASE_ANON_KEY;
 const JWT_SECRET = process.env.JWT_SECRET || 'your-super-secret-jwt-key-change-this';
 const genAI = new GoogleGenerativeAI(process.env.GEMINI_API_KEY);
 
-const supabase = createClient(SUPABASE_URL, SUPABASE_ANON_KEY);
+// Supabase round-trip tracing (SUPABASE_CALL_TRACE=1): every PostgREST call is
+// attributed to the inbound request that issued it, so N+1 routes can be found.
+// The admin job runner traces job runs the same way regardless of the flag.
+// Tracing wraps the global fetch, so it is only installed where the runtime has
+// one (Node 18+); elsewhere supabase-js keeps its own fetch and job runs report
+// supabase_calls: null.
+const SUPABASE_FETCH_TRACEABLE = typeof fetch === 'function';
+const SUPABASE_CALL_TRACE = process.env.SUPABASE_CALL_TRACE === '1' && SUPABASE_FETCH_TRACEABLE;
+if (process.env.SUPABASE_CALL_TRACE === '1' && !SUPABASE_FETCH_TRACEABLE) {
+  console.warn('⚠️ SUPABASE_CALL_TRACE needs Node 18+ (global fetch); Supabase call tracing is disabled');
+}
+const SUPABASE_TRACE_HISTORY = 2000;      // finished requests kept for /api/debug/supabase-calls
+const SUPABASE_TRACE_MAX_CALLS = 200;     // per-request call details kept (the count is always exact)
+const supabaseCallContext = new AsyncLocalStorage();
+const supabaseTraceLog = [];
+let supabaseTraceSeq = 0;
+
+const elapsedMs = (start) => Number(process.hrtime.bigint() - start) / 1e6;
+
+const tracedFetch = async (input, init = {}) => {
+  const trace = supabaseCallContext.getStore();
+  if (!trace) {
+    return fetch(input, init);
+  }
+
+  // input may be a URL string, a URL object or a Request
+  const url = input instanceof URL ? input : new URL(input.url ?? String(input));
+  const callStart = process.hrtime.bigint();
+  const call = {
+    seq: trace.calls.length + 1,
+    method: (init.method || 'GET').toUpperCase(),
+    target: url.pathname.replace(/^\/rest\/v1\//, ''),
+    start_ms: elapsedMs(trace.start)
+  };
+  trace.calls.push(call);
+
+  try {
+    const response = await fetch(input, init);
+    call.status = response.status;
+    return response;
+  } finally {
+    call.dur_ms = elapsedMs(callStart);
+  }
+};
+
+// Sequential round trips: calls that overlap in time share one round trip
+const countRoundTrips = (calls) => {
+  let roundTrips = 0;
+  let waveEnd = -1;
+  [...calls].sort((a, b) => a.start_ms - b.start_ms).forEach(call => {
+    const end = call.start_ms + (call.dur_ms || 0);
+    if (call.start_ms >= waveEnd) {
+      roundTrips += 1;
+      waveEnd = end;
+    } else {
+      waveEnd = Math.max(waveEnd, end);
+    }
+  });
+  return roundTrips;
+};
+
+// Result size of a JSON response: the longest array at the top level or one level down
+const largestArrayLength = (body, depth = 0) => {
+  if (Array.isArray(body)) {
+    return body.length;
+  }
+  if (!body || typeof body !== 'object' || depth > 1) {
+    return 0;
+  }
+  return Object.values(body).reduce((max, value) => Math.max(max, largestArrayLength(value, depth + 1)), 0);
+};
+
+const recordSupabaseTrace = (route, status, trace) => {
+  supabaseTraceSeq += 1;
+  supabaseTraceLog.push({
+    id: supabaseTraceSeq,
+    route,
+    status,
+    total_ms: elapsedMs(trace.start),
+    supabase_calls: trace.calls.length,
+    round_trips: countRoundTrips(trace.calls),
+    supabase_ms: trace.calls.reduce((sum, call) => sum + (call.dur_ms || 0), 0),
+    result_rows: trace.resultRows,
+    calls: trace.calls.slice(0, SUPABASE_TRACE_MAX_CALLS)
+  });
+  if (supabaseTraceLog.length > SUPABASE_TRACE_HISTORY) {
+    supabaseTraceLog.shift();
+  }
+};
+
+const supabase = createClient(SUPABASE_URL, SUPABASE_ANON_KEY,
+  SUPABASE_FETCH_TRACEABLE ? { global: { fetch: tracedFetch } } : undefined);
+
+// Background job runs: the cleanup / offline / activation timers share the request
+// event loop, so each run's start and duration is kept for /api/debug/background-jobs
+// (testing/loop_stall_probe.py lines latency spikes up with them)
+const BACKGROUND_JOB_HISTORY = 500;
+const backgroundJobRuns = [];
+let backgroundJobSeq = 0;
+
+const runBackgroundJob = async (name, job) => {
+  const startedAt = Date.now();
+  const start = process.hrtime.bigint();
+  let ok = false;
+  try {
+    const result = await job();
+    ok = true;
+    return result;
+  } finally {
+    backgroundJobSeq += 1;
+    backgroundJobRuns.push({ id: backgroundJobSeq, job: name, started_at: startedAt, duration_ms: elapsedMs(start), ok });
+    if (backgroundJobRuns.length > BACKGROUND_JOB_HISTORY) {
+      backgroundJobRuns.shift();
+    }
+  }
+};
 
 const emailConfig = {
   service: 'gmail',
@@ -96,48 +212,164 @@ const verifyPassword = async (password, hashedPassword) => {
   return await bcrypt.compare(password, hashedPassword);
 };
 
-const assignDepartmentBySymptoms = async (symptoms, patientAge = null) => {
-  try {
-    const { data: mappings, error } = await supabase
-      .from('symptom_department')
-      .select('symptom_name, department_id, priority, age_min, age_max')
-      .eq('is_active', true)
-      .order('priority', { ascending: false });
+const fetchSymptomMappings = async () => {
+  const { data: mappings, error } = await supabase
+    .from('symptom_department')
+    .select('symptom_name, department_id, priority, age_min, age_max')
+    .eq('is_active', true)
+    .order('priority', { ascending: false });
 
-    if (error) {
-      console.error('Error fetching symptom mappings:', error);
-      return 2; // Fallback to Internal Medicine
-    }
+  if (error) {
+    throw error;
+  }
 
-    // Find best matching department
-    for (const symptom of symptoms) {
-      const matches = mappings.filter(mapping => 
-        mapping.symptom_name === symptom &&
-        (patientAge === null || 
-        (patientAge >= mapping.age_min && patientAge <= mapping.age_max))
-      );
-      
-      if (matches.length > 0) {
-        return matches[0].department_id;
-      }
-    }
+  return mappings || [];
+};
+
+// Pure matcher shared by registration and batch prediction (mappings must be priority-ordered)
+const matchDepartmentBySymptoms = (mappings, symptoms, patientAge = null) => {
+  for (const symptom of symptoms) {
+    const match = mappings.find(mapping => 
+      mapping.symptom_name === symptom &&
+      (patientAge === null || 
+      (patientAge >= mapping.age_min && patientAge <= mapping.age_max))
+    );
     
-    return 2; // Default to Internal Medicine
+    if (match) {
+      return match.department_id;
+    }
+  }
+  
+  return 2; // Default to Internal Medicine
+};
+
+const assignDepartmentBySymptoms = async (symptoms, patientAge = null) => {
+  try {
+    const mappings = await fetchSymptomMappings();
+    return matchDepartmentBySymptoms(mappings, symptoms, patientAge);
   } catch (error) {
     console.error('Error in symptom mapping:', error);
     return 2; // Fallback to Internal Medicine
   }
 };
 
+// Department schedule calendar: one read of every department's available_days,
+// expanded into the open days of the next two weeks (day offset, closing time and
+// display slot). Slot calculation looks the department up here instead of querying
+// it and walking the week on every registration. The calendar is rebuilt when the
+// local date changes, after DEPARTMENT_CALENDAR_TTL_MS, when Supabase Realtime
+// reports a department change, or on demand via the refreshDepartmentCalendar job.
+const DEPARTMENT_CALENDAR_TTL_MS = parseInt(process.env.DEPARTMENT_CALENDAR_TTL_MS ?? '300000');
+const CALENDAR_DAYS_AHEAD = 14;
+const DAYS_OF_WEEK = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
+let departmentCalendar = null;
+let departmentCalendarBuild = null;   // in-flight rebuild shared by concurrent callers
+let departmentCalendarGeneration = 0; // bumped on invalidation; older builds are not stored
+
+const buildDepartmentCalendar = async () => {
+  const { data: departments, error } = await supabase
+    .from('department')
+    .select('department_id, is_scheduled, available_days, service_type, name');
+
+  if (error) {
+    throw error;
+  }
+
+  const now = new Date();
+  const calendar = new Map();
+
+  (departments || []).forEach(department => {
+    const openDays = [];
+    const schedule = department.available_days;
+
+    for (let offset = 0; schedule && offset <= CALENDAR_DAYS_AHEAD; offset++) {
+      const day = new Date(now);
+      day.setDate(day.getDate() + offset);
+      const dayName = DAYS_OF_WEEK[day.getDay()];
+      const timeSlots = schedule[dayName];
+
+      if (timeSlots && timeSlots.length > 0) {
+        openDays.push({
+          offset,
+          dayName,
+          closesAt: timeSlots.reduce((latest, slot) => (slot.end > latest ? slot.end : latest), ''),
+          timeSlot: `${timeSlots[0].start}-${timeSlots[timeSlots.length - 1].end}`
+        });
+      }
+    }
+
+    calendar.set(String(department.department_id), { ...department, openDays });
+  });
+
+  return { day: now.toDateString(), builtAt: Date.now(), departments: calendar };
+};
+
+const getDepartmentCalendar = async () => {
+  const fresh = departmentCalendar &&
+    departmentCalendar.day === new Date().toDateString() &&
+    Date.now() - departmentCalendar.builtAt < DEPARTMENT_CALENDAR_TTL_MS;
+
+  if (fresh) {
+    return departmentCalendar;
+  }
+
+  if (!departmentCalendarBuild) {
+    const generation = departmentCalendarGeneration;
+    const build = buildDepartmentCalendar()
+      .then(calendar => {
+        if (generation === departmentCalendarGeneration) {
+          departmentCalendar = calendar;
+        }
+        return calendar;
+      })
+      .finally(() => {
+        if (departmentCalendarBuild === build) {
+          departmentCalendarBuild = null;
+        }
+      });
+    departmentCalendarBuild = build;
+  }
+  return departmentCalendarBuild;
+};
+
+// Drops the cached calendar and detaches any build that started before the change
+const invalidateDepartmentCalendar = () => {
+  departmentCalendarGeneration += 1;
+  departmentCalendar = null;
+  departmentCalendarBuild = null;
+};
+
+const refreshDepartmentCalendar = async () => {
+  invalidateDepartmentCalendar();
+  const calendar = await getDepartmentCalendar();
+  return { scanned: calendar.departments.size, changed: calendar.departments.size };
+};
+
+// Needs Realtime enabled for the department table; without it the TTL still applies
+supabase
+  .channel('department-calendar')
+  .on('postgres_changes', { event: '*', schema: 'public', table: 'department' }, () => {
+    invalidateDepartmentCalendar();
+  })
+  .subscribe();
+
+// Local-date day `offset` days from `now`, as the ISO date the queue tables use
+const calendarDate = (now, offset) => {
+  const day = new Date(now);
+  day.setDate(day.getDate() + offset);
+  return day.toISOString().split('T')[0];
+};
+
+// First open day whose hours have not ended: today while a slot is still open, else a later day
+const nextOpenDay = (department, currentTime) =>
+  department.openDays.find(day => day.offset > 0 || currentTime < day.closesAt);
+
 const calculateNextAvailableDate = async (departmentId) => {
   try {
-    const { data: department, error } = await supabase
-      .from('department')
-      .select('is_scheduled, available_days, service_type, name')
-      .eq('department_id', departmentId)
-      .single();
+    const calendar = await getDepartmentCalendar();
+    const department = calendar.departments.get(String(departmentId));
 
-    if (error || !department) {
+    if (!department) {
       console.error('Department not found:', departmentId);
       return { date: null, timeSlot: null };
     }
@@ -151,52 +383,15 @@ const calculateNextAvailableDate = async (departmentId) => {
     }
 
     const now = new Date();
-    const currentHour = now.getHours();
-    const currentMinute = now.getMinutes();
-    const currentTime = `${currentHour.toString().padStart(2, '0')}:${currentMinute.toString().padStart(2, '0')}`;
-    const daysOfWeek = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
-    
-    const schedule = department.available_days;
-    let checkDate = new Date(now);
-    const maxDaysToCheck = 14;
-    
-    // Helper to check if time slot is still open today
-    const isTimeSlotStillAvailable = (timeSlots) => {
-      for (const slot of timeSlots) {
-        if (currentTime < slot.end) {
-          return true;
-        }
-      }
-      return false;
-    };
-
-    // Check today first
-    const todayName = daysOfWeek[checkDate.getDay()];
-    if (schedule[todayName]) {
-      const timeSlots = schedule[todayName];
-      if (isTimeSlotStillAvailable(timeSlots)) {
-        // Found available time slot today
-        return {
-          date: checkDate.toISOString().split('T')[0],
-          timeSlot: `${timeSlots[0].start}-${timeSlots[timeSlots.length - 1].end}`,
-          department: department.name
-        };
-      }
-    }
+    const currentTime = `${now.getHours().toString().padStart(2, '0')}:${now.getMinutes().toString().padStart(2, '0')}`;
+    const openDay = nextOpenDay(department, currentTime);
 
-    // Check future days
-    for (let i = 1; i <= maxDaysToCheck; i++) {
-      checkDate.setDate(checkDate.getDate() + 1);
-      const dayName = daysOfWeek[checkDate.getDay()];
-      
-      if (schedule[dayName]) {
-        const timeSlots = schedule[dayName];
-        return {
-          date: checkDate.toISOString().split('T')[0],
-          timeSlot: `${timeSlots[0].start}-${timeSlots[timeSlots.length - 1].end}`,
-          department: department.name
-        };
-      }
+    if (openDay) {
+      return {
+        date: calendarDate(now, openDay.offset),
+        timeSlot: openDay.timeSlot,
+        department: department.name
+      };
     }
 
     // Fallback
@@ -214,13 +409,10 @@ const calculateNextAvailableDate = async (departmentId) => {
 
 const calculateNextAvailableSlot = async (departmentId) => {
   try {
-    const { data: department, error } = await supabase
-      .from('department')
-      .select('is_scheduled, available_days, service_type, name')
-      .eq('department_id', departmentId)
-      .single();
+    const calendar = await getDepartmentCalendar();
+    const department = calendar.departments.get(String(departmentId));
 
-    if (error || !department) {
+    if (!department) {
       console.error('Department not found:', departmentId);
       return { 
         isScheduled: false, 
@@ -254,63 +446,47 @@ const calculateNextAvailableSlot = async (departmentId) => {
     const now = new Date();
     const today = now.toISOString().split('T')[0];
     const currentTime = `${now.getHours().toString().padStart(2, '0')}:${now.getMinutes().toString().padStart(2, '0')}`;
-    const daysOfWeek = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
-    
-    // Check if today is an available day and still within time window
-    const todayName = daysOfWeek[now.getDay()];
-    if (schedule[todayName]) {
-      const timeSlots = schedule[todayName];
-      const isStillOpen = timeSlots.some(slot => currentTime < slot.end);
-      
-      if (isStillOpen) {
-        // Check current queue count for today
-        const { count: todayQueueCount } = await supabase
-          .from('queue')
-          .select('*', { count: 'exact', head: true })
-          .eq('department_id', departmentId)
-          .eq('visit.visit_date', today);
-
-        return {
-          isScheduled: true,
-          nextAvailableDate: today,
-          isToday: true,
-          queuePosition: (todayQueueCount || 0) + 1,
-          departmentName: department.name,
-          timeSlot: `${timeSlots[0].start}-${timeSlots[timeSlots.length - 1].end}`
-        };
-      }
+    const openDay = nextOpenDay(department, currentTime);
+
+    // Today is an available day and still within its time window
+    if (openDay && openDay.offset === 0) {
+      // Check current queue count for today
+      const { count: todayQueueCount } = await supabase
+        .from('queue')
+        .select('*', { count: 'exact', head: true })
+        .eq('department_id', departmentId)
+        .eq('visit.visit_date', today);
+
+      return {
+        isScheduled: true,
+        nextAvailableDate: today,
+        isToday: true,
+        queuePosition: (todayQueueCount || 0) + 1,
+        departmentName: department.name,
+        timeSlot: openDay.timeSlot
+      };
     }
 
-    // Find next available date
-    let checkDate = new Date(now);
-    const maxDaysToCheck = 14; // Look ahead 2 weeks
-    
-    for (let i = 1; i <= maxDaysToCheck; i++) {
-      checkDate.setDate(checkDate.getDate() + 1);
-      const dayName = daysOfWeek[checkDate.getDay()];
+    // Next available date (within 2 weeks)
+    if (openDay) {
+      const nextDate = calendarDate(now, openDay.offset);
       
-      if (schedule[dayName]) {
-        const nextDate = checkDate.toISOString().split('T')[0];
-        
-        // Count existing appointments for this date
-        const { count: futureQueueCount } = await supabase
-          .from('queue')
-          .select('*', { count: 'exact', head: true })
-          .eq('department_id', departmentId)
-          .eq('scheduled_date', nextDate);
+      // Count existing appointments for this date
+      const { count: futureQueueCount } = await supabase
+        .from('queue')
+        .select('*', { count: 'exact', head: true })
+        .eq('department_id', departmentId)
+        .eq('scheduled_date', nextDate);
 
-        const timeSlots = schedule[dayName];
-        
-        return {
-          isScheduled: true,
-          nextAvailableDate: nextDate,
-          isToday: false,
-          queuePosition: (futureQueueCount || 0) + 1,
-          departmentName: department.name,
-          dayName: dayName,
-          timeSlot: `${timeSlots[0].start}-${timeSlots[timeSlots.length - 1].end}`
-        };
-      }
+      return {
+        isScheduled: true,
+        nextAvailableDate: nextDate,
+        isToday: false,
+        queuePosition: (futureQueueCount || 0) + 1,
+        departmentName: department.name,
+        dayName: openDay.dayName,
+        timeSlot: openDay.timeSlot
+      };
     }
 
     // No available date found within 2 weeks
@@ -468,7 +644,9 @@ const storage = multer.diskStorage({
   filename: (req, file, cb) => {
     const timestamp = Date.now();
     const originalName = file.originalname.replace(/[^a-zA-Z0-9.-]/g, '_');
-    cb(null, `${timestamp}_${originalName}`);
+    // Random part keeps same-name uploads arriving in the same millisecond from overwriting each other
+    const unique = Math.random().toString(36).slice(2, 8);
+    cb(null, `${timestamp}_${unique}_${originalName}`);
   }
 });
 
@@ -515,6 +693,59 @@ app.use(cors({
 app.use(express.json({ limit: '10mb' }));
 app.use(express.urlencoded({ extended: true, limit: '10mb' }));
 
+// Server-Timing: routes wrap each Supabase call / phase in req.timing.time(name, work)
+// and the durations are sent as `name;dur=ms` entries plus a `total` for the request.
+// With SUPABASE_CALL_TRACE=1 the request also runs inside a call trace and reports
+// X-Supabase-Calls / X-Supabase-Round-Trips plus a `supabase` Server-Timing entry.
+app.use((req, res, next) => {
+  const requestStart = process.hrtime.bigint();
+  const entries = [];
+
+  req.timing = {
+    time: async (name, work) => {
+      const start = process.hrtime.bigint();
+      try {
+        return await work;
+      } finally {
+        entries.push(`${name};dur=${elapsedMs(start).toFixed(1)}`);
+      }
+    }
+  };
+
+  const trace = SUPABASE_CALL_TRACE ? { start: requestStart, calls: [], resultRows: null } : null;
+
+  const writeHead = res.writeHead;
+  res.writeHead = function (...args) {
+    if (!res.headersSent) {
+      if (trace) {
+        const supabaseMs = trace.calls.reduce((sum, call) => sum + (call.dur_ms || 0), 0);
+        entries.push(`supabase;dur=${supabaseMs.toFixed(1)}`);
+        res.setHeader('X-Supabase-Calls', trace.calls.length);
+        res.setHeader('X-Supabase-Round-Trips', countRoundTrips(trace.calls));
+      }
+      entries.push(`total;dur=${elapsedMs(requestStart).toFixed(1)}`);
+      res.setHeader('Server-Timing', entries.join(', '));
+    }
+    return writeHead.apply(this, args);
+  };
+
+  if (!trace) {
+    return next();
+  }
+
+  const json = res.json;
+  res.json = function (body) {
+    trace.resultRows = largestArrayLength(body);
+    return json.call(this, body);
+  };
+
+  res.on('finish', () => {
+    recordSupabaseTrace(`${req.method} ${req.route ? req.baseUrl + req.route.path : req.path}`, res.statusCode, trace);
+  });
+
+  supabaseCallContext.run(trace, next);
+});
+
 // Rate Limiters
 const generalLoginLimiter = rateLimit({
   windowMs: 15 * 60 * 1000,
@@ -528,7 +759,23 @@ const generalLoginLimiter = rateLimit({
 
 const generalLimiter = rateLimit({
   windowMs: 15 * 60 * 1000,
-  max: 200,
+  max: parseInt(process.env.RATE_LIMIT_MAX) || 200,  // raised only for local load scenarios
+  skip: (req) => req.path === '/health' ||            // polled by monitors and the stall probe
+    /^\/queue\/display\/[^/]+\/stream$/.test(req.path),   // limited by queueDisplayStreamLimiter instead
+  standardHeaders: true,
+  legacyHeaders: false,
+});
+
+// Queue display streams reconnect on every network blip, so they get their own
+// budget instead of eating into generalLimiter; open streams are capped per IP
+// at the route (QUEUE_DISPLAY_MAX_STREAMS_PER_IP)
+const queueDisplayStreamLimiter = rateLimit({
+  windowMs: 60 * 1000,
+  max: parseInt(process.env.QUEUE_DISPLAY_STREAM_RATE_MAX) || 60,
+  message: {
+    success: false,
+    error: 'Too many queue display connections. Please try again later.',
+  },
   standardHeaders: true,
   legacyHeaders: false,
 });
@@ -819,6 +1066,63 @@ app.get('/api/symptom-department-mapping', async (req, res) => {
   }
 });
 
+// Batch department prediction (read-only, no patient/visit/queue rows created)
+app.post('/api/department/predict-batch', async (req, res) => {
+  try {
+    const { cases } = req.body;
+
+    if (!Array.isArray(cases) || cases.length === 0) {
+      return res.status(400).json({ error: 'cases must be a non-empty array' });
+    }
+
+    if (cases.length > 1000) {
+      return res.status(400).json({ error: 'Maximum of 1000 cases per batch' });
+    }
+
+    // One mapping fetch and one department lookup for the whole batch
+    const mappings = await fetchSymptomMappings();
+
+    const { data: departments, error: deptError } = await supabase
+      .from('department')
+      .select('department_id, name');
+
+    if (deptError) throw deptError;
+
+    const departmentNames = new Map(
+      (departments || []).map(dept => [dept.department_id, dept.name])
+    );
+
+    const predictions = cases.map((item, index) => {
+      const symptoms = Array.isArray(item?.symptoms)
+        ? item.symptoms
+        : (item?.symptoms ? String(item.symptoms).split(', ') : []);
+      const age = item?.age === undefined || item?.age === null ? null : parseInt(item.age);
+      const deptId = matchDepartmentBySymptoms(mappings, symptoms, Number.isNaN(age) ? null : age);
+
+      return {
+        index,
+        symptoms,
+        age,
+        department_id: deptId,
+        recommendedDepartment: departmentNames.get(deptId) || 'Internal Medicine'
+      };
+    });
+
+    res.json({
+      success: true,
+      count: predictions.length,
+      predictions
+    });
+
+  } catch (error) {
+    console.error('Batch department prediction error:', error);
+    res.status(500).json({
+      error: 'Failed to predict departments',
+      details: error.message
+    });
+  }
+});
+
 // Get navigation steps for a department
 app.get('/api/navigation-steps/:departmentId', async (req, res) => {
   try {
@@ -893,7 +1197,86 @@ app.get('/api/navigation-steps-by-name/:departmentName', async (req, res) => {
 });
 
 // Get Admin Dashboard Statistics
-app.get('/api/admin/dashboard-stats', authenticateToken, async (req, res) => {
+// Dashboard stats are polled by every open dashboard: successful responses are cached per key
+// for a few seconds and concurrent misses wait for the one request already running the queries
+// (single-flight). X-Cache reports miss / hit / coalesced; ?cache=off bypasses the cache.
+// A leading request that ends without a JSON response (client abort, error, hang past the
+// in-flight deadline) is abandoned: its waiters run the queries themselves.
+const DASHBOARD_CACHE_TTL_MS = parseInt(process.env.DASHBOARD_CACHE_TTL_MS ?? '5000');
+const DASHBOARD_CACHE_INFLIGHT_MS = 30 * 1000;
+const dashboardStatsEntries = new Map();
+
+const pruneDashboardStats = () => {
+  const now = Date.now();
+  dashboardStatsEntries.forEach((entry, key) => {
+    if (entry.expiresAt !== null && entry.expiresAt <= now) {
+      dashboardStatsEntries.delete(key);
+    }
+  });
+};
+
+const dashboardStatsCache = (keyFor) => (req, res, next) => {
+  const key = req.query.cache === 'off' ? null : keyFor(req);
+  if (!key) {
+    return next();
+  }
+
+  const cached = dashboardStatsEntries.get(key);
+  if (cached && (cached.expiresAt === null || cached.expiresAt > Date.now())) {
+    res.set('X-Cache', cached.expiresAt === null ? 'coalesced' : 'hit');
+    return cached.promise
+      .then(({ status, body }) => res.status(status).json(body))
+      .catch(() => next());  // the leading request failed: run the queries for this one
+  }
+
+  let settle;
+  const entry = { expiresAt: null, promise: new Promise((resolve, reject) => { settle = { resolve, reject }; }) };
+  entry.promise.catch(() => {});
+  if (dashboardStatsEntries.size >= 1000) {
+    pruneDashboardStats();
+  }
+  dashboardStatsEntries.set(key, entry);
+
+  let pending = true;
+  const abandon = (reason) => {
+    if (!pending) {
+      return;
+    }
+    pending = false;
+    clearTimeout(deadline);
+    if (dashboardStatsEntries.get(key) === entry) {
+      dashboardStatsEntries.delete(key);
+    }
+    settle.reject(new Error(reason));
+  };
+  const deadline = setTimeout(() => abandon('dashboard stats timed out'), DASHBOARD_CACHE_INFLIGHT_MS);
+  deadline.unref();
+  res.on('close', () => abandon('dashboard stats request closed without a JSON response'));
+
+  const json = res.json;
+  res.json = function (body) {
+    if (!pending) {
+      return json.call(this, body);
+    }
+    if (res.statusCode === 200) {
+      pending = false;
+      clearTimeout(deadline);
+      entry.expiresAt = Date.now() + DASHBOARD_CACHE_TTL_MS;
+      settle.resolve({ status: res.statusCode, body });
+    } else {
+      abandon(`dashboard stats returned ${res.statusCode}`);
+    }
+    return json.call(this, body);
+  };
+
+  res.set('X-Cache', 'miss');
+  next();
+};
+
+const todayKey = () => new Date().toISOString().split('T')[0];
+
+app.get('/api/admin/dashboard-stats', authenticateToken,
+  dashboardStatsCache(req => req.user.type === 'admin' && `admin:${todayKey()}`), async (req, res) => {
   try {
     if (req.user.type !== 'admin') {
       return res.status(403).json({ error: 'Access denied' });
@@ -1042,6 +1425,27 @@ app.get('/api/admin/time-series-stats', authenticateToken, async (req, res) => {
     }
 
     const { period } = req.query;
+
+    // Grouped in the database from admin_daily_rollup (testing/time_series_rollups.sql);
+    // ?source=raw, or a database without the RPC, uses the row-by-row bucketing below
+    if (req.query.source !== 'raw' && ['daily', 'weekly', 'yearly'].includes(period)) {
+      const { data: rollupData, error: rollupError } = await supabase
+        .rpc('admin_time_series_stats', { p_period: period });
+
+      if (!rollupError) {
+        return res.status(200).json({
+          success: true,
+          timeSeriesData: rollupData.map(row => ({
+            date: row.bucket_date,
+            count: row.registrations,
+            registrations: row.registrations,
+            appointments: row.appointments,
+            completed: row.completed
+          }))
+        });
+      }
+      console.error('Time series rollup unavailable, bucketing raw rows:', rollupError.message);
+    }
     
     let timeSeriesData = [];
     
@@ -2159,9 +2563,164 @@ app.get('/api/symptoms', async (req, res) => {
   }
 });
 
+// Duplicate-registration prefilter: a Bloom filter over every stored outpatient email
+// and contact number. checkDuplicateUser only queries outpatient when the filter says
+// a value may already exist, so the common new-patient case is a local lookup; every
+// positive is still confirmed against the table. Deleted or edited patients leave
+// stale bits behind, which only cost a confirming query. The filter is filled at
+// startup, kept current by the registration insert and Supabase Realtime, and rebuilt
+// (resized) by the rebuildDuplicateFilter job once it holds more than its capacity.
+// DUPLICATE_PREFILTER=off sends every check to the database (for A/B comparisons).
+const DUPLICATE_PREFILTER_ENABLED = process.env.DUPLICATE_PREFILTER !== 'off';
+const DUPLICATE_FILTER_FALSE_POSITIVE_RATE = 0.01;
+const DUPLICATE_FILTER_MIN_CAPACITY = 100000;
+const DUPLICATE_FILTER_PAGE_SIZE = 1000;
+const DUPLICATE_FILTER_RETRY_MS = 60 * 1000;
+let duplicateFilter = null;           // null until the first build: checks go to the database
+let duplicateFilterBacklog = null;    // values inserted while a rebuild is paging outpatient
+
+const createBloomFilter = (capacity, falsePositiveRate) => {
+  const size = Math.ceil(-capacity * Math.log(falsePositiveRate) / (Math.LN2 * Math.LN2));
+  const hashCount = Math.max(1, Math.round((size / capacity) * Math.LN2));
+  const bits = new Uint32Array(Math.ceil(size / 32));
+
+  // Two 32-bit FNV-1a style hashes combined by double hashing (Kirsch-Mitzenmacher)
+  const positions = (value) => {
+    let h1 = 0x811c9dc5;
+    let h2 = 0x5bd1e995;
+    for (let i = 0; i < value.length; i++) {
+      const code = value.charCodeAt(i);
+      h1 = Math.imul(h1 ^ code, 0x01000193);
+      h2 = Math.imul(h2 ^ code, 0x5bd1e995) ^ (h2 >>> 15);
+    }
+    const result = [];
+    for (let k = 0; k < hashCount; k++) {
+      result.push(((h1 + Math.imul(k, h2 | 1)) >>> 0) % size);
+    }
+    return result;
+  };
+
+  const filter = {
+    capacity,
+    count: 0,
+    add(value) {
+      positions(value).forEach(bit => { bits[bit >>> 5] |= 1 << (bit & 31); });
+      filter.count++;
+    },
+    mightContain(value) {
+      return positions(value).every(bit => (bits[bit >>> 5] & (1 << (bit & 31))) !== 0);
+    }
+  };
+  return filter;
+};
+
+// Keys match checkDuplicateUser's query: stored values, compared exactly
+const duplicateFilterKeys = (patient) => [
+  patient.email ? `email:${patient.email}` : null,
+  patient.contact_no ? `phone:${patient.contact_no}` : null
+].filter(Boolean);
+
+const addToDuplicateFilter = (patient) => {
+  const keys = duplicateFilterKeys(patient);
+  if (duplicateFilterBacklog) {
+    duplicateFilterBacklog.push(...keys);
+  }
+  if (duplicateFilter) {
+    keys.forEach(key => duplicateFilter.add(key));
+    if (duplicateFilter.count > duplicateFilter.capacity && !duplicateFilterBacklog) {
+      buildDuplicateFilter();
+    }
+  }
+};
+
+const rebuildDuplicateFilter = async () => {
+  if (duplicateFilterBacklog) {
+    return { scanned: 0, changed: 0, skipped: 'rebuild already running' };
+  }
+  duplicateFilterBacklog = [];
+
+  try {
+    const { count, error: countError } = await supabase
+      .from('outpatient')
+      .select('*', { count: 'exact', head: true });
+
+    if (countError) {
+      throw countError;
+    }
+
+    // Room for the stored values (two per patient) plus as many again before the next resize
+    const filter = createBloomFilter(
+      Math.max(DUPLICATE_FILTER_MIN_CAPACITY, (count || 0) * 4),
+      DUPLICATE_FILTER_FALSE_POSITIVE_RATE
+    );
+    let scanned = 0;
+    let lastId = 0;
+
+    for (;;) {
+      const { data: patients, error } = await supabase
+        .from('outpatient')
+        .select('id, email, contact_no')
+        .gt('id', lastId)
+        .order('id', { ascending: true })
+        .limit(DUPLICATE_FILTER_PAGE_SIZE);
+
+      if (error) {
+        throw error;
+      }
+
+      (patients || []).forEach(patient => {
+        duplicateFilterKeys(patient).forEach(key => filter.add(key));
+      });
+      scanned += (patients || []).length;
+
+      if (!patients || patients.length < DUPLICATE_FILTER_PAGE_SIZE) {
+        break;
+      }
+      lastId = patients[patients.length - 1].id;
+    }
+
+    duplicateFilterBacklog.forEach(key => filter.add(key));
+    duplicateFilter = filter;
+    return { scanned, changed: filter.count, capacity: filter.capacity };
+  } finally {
+    duplicateFilterBacklog = null;
+  }
+};
+
+// Fire-and-forget build; until a first build succeeds it is retried, and checks go to the database
+const buildDuplicateFilter = () => {
+  runBackgroundJob('rebuildDuplicateFilter', rebuildDuplicateFilter).catch(error => {
+    console.error('❌ Duplicate filter build failed:', error.message || error);
+    if (!duplicateFilter) {
+      setTimeout(buildDuplicateFilter, DUPLICATE_FILTER_RETRY_MS);
+    }
+  });
+};
+
+if (DUPLICATE_PREFILTER_ENABLED) {
+  buildDuplicateFilter();
+}
+
+// Patients created outside this process; needs Realtime enabled for the outpatient table
+supabase
+  .channel('duplicate-filter')
+  .on('postgres_changes', { event: 'INSERT', schema: 'public', table: 'outpatient' }, (payload) => {
+    addToDuplicateFilter(payload.new);
+  })
+  .on('postgres_changes', { event: 'UPDATE', schema: 'public', table: 'outpatient' }, (payload) => {
+    addToDuplicateFilter(payload.new);
+  })
+  .subscribe();
+
 // Duplicate user check
 const checkDuplicateUser = async (email, contactNo) => {
   const cleanedPhone = contactNo.replace(/\D/g, '');
+
+  if (DUPLICATE_PREFILTER_ENABLED && duplicateFilter &&
+      !duplicateFilter.mightContain(`email:${email.toLowerCase()}`) &&
+      !duplicateFilter.mightContain(`phone:${cleanedPhone}`)) {
+    return { isDuplicate: false };
+  }
   
   try {
     const { data: existingPatients } = await supabase
@@ -2233,7 +2792,7 @@ app.post('/api/patient/register', async (req, res) => {
     }
 
     // Check for duplicates
-    const duplicateCheck = await checkDuplicateUser(email, contact_no);
+    const duplicateCheck = await req.timing.time('duplicate_check', checkDuplicateUser(email, contact_no));
     if (duplicateCheck.isDuplicate) {
       return res.status(400).json({
         error: duplicateCheck.message,
@@ -2248,11 +2807,11 @@ app.post('/api/patient/register', async (req, res) => {
     if (temp_id) {
       console.log('🔄 Processing temp registration with temp_id:', temp_id);
       
-      const { data: existingTempReg, error: fetchError } = await supabase
+      const { data: existingTempReg, error: fetchError } = await req.timing.time('temp_lookup', supabase
         .from('pre_registration')
         .select('*')
         .eq('temp_id', temp_id)
-        .single();
+        .single());
 
       if (fetchError || !existingTempReg) {
         console.error('❌ Temp registration not found:', fetchError);
@@ -2263,13 +2822,13 @@ app.post('/api/patient/register', async (req, res) => {
 
       console.log('✅ Found temp registration:', existingTempReg.temp_patient_id);
 
-      const { error: updateError } = await supabase
+      const { error: updateError } = await req.timing.time('temp_update', supabase
         .from('pre_registration')
         .update({ 
           status: 'processed', 
           updated_at: new Date().toISOString() 
         })
-        .eq('temp_id', temp_id);
+        .eq('temp_id', temp_id));
 
       if (updateError) {
         console.error('❌ Failed to update temp registration status:', updateError);
@@ -2283,12 +2842,12 @@ app.post('/api/patient/register', async (req, res) => {
     }
 
     // Generate patient ID
-    const patientId = `PAT${Date.now().toString().slice(-6)}${Math.floor(Math.random() * 1000).toString().padStart(3, '0')}`;
+    const patientId = generatePatientId();
     
     console.log('🆔 Generated patient ID:', patientId);
     
     // Insert into outpatient table
-    const { data: patientData, error: patientError } = await supabase
+    const { data: patientData, error: patientError } = await req.timing.time('patient_insert', supabase
       .from('outpatient')
       .insert({
         patient_id: patientId,
@@ -2303,7 +2862,7 @@ app.post('/api/patient/register', async (req, res) => {
         temp_id: temp_id || null
       })
       .select()
-      .single();
+      .single());
 
     if (patientError) {
       console.error('❌ Patient registration error:', patientError);
@@ -2324,17 +2883,18 @@ app.post('/api/patient/register', async (req, res) => {
     }
 
     console.log('✅ Patient created successfully:', patientData.patient_id);
+    addToDuplicateFilter(patientData);
 
     // Insert emergency contact
     if (emergency_contact_name && emergency_contact_relationship && emergency_contact_no) {
-      const { error: emergencyError } = await supabase
+      const { error: emergencyError } = await req.timing.time('emergency_insert', supabase
         .from('emergency_contact')
         .insert({
           patient_id: patientData.id,
           name: emergency_contact_name,
           relationship: emergency_contact_relationship,
           contact_number: emergency_contact_no.replace(/\D/g, '')
-        });
+        }));
 
       if (emergencyError) {
         console.error('⚠️ Emergency contact creation failed:', emergencyError);
@@ -2347,7 +2907,7 @@ app.post('/api/patient/register', async (req, res) => {
     const today = new Date().toISOString().split('T')[0];
     const currentTime = new Date().toTimeString().split(' ')[0];
 
-    const { data: visitData, error: visitError } = await supabase
+    const { data: visitData, error: visitError } = await req.timing.time('visit_insert', supabase
       .from('visit')
       .insert({
         patient_id: patientData.id,
@@ -2362,7 +2922,7 @@ app.post('/api/patient/register', async (req, res) => {
         medications: medications || null
       })
       .select()
-      .single();
+      .single());
 
     if (visitError) {
       console.error('❌ Visit creation error:', visitError);
@@ -2376,16 +2936,16 @@ app.post('/api/patient/register', async (req, res) => {
 
     // Assign department based on symptoms
     const symptomsList = Array.isArray(symptoms) ? symptoms : symptoms.split(', ');
-    const deptId = await assignDepartmentBySymptoms(symptomsList, patientData.age);
+    const deptId = await req.timing.time('department_assignment', assignDepartmentBySymptoms(symptomsList, patientData.age));
 
     // ✅ NEW: Calculate next available slot (handles both general and subspecialty)
-    const availabilityInfo = await calculateNextAvailableSlot(deptId);
+    const availabilityInfo = await req.timing.time('slot_calculation', calculateNextAvailableSlot(deptId));
 
-    const { data: deptData } = await supabase
+    const { data: deptData } = await req.timing.time('department_lookup', supabase
       .from('department')
       .select('name, is_scheduled, service_type')
       .eq('department_id', deptId)
-      .single();
+      .single());
 
     const recommendedDepartment = deptData?.name || 'Internal Medicine';
     console.log('✅ Assigned department:', recommendedDepartment);
@@ -2397,18 +2957,18 @@ app.post('/api/patient/register', async (req, res) => {
 
     if (!availabilityInfo.isScheduled || availabilityInfo.isToday) {
       // GENERAL DEPARTMENT or SUBSPECIALTY with availability TODAY
-      const { data: existingQueues } = await supabase
+      const { data: existingQueues } = await req.timing.time('queue_lookup', supabase
         .from('queue')
         .select('queue_no, visit!inner(visit_date)')
         .eq('department_id', deptId)
-        .eq('visit.visit_date', today);
+        .eq('visit.visit_date', today));
 
       const maxQueueNo = existingQueues?.length > 0 
         ? Math.max(...existingQueues.map(q => q.queue_no)) 
         : 0;
       queueNumber = maxQueueNo + 1;
 
-      const { data: createdQueue, error: queueError } = await supabase
+      const { data: createdQueue, error: queueError } = await req.timing.time('queue_insert', supabase
         .from('queue')
         .insert({
           visit_id: visitData.visit_id,
@@ -2418,10 +2978,11 @@ app.post('/api/patient/register', async (req, res) => {
           scheduled_date: today
         })
         .select()
-        .single();
+        .single());
 
       if (!queueError) {
         queueData = createdQueue;
+        notifyQueueChange(deptId);
         console.log('✅ Queue created successfully:', queueNumber);
       } else {
         console.error('⚠️ Queue creation error:', queueError);
@@ -2433,7 +2994,7 @@ app.post('/api/patient/register', async (req, res) => {
       // SUBSPECIALTY with FUTURE appointment
       queueNumber = availabilityInfo.queuePosition;
 
-      const { data: createdQueue, error: queueError } = await supabase
+      const { data: createdQueue, error: queueError } = await req.timing.time('queue_insert', supabase
         .from('queue')
         .insert({
           visit_id: visitData.visit_id,
@@ -2443,7 +3004,7 @@ app.post('/api/patient/register', async (req, res) => {
           scheduled_date: availabilityInfo.nextAvailableDate
         })
         .select()
-        .single();
+        .single());
 
       if (!queueError) {
         queueData = createdQueue;
@@ -2457,7 +3018,7 @@ app.post('/api/patient/register', async (req, res) => {
 
     // ✅ ORIGINAL: Update temp registration with next available date
     if (temp_id) {
-      const { error: updateTempError } = await supabase
+      const { error: updateTempError } = await req.timing.time('temp_schedule_update', supabase
         .from('pre_registration')
         .update({ 
           next_available_date: availabilityInfo.nextAvailableDate || today,
@@ -2465,7 +3026,7 @@ app.post('/api/patient/register', async (req, res) => {
           department_id: deptId,
           updated_at: new Date().toISOString() 
         })
-        .eq('temp_id', temp_id);
+        .eq('temp_id', temp_id));
 
       if (updateTempError) {
         console.error('❌ Failed to update temp registration with schedule info:', updateTempError);
@@ -2478,10 +3039,10 @@ app.post('/api/patient/register', async (req, res) => {
     if (temp_id && patientData) {
       console.log('🗑️ Deleting temp registration after successful patient creation');
       
-      const { error: deleteError } = await supabase
+      const { error: deleteError } = await req.timing.time('temp_delete', supabase
         .from('pre_registration')
         .delete()
-        .eq('temp_id', temp_id);
+        .eq('temp_id', temp_id));
 
       if (deleteError) {
         console.error('⚠️ Failed to delete temp registration (non-critical):', deleteError);
@@ -2542,12 +3103,350 @@ app.post('/api/patient/register', async (req, res) => {
     
     res.status(500).json({ 
       error: 'Internal server error',
-      details: error.message 
+      details: error.message 
+    });
+  }
+});
+
+// Batch registration import for kiosks replaying registrations queued while offline.
+// The whole batch shares one duplicate lookup, one symptom-mapping fetch, one slot
+// calculation per department and multi-row inserts for patients, emergency contacts,
+// visits and queue entries. Every item gets its own result, in request order; one
+// bad item never fails the rest. Pre-registrations (temp_id) still go through
+// /api/patient/register since each one has its own pre_registration row to settle.
+const REGISTRATION_BATCH_MAX = 500;
+const REGISTRATION_LOOKUP_CHUNK = 100;   // values per .in() filter, keeps the query URL short
+// Fields the batch normalises with string methods; a kiosk sending anything else gets an `invalid` item
+const REGISTRATION_STRING_FIELDS = ['name', 'birthday', 'sex', 'address', 'contact_no', 'email'];
+const REGISTRATION_OPTIONAL_STRING_FIELDS = ['emergency_contact_name', 'emergency_contact_relationship', 'emergency_contact_no'];
+
+// The first field of a batch item with the wrong type, or null
+const registrationTypeError = (item) => {
+  const field = REGISTRATION_STRING_FIELDS.find(key => typeof item[key] !== 'string') ||
+    REGISTRATION_OPTIONAL_STRING_FIELDS.find(key => item[key] != null && typeof item[key] !== 'string');
+  if (field) {
+    return { field, error: `${field} must be a string` };
+  }
+  if ((typeof item.age !== 'number' && typeof item.age !== 'string') || Number.isNaN(parseInt(item.age))) {
+    return { field: 'age', error: 'age must be a number' };
+  }
+  const { symptoms } = item;
+  if (symptoms != null && typeof symptoms !== 'string' &&
+      !(Array.isArray(symptoms) && symptoms.every(symptom => typeof symptom === 'string'))) {
+    return { field: 'symptoms', error: 'symptoms must be a string or an array of strings' };
+  }
+  return null;
+};
+
+// Rows of `table` whose `column` is one of `values`, looked up in chunks
+const selectIn = async (table, columns, column, values) => {
+  const rows = [];
+  for (let i = 0; i < values.length; i += REGISTRATION_LOOKUP_CHUNK) {
+    const { data, error } = await supabase
+      .from(table)
+      .select(columns)
+      .in(column, values.slice(i, i + REGISTRATION_LOOKUP_CHUNK));
+
+    if (error) {
+      throw error;
+    }
+    rows.push(...(data || []));
+  }
+  return rows;
+};
+
+const generatePatientId = () =>
+  `PAT${Date.now().toString().slice(-6)}${Math.floor(Math.random() * 1000).toString().padStart(3, '0')}`;
+
+app.post('/api/patient/register-batch', async (req, res) => {
+  try {
+    const { registrations } = req.body;
+
+    if (!Array.isArray(registrations) || registrations.length === 0) {
+      return res.status(400).json({ error: 'registrations must be a non-empty array' });
+    }
+
+    if (registrations.length > REGISTRATION_BATCH_MAX) {
+      return res.status(400).json({ error: `Maximum of ${REGISTRATION_BATCH_MAX} registrations per batch` });
+    }
+
+    console.log(`📥 Batch registration import: ${registrations.length} registrations`);
+
+    const results = registrations.map((item, index) => ({
+      index,
+      client_ref: item?.client_ref ?? null,
+      status: 'pending'
+    }));
+    const fail = (index, status, error, extra = {}) => Object.assign(results[index], { status, error, ...extra });
+
+    // Validate and normalise; the first occurrence of an email or phone in the batch wins
+    const seenEmails = new Map();
+    const seenPhones = new Map();
+    const pending = [];
+
+    registrations.forEach((item, index) => {
+      const { name, birthday, age, sex, address, contact_no, email, temp_id } = item || {};
+
+      if (!name || !birthday || !age || !sex || !address || !contact_no || !email) {
+        return fail(index, 'invalid', 'Missing required fields');
+      }
+      if (temp_id) {
+        return fail(index, 'invalid', 'Pre-registrations must be completed through /api/patient/register');
+      }
+      const typeError = registrationTypeError(item);
+      if (typeError) {
+        return fail(index, 'invalid', typeError.error, { field: typeError.field });
+      }
+
+      const normalizedEmail = email.toLowerCase();
+      const cleanedPhone = contact_no.replace(/\D/g, '');
+
+      if (seenEmails.has(normalizedEmail)) {
+        return fail(index, 'duplicate', 'Email is already in use', { field: 'email', duplicate_of: seenEmails.get(normalizedEmail) });
+      }
+      if (seenPhones.has(cleanedPhone)) {
+        return fail(index, 'duplicate', 'Contact number is already in use', { field: 'phone', duplicate_of: seenPhones.get(cleanedPhone) });
+      }
+
+      seenEmails.set(normalizedEmail, index);
+      seenPhones.set(cleanedPhone, index);
+      pending.push({ index, item, email: normalizedEmail, phone: cleanedPhone });
+    });
+
+    // Existing patients: only values the duplicate prefilter cannot rule out are looked up
+    const mayExist = (key) => !DUPLICATE_PREFILTER_ENABLED || !duplicateFilter || duplicateFilter.mightContain(key);
+    const [emailMatches, phoneMatches] = await req.timing.time('duplicate_check', Promise.all([
+      selectIn('outpatient', 'email', 'email', pending.map(p => p.email).filter(e => mayExist(`email:${e}`))),
+      selectIn('outpatient', 'contact_no', 'contact_no', pending.map(p => p.phone).filter(p => mayExist(`phone:${p}`)))
+    ]));
+    const existingEmails = new Set(emailMatches.map(row => row.email));
+    const existingPhones = new Set(phoneMatches.map(row => row.contact_no));
+
+    let accepted = pending.filter(p => {
+      if (existingEmails.has(p.email)) {
+        fail(p.index, 'duplicate', 'Email is already in use', { field: 'email' });
+        return false;
+      }
+      if (existingPhones.has(p.phone)) {
+        fail(p.index, 'duplicate', 'Contact number is already in use', { field: 'phone' });
+        return false;
+      }
+      return true;
+    });
+
+    // Department and slot for every registration: one mapping fetch, one slot calculation per department
+    const mappings = await req.timing.time('department_assignment', fetchSymptomMappings());
+    accepted.forEach(p => {
+      p.symptoms = Array.isArray(p.item.symptoms) ? p.item.symptoms : (p.item.symptoms ? p.item.symptoms.split(', ') : []);
+      p.departmentId = matchDepartmentBySymptoms(mappings, p.symptoms, parseInt(p.item.age));
+    });
+
+    const departmentIds = [...new Set(accepted.map(p => p.departmentId))];
+    const slots = new Map(await req.timing.time('slot_calculation', Promise.all(
+      departmentIds.map(async id => [id, await calculateNextAvailableSlot(id)])
+    )));
+    const calendar = await getDepartmentCalendar();
+
+    // Patients, in one insert; if any row is rejected, retry row by row to find which
+    const today = new Date().toISOString().split('T')[0];
+    const currentTime = new Date().toTimeString().split(' ')[0];
+    const issuedPatientIds = new Set();
+    const uniquePatientId = () => {
+      let patientId = generatePatientId();
+      while (issuedPatientIds.has(patientId)) {
+        patientId = generatePatientId();
+      }
+      issuedPatientIds.add(patientId);
+      return patientId;
+    };
+    const patientRow = (p) => ({
+      patient_id: uniquePatientId(),
+      name: p.item.name,
+      birthday: p.item.birthday,
+      age: parseInt(p.item.age),
+      sex: p.item.sex,
+      address: p.item.address,
+      contact_no: p.phone,
+      email: p.email,
+      registration_date: today,
+      temp_id: null
+    });
+
+    const { data: patients, error: patientError } = await req.timing.time('patient_insert', supabase
+      .from('outpatient')
+      .insert(accepted.map(patientRow))
+      .select());
+
+    if (!patientError) {
+      const byEmail = new Map((patients || []).map(patient => [patient.email, patient]));
+      accepted.forEach(p => { p.patient = byEmail.get(p.email); });
+    } else {
+      console.error('⚠️ Batch patient insert failed, inserting one by one:', patientError.message);
+      for (const p of accepted) {
+        const { data, error } = await supabase.from('outpatient').insert(patientRow(p)).select().single();
+        if (error) {
+          fail(p.index, 'failed', 'Patient registration failed', { details: error.message });
+        } else {
+          p.patient = data;
+        }
+      }
+    }
+    accepted = accepted.filter(p => p.patient);
+    accepted.forEach(p => addToDuplicateFilter(p.patient));
+
+    // Emergency contacts (non-critical, as in single registration)
+    const contacts = accepted
+      .filter(p => p.item.emergency_contact_name && p.item.emergency_contact_relationship && p.item.emergency_contact_no)
+      .map(p => ({
+        patient_id: p.patient.id,
+        name: p.item.emergency_contact_name,
+        relationship: p.item.emergency_contact_relationship,
+        contact_number: p.item.emergency_contact_no.replace(/\D/g, '')
+      }));
+
+    if (contacts.length > 0) {
+      const { error: emergencyError } = await req.timing.time('emergency_insert', supabase
+        .from('emergency_contact')
+        .insert(contacts));
+
+      if (emergencyError) {
+        console.error('⚠️ Batch emergency contact creation failed:', emergencyError);
+      }
+    }
+
+    // Visits
+    if (accepted.length > 0) {
+      const { data: visits, error: visitError } = await req.timing.time('visit_insert', supabase
+        .from('visit')
+        .insert(accepted.map(p => {
+          const isRoutineCareOnly = hasOnlyRoutineCareSymptoms(p.item.symptoms);
+          return {
+            patient_id: p.patient.id,
+            visit_date: today,
+            visit_time: currentTime,
+            appointment_type: 'Walk-in Registration',
+            symptoms: Array.isArray(p.item.symptoms) ? p.item.symptoms : p.symptoms.join(', '),
+            duration: isRoutineCareOnly ? null : p.item.duration,
+            severity: isRoutineCareOnly ? null : p.item.severity,
+            previous_treatment: p.item.previous_treatment || null,
+            allergies: p.item.allergies || null,
+            medications: p.item.medications || null
+          };
+        }))
+        .select());
+
+      if (visitError) {
+        console.error('❌ Batch visit creation error:', visitError);
+        accepted.forEach(p => fail(p.index, 'failed', 'Failed to create visit record',
+          { patient_id: p.patient.patient_id, details: visitError.message }));
+        accepted = [];
+      } else {
+        const byPatient = new Map((visits || []).map(visit => [visit.patient_id, visit]));
+        accepted.forEach(p => { p.visit = byPatient.get(p.patient.id); });
+      }
+    }
+
+    // Queue numbers: today's highest number per department once (one row each), future positions from the slot count
+    const todayDepartments = departmentIds.filter(id => {
+      const slot = slots.get(id);
+      return !slot.isScheduled || slot.isToday;
+    });
+    const nextQueueNo = new Map(todayDepartments.map(id => [id, 1]));
+
+    if (todayDepartments.length > 0 && accepted.length > 0) {
+      const latestQueues = await req.timing.time('queue_lookup', Promise.all(todayDepartments.map(id => supabase
+        .from('queue')
+        .select('queue_no, visit!inner(visit_date)')
+        .eq('department_id', id)
+        .eq('visit.visit_date', today)
+        .order('queue_no', { ascending: false })
+        .limit(1))));
+
+      latestQueues.forEach(({ data }, i) => {
+        if (data?.length > 0) {
+          nextQueueNo.set(todayDepartments[i], data[0].queue_no + 1);
+        }
+      });
+    }
+
+    const queueRows = [];
+    accepted.forEach(p => {
+      const slot = slots.get(p.departmentId);
+
+      if (!slot.isScheduled || slot.isToday) {
+        p.queueNumber = nextQueueNo.get(p.departmentId);
+        nextQueueNo.set(p.departmentId, p.queueNumber + 1);
+        p.appointmentStatus = 'immediate';
+        queueRows.push({ visit_id: p.visit.visit_id, department_id: p.departmentId, queue_no: p.queueNumber,
+                         status: 'waiting', scheduled_date: today });
+      } else if (slot.nextAvailableDate) {
+        p.queueNumber = slot.queuePosition;
+        slot.queuePosition += 1;
+        p.appointmentStatus = 'scheduled';
+        queueRows.push({ visit_id: p.visit.visit_id, department_id: p.departmentId, queue_no: p.queueNumber,
+                         status: 'scheduled', scheduled_date: slot.nextAvailableDate });
+      } else {
+        p.queueNumber = null;
+        p.appointmentStatus = 'immediate';
+      }
+    });
+
+    let queues = new Map();
+    if (queueRows.length > 0) {
+      const { data: createdQueues, error: queueError } = await req.timing.time('queue_insert', supabase
+        .from('queue')
+        .insert(queueRows)
+        .select());
+
+      if (queueError) {
+        console.error('⚠️ Batch queue creation error:', queueError);
+      } else {
+        queues = new Map((createdQueues || []).map(queue => [queue.visit_id, queue]));
+        todayDepartments.forEach(id => notifyQueueChange(id));
+      }
+    }
+
+    accepted.forEach(p => {
+      const slot = slots.get(p.departmentId);
+      Object.assign(results[p.index], {
+        status: 'registered',
+        patient_id: p.patient.patient_id,
+        visit_id: p.visit.visit_id,
+        queue_id: queues.get(p.visit.visit_id)?.queue_id ?? null,
+        queue_number: queues.has(p.visit.visit_id) ? p.queueNumber : null,
+        department_id: p.departmentId,
+        recommendedDepartment: calendar.departments.get(String(p.departmentId))?.name || 'Internal Medicine',
+        appointment_status: p.appointmentStatus,
+        appointment_date: p.appointmentStatus === 'scheduled' ? slot.nextAvailableDate : today,
+        time_slot: slot.timeSlot || null
+      });
+    });
+
+    const summary = results.reduce((counts, result) => {
+      counts[result.status] = (counts[result.status] || 0) + 1;
+      return counts;
+    }, {});
+    console.log('🎉 Batch registration import completed:', summary);
+
+    res.json({
+      success: true,
+      count: results.length,
+      summary,
+      results
+    });
+
+  } catch (error) {
+    console.error('💥 Batch registration error:', error);
+    res.status(500).json({
+      error: 'Internal server error',
+      details: error.message
     });
   }
 });
 
 const activateScheduledQueues = async () => {
+  const result = { scanned: 0, changed: 0 };
+
   try {
     const today = new Date().toISOString().split('T')[0];
     
@@ -2559,9 +3458,11 @@ const activateScheduledQueues = async () => {
       .eq('scheduled_date', today);
 
     if (fetchError || !scheduledQueues || scheduledQueues.length === 0) {
-      return;
+      return result;
     }
 
+    result.scanned = scheduledQueues.length;
+
     console.log(`✅ Activating ${scheduledQueues.length} scheduled appointments for today`);
 
     // Update status from 'scheduled' to 'waiting'
@@ -2574,16 +3475,20 @@ const activateScheduledQueues = async () => {
     if (updateError) {
       console.error('Failed to activate scheduled queues:', updateError);
     } else {
+      result.changed = scheduledQueues.length;
+      new Set(scheduledQueues.map(q => q.department_id)).forEach(notifyQueueChange);
       console.log('✅ Successfully activated scheduled queues for today');
     }
 
   } catch (error) {
     console.error('Activate scheduled queues error:', error);
   }
+
+  return result;
 };
 
-setInterval(activateScheduledQueues, 60 * 60 * 1000);
-activateScheduledQueues();
+setInterval(() => runBackgroundJob('activateScheduledQueues', activateScheduledQueues), 60 * 60 * 1000);
+runBackgroundJob('activateScheduledQueues', activateScheduledQueues);
 
 module.exports = {
   calculateNextAvailableSlot,
@@ -3260,7 +4165,7 @@ app.get('/api/healthcare/patient-history/:patientId', authenticateToken, async (
     const { page = 1, limit = 10 } = req.query;
     const offset = (page - 1) * limit;
 
-    const { data: patientData, error: patientError } = await supabase
+    const { data: patientData, error: patientError } = await req.timing.time('patient_lookup', supabase
       .from('outpatient')
       .select(`
         id,
@@ -3280,13 +4185,13 @@ app.get('/api/healthcare/patient-history/:patientId', authenticateToken, async (
         )
       `)
       .eq('patient_id', patientId)
-      .single();
+      .single());
 
     if (patientError || !patientData) {
       return res.status(404).json({ error: 'Patient not found' });
     }
 
-    const { data: visitHistory, error: visitError } = await supabase
+    const { data: visitHistory, error: visitError } = await req.timing.time('visit_history', supabase
       .from('visit')
       .select(`
         visit_id,
@@ -3316,17 +4221,17 @@ app.get('/api/healthcare/patient-history/:patientId', authenticateToken, async (
       .eq('patient_id', patientData.id)
       .order('visit_date', { ascending: false })
       .order('visit_time', { ascending: false })
-      .range(offset, offset + limit - 1);
+      .range(offset, offset + limit - 1));
 
     if (visitError) {
       console.error('Visit history error:', visitError);
       return res.status(500).json({ error: 'Failed to fetch visit history' });
     }
 
-    const { count: totalVisits } = await supabase
+    const { count: totalVisits } = await req.timing.time('visit_count', supabase
       .from('visit')
       .select('*', { count: 'exact', head: true })
-      .eq('patient_id', patientData.id);
+      .eq('patient_id', patientData.id));
 
     res.status(200).json({
       success: true,
@@ -3580,6 +4485,8 @@ app.patch('/api/healthcare/queue/:queueId/status', authenticateToken, async (req
       return res.status(500).json({ error: 'Failed to update queue status' });
     }
 
+    notifyQueueChange(updatedQueue.department_id);
+
     let diagnosisData = null;
     let medicalRecordData = null;
 
@@ -3654,14 +4561,18 @@ app.post('/api/healthcare/logout', authenticateToken, async (req, res) => {
 const markInactiveStaffOffline = async () => {
   const fiveMinutesAgo = new Date(Date.now() - 5 * 60 * 1000).toISOString();
   
-  await supabase
+  const { data: updatedStaff } = await supabase
     .from('staff')
     .update({ is_online: false })
     .lt('last_activity', fiveMinutesAgo)
-    .eq('is_online', true);
+    .eq('is_online', true)
+    .select('id');
+
+  // One filtered UPDATE: the rows it matched are exactly the rows it changed, so scanned === changed
+  return { scanned: updatedStaff?.length || 0, changed: updatedStaff?.length || 0 };
 };
 
-setInterval(markInactiveStaffOffline, 2 * 60 * 1000);
+setInterval(() => runBackgroundJob('markInactiveStaffOffline', markInactiveStaffOffline), 2 * 60 * 1000);
 
 // Visit/Appointment booking
 app.post('/api/patient/visit', async (req, res) => {
@@ -3763,6 +4674,8 @@ app.post('/api/patient/visit', async (req, res) => {
 
     if (queueError) {
       console.error('Queue creation error:', queueError);
+    } else {
+      notifyQueueChange(deptId);
     }
 
     // Return complete response
@@ -3856,138 +4769,152 @@ const generateHealthAssessmentId = () => {
 };
 
 // Cleanup expired registrations
+// Set-based pass: departments are read once, only rows whose preferred or next
+// available date has arrived are paged through (keyset on temp_id), and the
+// expired ones are deleted in batches instead of one department query per row.
+const CLEANUP_PAGE_SIZE = 1000;
+const CLEANUP_DELETE_BATCH = 200;     // temp_ids per DELETE (keeps the PostgREST URL short)
+
+const GENERAL_SLOT_END = {
+  morning: '12:00',
+  afternoon: '17:00',
+  evening: '20:00',
+  anytime: '20:00'
+};
+
+const isRegistrationExpired = (reg, dept, currentDate, currentTime) => {
+  // ✅ SUBSPECIALTY SERVICE CHECK (with time slots)
+  if (dept && reg.next_available_date && reg.next_available_time &&
+      dept.is_scheduled && dept.service_type === 'subspecialty') {
+    const nextDate = reg.next_available_date;
+    const timeSlot = reg.next_available_time;
+
+    // Parse end time from time slot (e.g., "08:00-17:00" -> "17:00")
+    const endTime = timeSlot.includes('-') ? timeSlot.split('-')[1] : '20:00';
+
+    // Past the end time of the next available slot; otherwise still within the waiting period
+    return currentDate > nextDate || (currentDate === nextDate && currentTime > endTime);
+  }
+
+  // ✅ GENERAL SERVICE CHECK
+  const appointmentDate = reg.preferred_date;
+  if (!appointmentDate) return false;
+
+  // Past date
+  if (appointmentDate < currentDate) return true;
+
+  // Same date - check time slot
+  if (appointmentDate === currentDate) {
+    const slotEnd = GENERAL_SLOT_END[reg.preferred_time_slot];
+    return slotEnd ? currentTime >= slotEnd : false;
+  }
+
+  return false;
+};
+
 const cleanupExpiredRegistrations = async () => {
+  const started = Date.now();
+  // `deleted` is what /api/admin/cleanup-expired has always returned; `changed` mirrors it for the job runner
+  const result = { scanned: 0, expired: 0, deleted: 0, changed: 0, pages: 0 };
+
   try {
     const now = new Date();
     const currentDate = now.toISOString().split('T')[0];
     const currentTime = `${now.getHours().toString().padStart(2, '0')}:${now.getMinutes().toString().padStart(2, '0')}`;
     
     console.log(`🧹 Starting cleanup at ${currentDate} ${currentTime}`);
-    
-    const { data: registrations, error: fetchError } = await supabase
-      .from('pre_registration')
-      .select(`
-        temp_id, 
-        temp_patient_id, 
-        name, 
-        preferred_date, 
-        preferred_time_slot, 
-        next_available_date,
-        next_available_time,
-        department_id, 
-        status
-      `)
-      .in('status', ['pending', 'completed']);
 
-    if (fetchError) {
-      console.error('❌ Error fetching registrations:', fetchError);
-      return;
-    }
+    const { data: departments, error: deptError } = await supabase
+      .from('department')
+      .select('department_id, is_scheduled, service_type, name');
 
-    if (!registrations || registrations.length === 0) {
-      console.log('✅ No registrations to clean');
-      return;
+    if (deptError) {
+      console.error('❌ Error fetching departments:', deptError);
+      return result;
     }
 
-    const expiredIds = [];
-    
-    for (const reg of registrations) {
-      // ✅ SUBSPECIALTY SERVICE CHECK (with time slots)
-      if (reg.department_id && reg.next_available_date && reg.next_available_time) {
-        const { data: dept } = await supabase
-          .from('department')
-          .select('is_scheduled, service_type, name, available_days')
-          .eq('department_id', reg.department_id)
-          .single();
+    const departmentsById = new Map((departments || []).map(dept => [dept.department_id, dept]));
+    let lastTempId = null;
 
-        if (dept && dept.is_scheduled && dept.service_type === 'subspecialty') {
-          const nextDate = reg.next_available_date;
-          const timeSlot = reg.next_available_time;
-          
-          // Parse end time from time slot (e.g., "08:00-17:00" -> "17:00")
-          let endTime = '20:00'; // Default fallback
-          if (timeSlot && timeSlot.includes('-')) {
-            endTime = timeSlot.split('-')[1];
-          }
-          
-          // Check if past the end time of the next available slot
-          if (currentDate > nextDate || 
-              (currentDate === nextDate && currentTime > endTime)) {
-            console.log(`🗑️ Subspecialty expired: ${reg.name} - ${dept.name} (due: ${nextDate} ${endTime})`);
-            expiredIds.push(reg.temp_id);
-            continue;
-          }
-          
-          // Still within waiting period
-          console.log(`⏳ Waiting for ${reg.name} - ${dept.name} (due: ${nextDate} ${endTime})`);
-          continue;
-        }
+    while (true) {
+      // Rows dated in the future cannot have expired yet, so they are never read
+      let page = supabase
+        .from('pre_registration')
+        .select(`
+          temp_id, 
+          name, 
+          preferred_date, 
+          preferred_time_slot, 
+          next_available_date,
+          next_available_time,
+          department_id
+        `)
+        .in('status', ['pending', 'completed'])
+        .or(`preferred_date.lte.${currentDate},next_available_date.lte.${currentDate}`)
+        .order('temp_id', { ascending: true })
+        .limit(CLEANUP_PAGE_SIZE);
+
+      if (lastTempId !== null) {
+        page = page.gt('temp_id', lastTempId);
       }
 
-      // ✅ GENERAL SERVICE CHECK (existing logic)
-      const appointmentDate = reg.preferred_date;
-      const timeSlot = reg.preferred_time_slot;
-      
-      if (!appointmentDate) continue;
-      
-      // Past date
-      if (appointmentDate < currentDate) {
-        expiredIds.push(reg.temp_id);
-        continue;
+      const { data: registrations, error: fetchError } = await page;
+
+      if (fetchError) {
+        console.error('❌ Error fetching registrations:', fetchError);
+        break;
       }
-      
-      // Same date - check time slot
-      if (appointmentDate === currentDate) {
-        let hasExpired = false;
-        
-        switch (timeSlot) {
-          case 'morning':
-            hasExpired = currentTime >= '12:00';
-            break;
-          case 'afternoon':
-            hasExpired = currentTime >= '17:00';
-            break;
-          case 'evening':
-            hasExpired = currentTime >= '20:00';
-            break;
-          case 'anytime':
-            hasExpired = currentTime >= '20:00';
-            break;
-          default:
-            hasExpired = false;
-        }
-        
-        if (hasExpired) {
-          console.log(`🗑️ General service expired: ${reg.name} (slot: ${timeSlot})`);
-          expiredIds.push(reg.temp_id);
+
+      if (!registrations || registrations.length === 0) {
+        break;
+      }
+
+      result.pages += 1;
+      result.scanned += registrations.length;
+      lastTempId = registrations[registrations.length - 1].temp_id;
+
+      const expiredIds = registrations
+        .filter(reg => isRegistrationExpired(reg, departmentsById.get(reg.department_id), currentDate, currentTime))
+        .map(reg => reg.temp_id);
+      result.expired += expiredIds.length;
+
+      for (let i = 0; i < expiredIds.length; i += CLEANUP_DELETE_BATCH) {
+        const batch = expiredIds.slice(i, i + CLEANUP_DELETE_BATCH);
+        const { error: deleteError } = await supabase
+          .from('pre_registration')
+          .delete()
+          .in('temp_id', batch);
+
+        if (deleteError) {
+          console.error('❌ Error deleting expired registrations:', deleteError);
+        } else {
+          result.deleted += batch.length;
+          result.changed += batch.length;
         }
       }
-    }
 
-    if (expiredIds.length === 0) {
-      console.log('✅ No expired registrations found');
-      return;
+      if (registrations.length < CLEANUP_PAGE_SIZE) {
+        break;
+      }
     }
 
-    // Delete expired registrations
-    const { error: deleteError } = await supabase
-      .from('pre_registration')
-      .delete()
-      .in('temp_id', expiredIds);
-
-    if (deleteError) {
-      console.error('❌ Error deleting expired registrations:', deleteError);
-      return;
+    if (result.expired === 0) {
+      console.log(`✅ No expired registrations found (${result.scanned} candidates checked)`);
+    } else {
+      console.log(`✅ Cleaned up ${result.deleted} expired registrations (${result.scanned} candidates checked)`);
     }
-    
-    console.log(`✅ Cleaned up ${expiredIds.length} expired registrations`);
       
   } catch (error) {
     console.error('💥 Cleanup job error:', error);
   }
+
+  result.duration_ms = Date.now() - started;
+  return result;
 };
 
 const cleanupUnusedQueueAndVisits = async () => {
+  const result = { scanned: 0, changed: 0 };
+
   try {
     const now = new Date();
     const currentDate = now.toISOString().split('T')[0];
@@ -4019,7 +4946,7 @@ const cleanupUnusedQueueAndVisits = async () => {
 
     if (queueFetchError) {
       console.error('❌ Error fetching expired queues:', queueFetchError);
-      return;
+      return result;
     }
 
     // Also check today's queues that are past their time slot
@@ -4061,21 +4988,19 @@ const cleanupUnusedQueueAndVisits = async () => {
 
     if (allExpiredQueues.length === 0) {
       console.log('✅ No expired queue records to clean');
-      return;
+      return result;
     }
 
+    result.scanned = allExpiredQueues.length;
     console.log(`📊 Found ${allExpiredQueues.length} expired queue records`);
 
     // ✅ NEW: Filter based on department schedule
     const toDelete = [];
+    const calendar = await getDepartmentCalendar();
     
     for (const queue of allExpiredQueues) {
       // Check if department is scheduled
-      const { data: dept } = await supabase
-        .from('department')
-        .select('is_scheduled, available_days, service_type')
-        .eq('department_id', queue.department_id)
-        .single();
+      const dept = calendar.departments.get(String(queue.department_id));
 
       if (dept && dept.is_scheduled && dept.service_type === 'subspecialty') {
         // Calculate if patient missed their next available date
@@ -4138,6 +5063,7 @@ const cleanupUnusedQueueAndVisits = async () => {
           .delete()
           .eq('visit_id', visitId);
 
+        result.changed += 1;
         console.log(`✅ Deleted unused visit/queue for returning patient "${patientName}"`);
 
       } else {
@@ -4159,6 +5085,8 @@ const cleanupUnusedQueueAndVisits = async () => {
           .delete()
           .eq('visit_id', visitId);
 
+        result.changed += 1;
+
         // 3. Delete any OTP records
         await supabase
           .from('otp_verification')
@@ -4196,9 +5124,13 @@ const cleanupUnusedQueueAndVisits = async () => {
   } catch (error) {
     console.error('💥 Cleanup job error:', error);
   }
+
+  return result;
 };
 
 const cleanupExpiredHealthAssessments = async () => {
+  const result = { scanned: 0, changed: 0 };
+
   try {
     const now = new Date();
     const currentDate = now.toISOString().split('T')[0];
@@ -4211,13 +5143,14 @@ const cleanupExpiredHealthAssessments = async () => {
 
     if (fetchError) {
       console.error('Error fetching health assessments for cleanup:', fetchError);
-      return;
+      return result;
     }
 
     if (!assessments || assessments.length === 0) {
-      return;
+      return result;
     }
 
+    result.scanned = assessments.length;
     const expiredIds = [];
     
     assessments.forEach(assessment => {
@@ -4258,7 +5191,7 @@ const cleanupExpiredHealthAssessments = async () => {
     });
 
     if (expiredIds.length === 0) {
-      return;
+      return result;
     }
 
     const { error: deleteError } = await supabase
@@ -4268,23 +5201,27 @@ const cleanupExpiredHealthAssessments = async () => {
 
     if (deleteError) {
       console.error('Error deleting expired health assessments:', deleteError);
-      return;
+      return result;
     }
+
+    result.changed = expiredIds.length;
       
   } catch (error) {
 console.error('Health assessment cleanup job error:', error);
   }
+
+  return result;
 };
 
 // Run cleanup every 30 minutes
-setInterval(cleanupExpiredRegistrations, 30 * 60 * 1000);
-setInterval(cleanupExpiredHealthAssessments, 30 * 60 * 1000);
-setInterval(cleanupUnusedQueueAndVisits, 30 * 60 * 1000);
+setInterval(() => runBackgroundJob('cleanupExpiredRegistrations', cleanupExpiredRegistrations), 30 * 60 * 1000);
+setInterval(() => runBackgroundJob('cleanupExpiredHealthAssessments', cleanupExpiredHealthAssessments), 30 * 60 * 1000);
+setInterval(() => runBackgroundJob('cleanupUnusedQueueAndVisits', cleanupUnusedQueueAndVisits), 30 * 60 * 1000);
 
 // Run cleanup on server start
-cleanupExpiredRegistrations();
-cleanupExpiredHealthAssessments();
-cleanupUnusedQueueAndVisits();
+runBackgroundJob('cleanupExpiredRegistrations', cleanupExpiredRegistrations);
+runBackgroundJob('cleanupExpiredHealthAssessments', cleanupExpiredHealthAssessments);
+runBackgroundJob('cleanupUnusedQueueAndVisits', cleanupUnusedQueueAndVisits);
 
 // Manual cleanup endpoint
 app.post('/api/admin/cleanup-expired', authenticateToken, async (req, res) => {
@@ -4293,11 +5230,12 @@ app.post('/api/admin/cleanup-expired', authenticateToken, async (req, res) => {
       return res.status(403).json({ error: 'Admin access required' });
     }
 
-    await cleanupExpiredRegistrations();
+    const result = await runBackgroundJob('cleanupExpiredRegistrations', cleanupExpiredRegistrations);
     
     res.json({
       success: true,
-      message: 'Cleanup completed successfully'
+      message: 'Cleanup completed successfully',
+      result
     });
     
   } catch (error) {
@@ -4306,6 +5244,64 @@ app.post('/api/admin/cleanup-expired', authenticateToken, async (req, res) => {
   }
 });
 
+// Admin job control: run any scheduled job now, synchronously, inside its own
+// Supabase call trace, and report what it did (used by testing/job_scaling.py)
+const BACKGROUND_JOBS = {
+  cleanupExpiredRegistrations,
+  cleanupExpiredHealthAssessments,
+  cleanupUnusedQueueAndVisits,
+  markInactiveStaffOffline,
+  activateScheduledQueues,
+  refreshDepartmentCalendar,
+  rebuildDuplicateFilter
+};
+
+app.get('/api/admin/jobs', authenticateToken, (req, res) => {
+  if (req.user.type !== 'admin') {
+    return res.status(403).json({ error: 'Admin access required' });
+  }
+
+  res.json({
+    success: true,
+    jobs: Object.keys(BACKGROUND_JOBS).map(name => ({
+      name,
+      last_run: backgroundJobRuns.filter(run => run.job === name).pop() || null
+    }))
+  });
+});
+
+app.post('/api/admin/jobs/:job/run', authenticateToken, async (req, res) => {
+  try {
+    if (req.user.type !== 'admin') {
+      return res.status(403).json({ error: 'Admin access required' });
+    }
+
+    const name = req.params.job;
+    if (!Object.prototype.hasOwnProperty.call(BACKGROUND_JOBS, name)) {
+      return res.status(404).json({ error: 'Unknown job', jobs: Object.keys(BACKGROUND_JOBS) });
+    }
+
+    const trace = { start: process.hrtime.bigint(), calls: [], resultRows: null };
+    const result = await supabaseCallContext.run(trace, () => runBackgroundJob(name, BACKGROUND_JOBS[name]));
+
+    res.json({
+      success: true,
+      job: name,
+      elapsed_ms: elapsedMs(trace.start),
+      rows_scanned: result?.scanned ?? null,
+      rows_changed: result?.changed ?? null,
+      supabase_calls: SUPABASE_FETCH_TRACEABLE ? trace.calls.length : null,
+      round_trips: SUPABASE_FETCH_TRACEABLE ? countRoundTrips(trace.calls) : null,
+      supabase_ms: SUPABASE_FETCH_TRACEABLE ? trace.calls.reduce((sum, call) => sum + (call.dur_ms || 0), 0) : null,
+      result
+    });
+
+  } catch (error) {
+    console.error('Job run error:', error);
+    res.status(500).json({ error: 'Job failed', details: error.message });
+  }
+});
+
 // Appointment date validation
 const validateAppointmentDate = (preferredDate) => {
   if (!preferredDate) return null;
@@ -4342,7 +5338,7 @@ app.post('/api/temp-registration', async (req, res) => {
     } = req.body;
 
     // Check for duplicates BEFORE processing
-    const duplicateCheck = await checkDuplicateUser(email, contact_no);
+    const duplicateCheck = await req.timing.time('duplicate_check', checkDuplicateUser(email, contact_no));
     if (duplicateCheck.isDuplicate) {
       return res.status(400).json({
         error: duplicateCheck.message,
@@ -4363,7 +5359,7 @@ app.post('/api/temp-registration', async (req, res) => {
     const temp_patient_id = generateTempPatientId();
 
     // Insert into tempReg table
-    const { data: tempRegData, error: tempRegError } = await supabase
+    const { data: tempRegData, error: tempRegError } = await req.timing.time('pre_registration_insert', supabase
       .from('pre_registration')
       .insert({
         name,
@@ -4391,7 +5387,7 @@ app.post('/api/temp-registration', async (req, res) => {
         created_date: new Date().toISOString().split('T')[0]
       })
       .select()
-      .single();
+      .single());
 
     if (tempRegError) {
       console.error('💥 Temp registration error:', tempRegError);
@@ -4916,6 +5912,36 @@ app.get('/api/debug/token', authenticateToken, (req, res) => {
   });
 });
 
+// Supabase call traces (only with SUPABASE_CALL_TRACE=1), read by testing/supabase_calls.py
+app.get('/api/debug/supabase-calls', authenticateToken, (req, res) => {
+  if (req.user.type !== 'admin') {
+    return res.status(403).json({ error: 'Admin access required' });
+  }
+  if (!SUPABASE_CALL_TRACE) {
+    return res.status(404).json({ error: 'Supabase call tracing is disabled (set SUPABASE_CALL_TRACE=1)' });
+  }
+  const since = parseInt(req.query.since) || 0;
+  res.json({
+    success: true,
+    latest_id: supabaseTraceSeq,
+    traces: supabaseTraceLog.filter(trace => trace.id > since)
+  });
+});
+
+// Background job runs after id `since`, read by testing/loop_stall_probe.py
+app.get('/api/debug/background-jobs', authenticateToken, (req, res) => {
+  if (req.user.type !== 'admin') {
+    return res.status(403).json({ error: 'Admin access required' });
+  }
+  const since = parseInt(req.query.since) || 0;
+  res.json({
+    success: true,
+    server_time: Date.now(),
+    latest_id: backgroundJobSeq,
+    runs: backgroundJobRuns.filter(run => run.id > since)
+  });
+});
+
 // Generate QR email
 app.post('/api/generate-qr-email', async (req, res) => {
   try {
@@ -5108,12 +6134,12 @@ app.get('/api/temp-registration/:tempPatientId', async (req, res) => {
   try {
     const { tempPatientId } = req.params;
     
-    const { data: regData, error: regError } = await supabase
+    const { data: regData, error: regError } = await req.timing.time('pre_registration_lookup', supabase
       .from('pre_registration')
       .select('*')
       .eq('temp_patient_id', tempPatientId)
       .in('status', ['completed', 'pending'])
-      .single();
+      .single());
     
     if (regError || !regData) {
       return res.status(404).json({
@@ -5227,6 +6253,12 @@ app.get('/api/health', (req, res) => {
     status: 'OK',
     message: 'CliCare Admin Backend is running',
     timestamp: new Date().toISOString(),
+    process: {
+      uptime_s: process.uptime(),
+      cpu_user_ms: process.cpuUsage().user / 1000,
+      cpu_system_ms: process.cpuUsage().system / 1000,
+      rss_mb: process.memoryUsage().rss / 1048576
+    },
     env: {
       emailConfigured: !!process.env.EMAIL_USER,
       smsConfigured: isSMSConfigured,
@@ -6334,7 +7366,9 @@ app.get('/api/healthcare/my-patients-queue', authenticateToken, async (req, res)
 });
 
 
-app.get('/api/healthcare/dashboard-stats', authenticateToken, async (req, res) => {
+// Keyed per doctor (the counts are filtered by staff_id and the staff member's department)
+app.get('/api/healthcare/dashboard-stats', authenticateToken,
+  dashboardStatsCache(req => req.user.type === 'healthcare' && `healthcare:${req.user.id}:${req.query.date || todayKey()}`), async (req, res) => {
   try {
     if (req.user.type !== 'healthcare') {
       return res.status(403).json({ error: 'Access denied' });
@@ -6500,26 +7534,26 @@ app.post('/api/healthcare/lab-requests', authenticateToken, async (req, res) =>
       return res.status(400).json({ error: 'Patient ID, test name, and test type are required' });
     }
 
-    const { data: patientData } = await supabase
+    const { data: patientData } = await req.timing.time('patient_lookup', supabase
       .from('outpatient')
       .select('id, patient_id, name')
       .eq('patient_id', patient_id)
-      .single();
+      .single());
 
     if (!patientData) {
       return res.status(404).json({ error: 'Patient not found' });
     }
 
     const today = new Date().toISOString().split('T')[0];
-    let { data: visitData } = await supabase
+    let { data: visitData } = await req.timing.time('visit_lookup', supabase
       .from('visit')
       .select('visit_id')
       .eq('patient_id', patientData.id)
       .eq('visit_date', today)
-      .single();
+      .single());
 
     if (!visitData) {
-      const { data: newVisit, error: visitError } = await supabase
+      const { data: newVisit, error: visitError } = await req.timing.time('visit_insert', supabase
         .from('visit')
         .insert({
           patient_id: patientData.id,
@@ -6529,7 +7563,7 @@ app.post('/api/healthcare/lab-requests', authenticateToken, async (req, res) =>
           symptoms: 'Lab test requested'
         })
         .select()
-        .single();
+        .single());
 
       if (visitError) {
         return res.status(500).json({ error: 'Failed to create visit record' });
@@ -6537,7 +7571,7 @@ app.post('/api/healthcare/lab-requests', authenticateToken, async (req, res) =>
       visitData = newVisit;
     }
 
-    const { data: labRequestData, error: labRequestError } = await supabase
+    const { data: labRequestData, error: labRequestError } = await req.timing.time('lab_request_insert', supabase
       .from('lab_request')
       .insert({
         visit_id: visitData.visit_id,
@@ -6547,7 +7581,7 @@ app.post('/api/healthcare/lab-requests', authenticateToken, async (req, res) =>
         status: 'pending'
       })
       .select()
-      .single();
+      .single());
 
     if (labRequestError) {
       console.error('Lab request creation error:', labRequestError);
@@ -6732,71 +7766,80 @@ app.get('/api/healthcare/medical-records/:patientId', authenticateToken, async (
 });
 
 // Queue Display API - Get current queue status for TV monitor
+const buildQueueDisplay = async (departmentId) => {
+  const today = new Date().toISOString().split('T')[0];
+
+  // Get department name
+  const { data: department, error: deptError } = await supabase
+    .from('department')
+    .select('name')
+    .eq('department_id', departmentId)
+    .single();
+
+  if (deptError) {
+    return null;
+  }
+
+  // Get current patient being served (status = 'in_progress')
+  const { data: currentPatient } = await supabase
+    .from('queue')
+    .select(`
+      queue_no,
+      visit!inner(
+        visit_date
+      )
+    `)
+    .eq('department_id', departmentId)
+    .eq('status', 'in_progress')
+    .eq('visit.visit_date', today)
+    .maybeSingle();
+
+  // Get waiting patients (status = 'waiting')
+  const { data: waitingPatients } = await supabase
+    .from('queue')
+    .select(`
+      queue_id,
+      queue_no,
+      created_time,
+      visit!inner(
+        visit_date
+      )
+    `)
+    .eq('department_id', departmentId)
+    .eq('status', 'waiting')
+    .eq('visit.visit_date', today)
+    .order('queue_no', { ascending: true });
+
+  // Calculate wait times
+  const now = new Date();
+  const formattedWaiting = (waitingPatients || []).map(patient => ({
+    queue_id: patient.queue_id,
+    queue_no: patient.queue_no,
+    wait_minutes: Math.floor((now - new Date(patient.created_time)) / 60000)
+  }));
+
+  return {
+    success: true,
+    departmentName: department.name,
+    current: currentPatient ? {
+      queue_no: currentPatient.queue_no
+    } : null,
+    waiting: formattedWaiting
+  };
+};
+
 app.get('/api/queue/display/:departmentId', async (req, res) => {
   try {
-    const { departmentId } = req.params;
-    const today = new Date().toISOString().split('T')[0];
-
-    // Get department name
-    const { data: department, error: deptError } = await supabase
-      .from('department')
-      .select('name')
-      .eq('department_id', departmentId)
-      .single();
+    const display = await buildQueueDisplay(req.params.departmentId);
 
-    if (deptError) {
+    if (!display) {
       return res.status(404).json({ 
         success: false, 
         error: 'Department not found' 
       });
     }
 
-    // Get current patient being served (status = 'in_progress')
-    const { data: currentPatient } = await supabase
-      .from('queue')
-      .select(`
-        queue_no,
-        visit!inner(
-          visit_date
-        )
-      `)
-      .eq('department_id', departmentId)
-      .eq('status', 'in_progress')
-      .eq('visit.visit_date', today)
-      .maybeSingle();
-
-    // Get waiting patients (status = 'waiting')
-    const { data: waitingPatients } = await supabase
-      .from('queue')
-      .select(`
-        queue_id,
-        queue_no,
-        created_time,
-        visit!inner(
-          visit_date
-        )
-      `)
-      .eq('department_id', departmentId)
-      .eq('status', 'waiting')
-      .eq('visit.visit_date', today)
-      .order('queue_no', { ascending: true });
-
-    // Calculate wait times
-    const now = new Date();
-    const formattedWaiting = (waitingPatients || []).map(patient => ({
-      queue_id: patient.queue_id,
-      queue_no: patient.queue_no,
-      wait_minutes: Math.floor((now - new Date(patient.created_time)) / 60000)
-    }));
-
-    res.json({
-      success: true,
-      departmentName: department.name,
-      current: currentPatient ? {
-        queue_no: currentPatient.queue_no
-      } : null,
-      waiting: formattedWaiting
-    });
+    res.json(display);
 
   } catch (error) {
     console.error('Queue display API error:', error);
@@ -6807,6 +7850,135 @@ app.get('/api/queue/display/:departmentId', async (req, res) => {
   }
 });
 
+// Queue Display push channel (Server-Sent Events): the displays of a department
+// share one subscription. A queue insert / status change calls notifyQueueChange,
+// which rebuilds the display once and writes it to every open stream, so the
+// Supabase reads scale with queue changes instead of with the number of screens.
+const QUEUE_DISPLAY_DEBOUNCE_MS = 250;        // coalesce bursts of queue updates
+const QUEUE_DISPLAY_REFRESH_MS = 30 * 1000;   // keeps wait_minutes current and the connection alive
+const QUEUE_DISPLAY_MAX_STREAMS_PER_IP = parseInt(process.env.QUEUE_DISPLAY_MAX_STREAMS_PER_IP) || 20;
+const queueDisplayChannels = new Map();       // departmentId -> { clients, pending, refresh }
+const queueDisplayStreamsByIp = new Map();    // req.ip -> open stream count
+
+const publishQueueDisplay = async (departmentId) => {
+  const channel = queueDisplayChannels.get(departmentId);
+  if (!channel) {
+    return;
+  }
+
+  // Runs in its own call trace: a debounced push belongs to no inbound request
+  const trace = SUPABASE_CALL_TRACE ? { start: process.hrtime.bigint(), calls: [], resultRows: null } : null;
+  try {
+    const display = await supabaseCallContext.run(trace, () => buildQueueDisplay(departmentId));
+    if (trace) {
+      trace.resultRows = largestArrayLength(display);
+      recordSupabaseTrace('PUSH /api/queue/display/:departmentId/stream', display ? 200 : 404, trace);
+    }
+    if (!display) {
+      return;
+    }
+    const event = `data: ${JSON.stringify(display)}\n\n`;
+    channel.clients.forEach(client => client.write(event));
+  } catch (error) {
+    console.error('Queue display push error:', error);
+  }
+};
+
+const notifyQueueChange = (departmentId) => {
+  const channel = queueDisplayChannels.get(String(departmentId));
+  if (!channel || channel.pending) {
+    return;
+  }
+  channel.pending = setTimeout(() => {
+    channel.pending = null;
+    publishQueueDisplay(String(departmentId));
+  }, QUEUE_DISPLAY_DEBOUNCE_MS);
+};
+
+app.get('/api/queue/display/:departmentId/stream', queueDisplayStreamLimiter, async (req, res) => {
+  const departmentId = String(req.params.departmentId);
+  let channel = null;
+  let closed = false;
+
+  const openStreams = queueDisplayStreamsByIp.get(req.ip) || 0;
+  if (openStreams >= QUEUE_DISPLAY_MAX_STREAMS_PER_IP) {
+    return res.status(429).json({
+      success: false,
+      error: 'Too many open queue display connections'
+    });
+  }
+  queueDisplayStreamsByIp.set(req.ip, openStreams + 1);
+
+  // Registered before the first await so a display that disconnects while the
+  // initial state is built is never added to the channel
+  res.on('close', () => {
+    closed = true;
+    const remaining = (queueDisplayStreamsByIp.get(req.ip) || 1) - 1;
+    if (remaining > 0) {
+      queueDisplayStreamsByIp.set(req.ip, remaining);
+    } else {
+      queueDisplayStreamsByIp.delete(req.ip);
+    }
+    if (!channel) {
+      return;
+    }
+    channel.clients.delete(res);
+    if (channel.clients.size === 0 && queueDisplayChannels.get(departmentId) === channel) {
+      clearInterval(channel.refresh);
+      clearTimeout(channel.pending);
+      queueDisplayChannels.delete(departmentId);
+    }
+  });
+
+  try {
+    const display = await buildQueueDisplay(departmentId);
+
+    if (closed) {
+      return;
+    }
+
+    if (!display) {
+      return res.status(404).json({ 
+        success: false, 
+        error: 'Department not found' 
+      });
+    }
+
+    res.set({
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      'Connection': 'keep-alive',
+      'X-Accel-Buffering': 'no'
+    });
+    res.flushHeaders();
+    res.write(`retry: 5000\ndata: ${JSON.stringify(display)}\n\n`);
+
+    // The stream never finishes, so its connect-time reads are traced here
+    const trace = supabaseCallContext.getStore();
+    if (trace) {
+      trace.resultRows = largestArrayLength(display);
+      recordSupabaseTrace(`GET ${req.baseUrl + req.route.path}`, 200, trace);
+    }
+
+    channel = queueDisplayChannels.get(departmentId);
+    if (!channel) {
+      channel = { clients: new Set(), pending: null, refresh: null };
+      channel.refresh = setInterval(() => publishQueueDisplay(departmentId), QUEUE_DISPLAY_REFRESH_MS);
+      queueDisplayChannels.set(departmentId, channel);
+    }
+    channel.clients.add(res);
+
+  } catch (error) {
+    console.error('Queue display stream error:', error);
+    if (!res.headersSent) {
+      res.status(500).json({ 
+        success: false, 
+        error: 'Internal server error' 
+      });
+    }
+  }
+});
+
 app.get('/api/queue/by-date/:departmentId/:date', async (req, res) => {
   try {
     const { departmentId, date } = req.params;
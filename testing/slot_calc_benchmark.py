@@ -0,0 +1,180 @@
+"""
+CliCare Testing - Slot Calculation Microbenchmark
+Drives the temp-registration flow (POST /api/temp-registration, then
+POST /api/patient/register with the temp_id) with symptoms that map to
+scheduled subspecialty departments, and reads the slot_calculation phase
+from each registration's Server-Timing header.
+
+Reports per department: slot-calculation cost per request (mean / p50 / p95),
+its share of the whole registration, and Supabase calls per registration when
+the server runs with SUPABASE_CALL_TRACE=1. Run it once per server build with
+--label (e.g. before / after the department calendar) and compare the CSVs.
+
+Run:
+  python slot_calc_benchmark.py [--requests 30] [--label calendar]
+The registrations create real patients; cleanup SQL is written to the output
+directory.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import requests
+
+from telemetry import parse_server_timing
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_BASE = "http://localhost:5000"
+OUTPUT_DIR = "slot_calc_benchmark_results"
+
+REQUESTS_PER_DEPARTMENT = 30
+PATIENT_MARKER = 'Slot Benchmark Patient'
+PATIENT_AGE = 34
+
+# ============================================================================
+# SCHEDULED DEPARTMENTS
+# ============================================================================
+
+def scheduled_department_symptoms():
+    """{department_id: (name, symptom)} for scheduled subspecialties with a mapped symptom"""
+    mappings = requests.get(f"{API_BASE}/api/symptom-department-mapping", timeout=15).json()['mappings']
+    candidates = {}
+    for mapping in mappings:
+        age_min, age_max = mapping.get('age_min'), mapping.get('age_max')
+        if (age_min is not None and PATIENT_AGE < age_min) or (age_max is not None and PATIENT_AGE > age_max):
+            continue
+        candidates.setdefault(mapping['department_id'], mapping['symptom_name'])
+
+    scheduled = {}
+    for department_id, symptom in candidates.items():
+        response = requests.get(f"{API_BASE}/api/department-info/{department_id}", timeout=15)
+        if response.status_code != 200:
+            continue
+        department = response.json()['department']
+        if department.get('is_scheduled') and department.get('service_type') == 'subspecialty':
+            scheduled[department_id] = (department['name'], symptom)
+    return scheduled
+
+# ============================================================================
+# REGISTRATIONS
+# ============================================================================
+
+def register_once(symptom, i):
+    """Temp registration + registration; returns the registration's timing row"""
+    stamp = int(time.time() * 1000000) + i
+    patient = {
+        "name": f"{PATIENT_MARKER} {i} {stamp}",
+        "birthday": "1990-01-01",
+        "age": PATIENT_AGE,
+        "sex": "Female" if i % 2 else "Male",
+        "address": f"{i} Benchmark St, Test City",
+        "contact_no": f"09{(stamp % 900000000) + 100000000}",
+        "email": f"slotbench{stamp}@testclicare.com",
+        "symptoms": [symptom],
+        "duration": "3 days",
+        "severity": "Moderate"
+    }
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    temp = requests.post(f"{API_BASE}/api/temp-registration", timeout=30, json={
+        **patient, "preferred_date": tomorrow, "preferred_time_slot": "morning", "status": "completed"})
+    if temp.status_code != 201:
+        print(f"⚠️  API Error: {temp.status_code} - {temp.text[:200]}")
+        return None
+
+    start = time.perf_counter()
+    response = requests.post(f"{API_BASE}/api/patient/register", timeout=30,
+                             json={**patient, "temp_id": temp.json()['temp_id']})
+    client_ms = (time.perf_counter() - start) * 1000
+    phases = parse_server_timing(response.headers.get('Server-Timing'))
+    calls = response.headers.get('X-Supabase-Calls')
+    return {
+        'status': response.status_code,
+        'client_ms': client_ms,
+        'slot_calculation_ms': phases.get('slot_calculation'),
+        'server_total_ms': phases.get('total'),
+        'supabase_calls': int(calls) if calls is not None else None,
+        'scheduled_date': (response.json().get('queue') or {}).get('scheduled_date') if response.ok else None
+    }
+
+def summarize(df):
+    """Per department slot-calculation cost"""
+    rows = []
+    for (department_id, department), group in df[df['status'] == 201].groupby(['department_id', 'department']):
+        slot = group['slot_calculation_ms'].dropna().to_numpy(dtype=float)
+        total = group['server_total_ms'].dropna().to_numpy(dtype=float)
+        rows.append({
+            'department_id': department_id,
+            'department': department,
+            'registrations': len(group),
+            'slot_mean_ms': round(slot.mean(), 2) if slot.size else None,
+            'slot_p50_ms': round(np.percentile(slot, 50), 2) if slot.size else None,
+            'slot_p95_ms': round(np.percentile(slot, 95), 2) if slot.size else None,
+            'slot_share_of_server_%': round(slot.sum() / total.sum() * 100, 1) if slot.size and total.sum() else None,
+            'supabase_calls_per_registration': round(group['supabase_calls'].mean(), 2)
+                                               if group['supabase_calls'].notna().any() else None
+        })
+    return pd.DataFrame(rows)
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Slot-calculation cost per temp registration for scheduled departments")
+    parser.add_argument('--requests', type=int, default=REQUESTS_PER_DEPARTMENT, help="Registrations per department")
+    parser.add_argument('--label', default='current', help="Build label used in the output file names")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    departments = scheduled_department_symptoms()
+    if not departments:
+        print("❌ No scheduled subspecialty department has a symptom mapping")
+        return 2
+
+    rows = []
+    for department_id, (name, symptom) in departments.items():
+        print(f"🗓️  {name} (symptom: {symptom})")
+        for i in range(args.requests):
+            row = register_once(symptom, len(rows))
+            if row:
+                rows.append({'label': args.label, 'department_id': department_id, 'department': name, **row})
+
+    df = pd.DataFrame(rows)
+    if df.empty:
+        print("❌ No registrations completed")
+        return 1
+    summary = summarize(df)
+
+    df.to_csv(f"{OUTPUT_DIR}/slot_calc_requests_{args.label}.csv", index=False)
+    summary.to_csv(f"{OUTPUT_DIR}/slot_calc_summary_{args.label}.csv", index=False)
+    with open(f"{OUTPUT_DIR}/slot_calc_cleanup.sql", 'w') as f:
+        f.write(f"""-- Remove the slot benchmark patients
+DELETE FROM queue WHERE visit_id IN (SELECT visit_id FROM visit WHERE patient_id IN (
+    SELECT id FROM outpatient WHERE name LIKE '{PATIENT_MARKER}%'));
+DELETE FROM visit WHERE patient_id IN (SELECT id FROM outpatient WHERE name LIKE '{PATIENT_MARKER}%');
+DELETE FROM emergency_contact WHERE patient_id IN (SELECT id FROM outpatient WHERE name LIKE '{PATIENT_MARKER}%');
+DELETE FROM outpatient WHERE name LIKE '{PATIENT_MARKER}%';
+DELETE FROM pre_registration WHERE name LIKE '{PATIENT_MARKER}%';
+""")
+
+    fmt = lambda v, spec: '-' if v is None or pd.isna(v) else format(v, spec)
+    print(f"\n{'DEPARTMENT':<28} {'N':>4} {'MEAN MS':>9} {'P50 MS':>9} {'P95 MS':>9} {'SHARE %':>7} {'CALLS':>6}")
+    for _, row in summary.iterrows():
+        print(f"{row['department'][:27]:<28} {row['registrations']:>4} {fmt(row['slot_mean_ms'], '.2f'):>9} "
+              f"{fmt(row['slot_p50_ms'], '.2f'):>9} {fmt(row['slot_p95_ms'], '.2f'):>9} "
+              f"{fmt(row['slot_share_of_server_%'], '.1f'):>7} {fmt(row['supabase_calls_per_registration'], '.1f'):>6}")
+    print(f"\n✅ Results saved to {OUTPUT_DIR}/ (cleanup SQL: slot_calc_cleanup.sql)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+CliCare Testing - Slow-Client Upload Load
+Runs many concurrent lab-result uploads whose bodies are paced at real client
+speeds (upload_stream's shaped MultipartStream) against
+/api/patient/upload-lab-result, and watches what the server does meanwhile:
+
+  - upload latency and the rate each client actually achieved
+  - multer's disk storage: files in uploads/lab-results, how many are still
+    growing (size changed since the previous sample, i.e. uploads in
+    progress) and the bytes on disk, sampled every 0.5s
+  - server health: /api/health latency (event-loop responsiveness) and
+    the server's RSS and CPU time
+
+Rates and latencies are drawn per client from --rate-range / --latency-range
+(default: test2_outpatient's UPLOAD_RATE_RANGE_MBPS and BASE_LATENCY_RANGE).
+
+Run:
+  python slow_upload_load.py --token T --patient-id PAT... --lab-request-id 1
+                             [--clients 50] [--size-mb 2] [--rate-range 0.05,0.5]
+The token is a patient token: the `token` returned by
+POST /api/outpatient/verify-otp after the OTP login that test2_outpatient.py
+performs (--token or CLICARE_PATIENT_TOKEN). Run it on the server's host so
+the upload directory can be watched (--upload-dir, default uploads/lab-results). Uploaded
+files are removed afterwards unless --keep-files; cleanup SQL for the
+lab_result rows is written to the output directory.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+
+from loop_stall_probe import HealthProbe
+from upload_stream import MultipartStream, SyntheticFile, client_rss_mb
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_BASE = "http://localhost:5000"
+OUTPUT_DIR = "slow_upload_results"
+UPLOAD_DIR = "uploads/lab-results"
+
+CLIENTS = 50
+FILE_SIZE_MB = 2
+UPLOAD_RATE_RANGE_MBPS = (0.5, 5.0)  # MB/s, as in test2_outpatient.py
+BASE_LATENCY_RANGE = (0.03, 0.25)    # seconds, as in test2_outpatient.py
+SAMPLE_INTERVAL_SECONDS = 0.5
+FILE_PREFIX = 'slowupload'           # in the uploaded file names, used for cleanup
+
+# ============================================================================
+# SERVER AND DISK MONITOR
+# ============================================================================
+
+class UploadDirSampler:
+    """HealthProbe hook adding the upload directory, the server process block and the client RSS to each sample"""
+
+    def __init__(self, upload_dir):
+        self.upload_dir = Path(upload_dir)
+        self._sizes = {}
+
+    def __call__(self, response):
+        sample = {**self._disk_sample(), 'client_rss_mb': client_rss_mb()[0]}
+        process = {}
+        if response is not None:
+            try:
+                process = response.json().get('process') or {}
+            except ValueError:
+                pass
+        sample['server_rss_mb'] = process.get('rss_mb')
+        sample['server_cpu_ms'] = (process['cpu_user_ms'] + process['cpu_system_ms']
+                                   if 'cpu_user_ms' in process else None)
+        return sample
+
+    def _disk_sample(self):
+        sizes = {}
+        for path in self.upload_dir.glob(f"*{FILE_PREFIX}*"):
+            try:
+                sizes[path.name] = path.stat().st_size
+            except OSError:  # removed between glob and stat
+                pass
+        # Only files seen in the previous sample: a new file may already be complete
+        growing = sum(1 for name, size in sizes.items() if name in self._sizes and self._sizes[name] != size)
+        self._sizes = sizes
+        return {'files': len(sizes), 'growing_files': growing, 'disk_mb': sum(sizes.values()) / (1024 * 1024)}
+
+# ============================================================================
+# SLOW CLIENTS
+# ============================================================================
+
+def slow_upload(i, args, rows):
+    """One client uploading one synthetic file at its own pace"""
+    rate = random.uniform(*args.rate_range)
+    latency = random.uniform(*args.latency_range)
+    filename = f"{FILE_PREFIX}_{uuid.uuid4().hex[:8]}_{i}.pdf"
+    body = MultipartStream(
+        {'labRequestId': str(args.lab_request_id), 'patientId': args.patient_id},
+        {'labResultFile': SyntheticFile(filename, 'application/pdf', args.size_mb)},
+        rate_mbps=rate,
+        latency_s=latency
+    )
+    headers = {'Authorization': f'Bearer {args.token}', 'Content-Type': body.content_type}
+
+    start = time.perf_counter()
+    try:
+        response = requests.post(f"{API_BASE}/api/patient/upload-lab-result", data=body, headers=headers,
+                                 timeout=args.timeout)
+        status = response.status_code
+        error = None if status in (200, 201) else response.text[:200]
+    except requests.exceptions.RequestException as e:
+        status, error = 'error', str(e)[:200]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    rows.append({
+        'client': i,
+        'filename': filename,
+        'file_size_mb': round(len(body) / (1024 * 1024), 3),
+        'target_rate_mbps': round(rate, 3),
+        'achieved_rate_mbps': round(body.achieved_mbps() or 0, 3),
+        'base_latency_ms': round(latency * 1000, 1),
+        'ideal_transfer_ms': round(latency * 1000 + len(body) / (rate * 1024 * 1024) * 1000, 1),
+        'response_time_ms': round(elapsed_ms, 1),
+        'status': status,
+        'error': error
+    })
+
+def run_load(args):
+    """Start every client at once and monitor until they finish"""
+    rows = []  # list.append is atomic, so the client threads share it without a lock
+    monitor = HealthProbe(SAMPLE_INTERVAL_SECONDS, extra=UploadDirSampler(args.upload_dir))
+    monitor.start()
+    time.sleep(SAMPLE_INTERVAL_SECONDS * 2)  # a quiet baseline
+
+    threads = [threading.Thread(target=slow_upload, args=(i, args, rows), daemon=True) for i in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_s = time.perf_counter() - start
+
+    time.sleep(SAMPLE_INTERVAL_SECONDS * 2)
+    monitor.stop()
+    return pd.DataFrame(rows), pd.DataFrame(monitor.samples), wall_s
+
+def summarize(uploads, samples, wall_s):
+    ok = uploads[uploads['status'].isin([200, 201])]
+    latencies = ok['response_time_ms'].to_numpy(dtype=float)
+    health = (samples.loc[samples['status'] != 'error', 'latency_ms'].to_numpy(dtype=float)
+              if len(samples) else np.array([]))
+    cpu = samples['server_cpu_ms'].dropna() if 'server_cpu_ms' in samples else pd.Series(dtype=float)
+    return {
+        'clients': len(uploads),
+        'succeeded': len(ok),
+        'rejected': int(uploads['status'].apply(lambda s: isinstance(s, int) and s >= 400).sum()),
+        'errors': int((uploads['status'] == 'error').sum()),
+        'wall_s': round(wall_s, 2),
+        'total_mb': round(ok['file_size_mb'].sum(), 2),
+        'aggregate_mb_per_s': round(ok['file_size_mb'].sum() / wall_s, 3) if wall_s else None,
+        'p50_ms': round(np.percentile(latencies, 50), 1) if latencies.size else None,
+        'p95_ms': round(np.percentile(latencies, 95), 1) if latencies.size else None,
+        'mean_overhead_vs_ideal_ms': round((ok['response_time_ms'] - ok['ideal_transfer_ms']).mean(), 1)
+                                     if len(ok) else None,
+        'peak_files_in_progress': int(samples['growing_files'].max()) if len(samples) else 0,
+        'peak_upload_dir_mb': round(samples['disk_mb'].max(), 2) if len(samples) else 0,
+        'health_p50_ms': round(np.percentile(health, 50), 1) if health.size else None,
+        'health_p99_ms': round(np.percentile(health, 99), 1) if health.size else None,
+        'server_peak_rss_mb': round(samples['server_rss_mb'].max(), 1)
+                              if 'server_rss_mb' in samples and samples['server_rss_mb'].notna().any() else None,
+        'server_cpu_ms': round(cpu.iloc[-1] - cpu.iloc[0], 1) if len(cpu) > 1 else None,
+        'client_peak_rss_mb': client_rss_mb()[1]
+    }
+
+def remove_uploaded_files(upload_dir):
+    removed = 0
+    for path in Path(upload_dir).glob(f"*{FILE_PREFIX}*"):
+        path.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_range(text):
+    low, high = (float(v) for v in text.split(','))
+    return low, high
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent bandwidth-shaped uploads against upload-lab-result")
+    parser.add_argument('--token', default=os.environ.get('CLICARE_PATIENT_TOKEN'), help="Patient token")
+    parser.add_argument('--patient-id', required=True)
+    parser.add_argument('--lab-request-id', required=True)
+    parser.add_argument('--clients', type=int, default=CLIENTS)
+    parser.add_argument('--size-mb', type=float, default=FILE_SIZE_MB)
+    parser.add_argument('--rate-range', type=parse_range, default=UPLOAD_RATE_RANGE_MBPS, help="MB/s, e.g. 0.05,0.5")
+    parser.add_argument('--latency-range', type=parse_range, default=BASE_LATENCY_RANGE, help="seconds, e.g. 0.1,0.6")
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--upload-dir', default=UPLOAD_DIR)
+    parser.add_argument('--keep-files', action='store_true')
+    args = parser.parse_args(argv)
+
+    if not args.token:
+        print("❌ A patient token is required (--token or CLICARE_PATIENT_TOKEN)")
+        return 2
+    if not os.path.isdir(args.upload_dir):
+        print(f"⚠️ {args.upload_dir} not found - disk usage will not be sampled")
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    print(f"🐢 {args.clients} clients uploading {args.size_mb}MB at {args.rate_range[0]}-{args.rate_range[1]} MB/s...")
+    uploads, samples, wall_s = run_load(args)
+    summary = summarize(uploads, samples, wall_s)
+
+    uploads.to_csv(f"{OUTPUT_DIR}/slow_uploads.csv", index=False)
+    samples.to_csv(f"{OUTPUT_DIR}/slow_upload_server_samples.csv", index=False)
+    with open(f"{OUTPUT_DIR}/slow_upload_summary.json", 'w') as f:
+        json.dump({
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'size_mb': args.size_mb,
+            'rate_range_mbps': list(args.rate_range),
+            'latency_range_s': list(args.latency_range),
+            'summary': summary
+        }, f, indent=2, default=str)
+    with open(f"{OUTPUT_DIR}/slow_upload_cleanup.sql", 'w') as f:
+        f.write(f"-- Remove the lab_result rows created by slow_upload_load.py\n"
+                f"DELETE FROM lab_result WHERE file_path LIKE '/uploads/lab-results/%{FILE_PREFIX}%';\n")
+    if not args.keep_files:
+        print(f"🧹 Removed {remove_uploaded_files(args.upload_dir)} uploaded files")
+
+    fmt = lambda v, spec: '-' if v is None else format(v, spec)
+    print(f"\n✅ {summary['succeeded']}/{summary['clients']} uploads succeeded "
+          f"({summary['rejected']} rejected, {summary['errors']} connection errors) in {summary['wall_s']}s")
+    print(f"   Upload latency p50 {fmt(summary['p50_ms'], '.0f')}ms, p95 {fmt(summary['p95_ms'], '.0f')}ms; "
+          f"mean {fmt(summary['mean_overhead_vs_ideal_ms'], '.0f')}ms over the clients' ideal transfer time")
+    print(f"   Disk: peak {summary['peak_files_in_progress']} files in progress, "
+          f"{summary['peak_upload_dir_mb']}MB in {args.upload_dir}")
+    print(f"   Server: /api/health p50 {fmt(summary['health_p50_ms'], '.1f')}ms, "
+          f"p99 {fmt(summary['health_p99_ms'], '.1f')}ms, peak RSS {fmt(summary['server_peak_rss_mb'], '.0f')}MB, "
+          f"CPU {fmt(summary['server_cpu_ms'], '.0f')}ms")
+    print(f"   Client: peak RSS {fmt(summary['client_peak_rss_mb'], '.0f')}MB")
+    print(f"✅ Results saved to {OUTPUT_DIR}/")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+CliCare Testing - Supabase Round-Trip Counter / N+1 Detector
+Reads the per-request Supabase call traces that server.js records when it
+runs with SUPABASE_CALL_TRACE=1 and, per route:
+  - counts PostgREST calls and sequential round trips per inbound request
+  - fits calls = a + b * result_rows; a route whose call count grows with the
+    number of rows it returns (b >= --slope) is flagged N+1
+  - flags chatty routes whose sequential round trips stay high even when the
+    count is constant (candidates for one grouped query or an RPC)
+
+Traces come from whatever the other suites just exercised, or from --probe,
+which requests the dashboard / time-series / list endpoints at every period.
+
+Usage:
+  SUPABASE_CALL_TRACE=1 node server.js
+  python run_all.py --only registration,healthcare
+  python supabase_calls.py --admin-token T [--since ID] [--probe --staff-token T]
+The traces are admin-only: --admin-token (or CLICARE_ADMIN_TOKEN) is required.
+
+Exits 1 when an N+1 route is flagged, 2 when there are no traces.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import requests
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_BASE = "http://localhost:5000"
+OUTPUT_DIR = "supabase_call_results"
+
+N_PLUS_ONE_SLOPE = 0.5         # extra calls per returned row that counts as N+1
+MIN_DISTINCT_SIZES = 3         # result sizes needed before a slope is trusted
+CHATTY_ROUND_TRIPS = 5         # mean sequential round trips that marks a route as chatty
+PERIODS = ['yearly', 'weekly', 'daily']
+
+# (endpoint, token kind) requested by --probe
+PROBES = [
+    ("api/admin/dashboard-stats", 'admin'),
+    ("api/admin/patients", 'admin'),
+    ("api/admin/staff", 'admin'),
+    *[(f"api/admin/time-series-stats?period={period}", 'admin') for period in PERIODS],
+    ("api/healthcare/dashboard-stats", 'staff'),
+    ("api/healthcare/all-patients", 'staff'),
+    ("api/healthcare/patient-queue", 'staff'),
+    ("api/healthcare/lab-requests", 'staff'),
+    *[(f"api/healthcare/time-series-stats?period={period}", 'staff') for period in PERIODS],
+    ("api/symptoms", None),
+    ("api/symptom-department-mapping", None),
+]
+PROBE_REPEATS = 3
+
+# ============================================================================
+# TRACES
+# ============================================================================
+
+def fetch_traces(admin_token, since=0):
+    """Finished request traces recorded by the server after trace id `since`"""
+    response = requests.get(f"{API_BASE}/api/debug/supabase-calls", params={'since': since},
+                            headers={'Authorization': f'Bearer {admin_token}'}, timeout=15)
+    if response.status_code == 404:
+        print("❌ Server is not tracing Supabase calls - restart it with SUPABASE_CALL_TRACE=1")
+        return None
+    response.raise_for_status()
+    traces = response.json()['traces']
+    return [t for t in traces if not t['route'].endswith('/api/debug/supabase-calls')]
+
+def latest_trace_id(admin_token):
+    """Current trace id, so a probe only analyses its own requests"""
+    response = requests.get(f"{API_BASE}/api/debug/supabase-calls", params={'since': 10 ** 12},
+                            headers={'Authorization': f'Bearer {admin_token}'}, timeout=15)
+    return response.json().get('latest_id', 0) if response.status_code == 200 else 0
+
+def run_probe(admin_token=None, staff_token=None, repeats=PROBE_REPEATS):
+    """Request every probe endpoint we have a token for"""
+    tokens = {'admin': admin_token, 'staff': staff_token, None: None}
+    for endpoint, kind in PROBES:
+        token = tokens[kind]
+        if kind and not token:
+            continue
+        headers = {'Authorization': f'Bearer {token}'} if token else None
+        for _ in range(repeats):
+            response = requests.get(f"{API_BASE}/{endpoint}", headers=headers, timeout=60)
+            print(f"  {endpoint}: {response.status_code} "
+                  f"({response.headers.get('X-Supabase-Calls', '?')} Supabase calls, "
+                  f"{response.headers.get('X-Supabase-Round-Trips', '?')} round trips)")
+
+# ============================================================================
+# ANALYSIS
+# ============================================================================
+
+def traces_to_frames(traces):
+    """Per-request and per-call DataFrames"""
+    requests_df = pd.DataFrame([{k: v for k, v in t.items() if k != 'calls'} for t in traces])
+    calls_df = pd.DataFrame([{'trace_id': t['id'], 'route': t['route'], **call}
+                             for t in traces for call in t['calls']])
+    return requests_df, calls_df
+
+def detect_n_plus_one(requests_df, slope_threshold=N_PLUS_ONE_SLOPE):
+    """One row per route: call counts, round trips, growth with result size and flags"""
+    rows = []
+    for route, group in requests_df.groupby('route'):
+        sizes = group['result_rows'].fillna(0).to_numpy(dtype=float)
+        calls = group['supabase_calls'].to_numpy(dtype=float)
+        distinct_sizes = np.unique(sizes).size
+
+        slope, correlation = np.nan, np.nan
+        if distinct_sizes >= MIN_DISTINCT_SIZES:
+            slope = np.polyfit(sizes, calls, 1)[0]
+            if calls.std() > 0:
+                correlation = np.corrcoef(sizes, calls)[0, 1]
+
+        mean_round_trips = group['round_trips'].mean()
+        n_plus_one = bool(slope >= slope_threshold) if not np.isnan(slope) else False
+        rows.append({
+            'route': route,
+            'requests': len(group),
+            'mean_calls': round(calls.mean(), 2),
+            'max_calls': int(calls.max()),
+            'mean_round_trips': round(mean_round_trips, 2),
+            'mean_supabase_ms': round(group['supabase_ms'].mean(), 1),
+            'mean_total_ms': round(group['total_ms'].mean(), 1),
+            'supabase_share_%': round(group['supabase_ms'].sum() / group['total_ms'].sum() * 100, 1)
+                                if group['total_ms'].sum() else None,
+            'result_rows_min': int(sizes.min()),
+            'result_rows_max': int(sizes.max()),
+            'calls_per_row_slope': None if np.isnan(slope) else round(slope, 3),
+            'size_call_correlation': None if np.isnan(correlation) else round(correlation, 3),
+            'n_plus_one': n_plus_one,
+            'chatty': bool(mean_round_trips >= CHATTY_ROUND_TRIPS)
+        })
+    return pd.DataFrame(rows).sort_values(['n_plus_one', 'chatty', 'mean_calls'], ascending=False)
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count Supabase round trips per API request and flag N+1 routes")
+    parser.add_argument('--since', type=int, default=0, help="Only traces after this id (see latest_id)")
+    parser.add_argument('--probe', action='store_true', help="Request the probe endpoints before analysing")
+    parser.add_argument('--admin-token', default=os.environ.get('CLICARE_ADMIN_TOKEN'))
+    parser.add_argument('--staff-token', default=os.environ.get('CLICARE_STAFF_TOKEN'))
+    parser.add_argument('--slope', type=float, default=N_PLUS_ONE_SLOPE)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    if not args.admin_token:
+        print("❌ An admin token is required (--admin-token or CLICARE_ADMIN_TOKEN)")
+        return 2
+
+    since = args.since
+    if args.probe:
+        since = latest_trace_id(args.admin_token)
+        print("🔎 Probing endpoints...")
+        run_probe(args.admin_token, args.staff_token)
+
+    traces = fetch_traces(args.admin_token, since)
+    if not traces:
+        if traces is not None:
+            print("❌ No request traces recorded yet")
+        return 2
+
+    requests_df, calls_df = traces_to_frames(traces)
+    report = detect_n_plus_one(requests_df, args.slope)
+
+    requests_df.to_csv(f"{OUTPUT_DIR}/supabase_calls_per_request.csv", index=False)
+    calls_df.to_csv(f"{OUTPUT_DIR}/supabase_call_sequence.csv", index=False)
+    report.to_csv(f"{OUTPUT_DIR}/n_plus_one_report.csv", index=False)
+
+    print(f"\n{'ROUTE':<55} {'REQ':>4} {'CALLS':>7} {'MAX':>5} {'TRIPS':>6} {'ROWS':>10} {'SLOPE':>7}  FLAGS")
+    for _, row in report.iterrows():
+        rows_range = f"{row['result_rows_min']}-{row['result_rows_max']}"
+        slope = '-' if pd.isna(row['calls_per_row_slope']) else f"{row['calls_per_row_slope']:.2f}"
+        flags = ' '.join(flag for flag, on in [('🚨 N+1', row['n_plus_one']), ('⚠️ chatty', row['chatty'])] if on)
+        print(f"{row['route'][:54]:<55} {row['requests']:>4} {row['mean_calls']:>7.1f} {row['max_calls']:>5} "
+              f"{row['mean_round_trips']:>6.1f} {rows_range:>10} {slope:>7}  {flags or '✅'}")
+
+    print(f"\n✅ Reports saved to {OUTPUT_DIR}/ ({len(requests_df)} requests, {len(calls_df)} Supabase calls)")
+    n_plus_one = int(report['n_plus_one'].sum())
+    if n_plus_one:
+        print(f"🚨 {n_plus_one} route(s) issue more Supabase calls as their result grows (N+1)")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+CliCare Testing - Request Telemetry Hook
+Every script's request helper reports (suite, endpoint, status, latency) here.
+The hook fans out to registered sinks (e.g. the live dashboard); with no
+sinks registered it returns immediately, so it costs nothing by default.
+
+Pass --dashboard (or set CLICARE_DASHBOARD=1) to any test script to start
+the live SSE dashboard at http://127.0.0.1:8765/, and --metrics (or
+CLICARE_METRICS=1) to expose OpenMetrics at http://127.0.0.1:9108/metrics.
+--stall-probe (or CLICARE_STALL_PROBE=1) polls /api/health in the background
+and attributes event-loop stalls to the server's background jobs. The sinks
+are started by the script's entry point (start_sinks()), never on import:
+figure render workers re-import the test scripts and must not bind the ports
+or start a second probe.
+
+The Server-Timing header of each response is parsed into per-phase
+durations; last_server_timing() returns the breakdown of the calling
+thread's most recent request as server_<phase>_ms columns.
+"""
+
+import multiprocessing
+import os
+import re
+import sys
+import threading
+from functools import lru_cache
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DASHBOARD_ENABLED = '--dashboard' in sys.argv or os.environ.get('CLICARE_DASHBOARD') == '1'
+METRICS_ENABLED = '--metrics' in sys.argv or os.environ.get('CLICARE_METRICS') == '1'
+STALL_PROBE_ENABLED = '--stall-probe' in sys.argv or os.environ.get('CLICARE_STALL_PROBE') == '1'
+
+# Path segments containing a digit are IDs (api/healthcare/patient-history/PAT123 -> :id)
+_ID_SEGMENT = re.compile(r'^[^/]*\d[^/]*$')
+
+_sinks = []
+_local = threading.local()
+
+# ============================================================================
+# HOOK
+# ============================================================================
+
+def add_sink(sink):
+    """Register sink(suite, endpoint, status, latency_ms, worker); called on the request thread"""
+    _sinks.append(sink)
+
+@lru_cache(maxsize=4096)
+def endpoint_label(endpoint):
+    """Low-cardinality endpoint label: query string dropped, ID segments collapsed"""
+    path = endpoint.split('?', 1)[0].strip('/')
+    return '/'.join(':id' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+def parse_server_timing(header):
+    """Server-Timing header -> {phase: ms}; repeated phases are summed"""
+    phases = {}
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        if not name:
+            continue
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur':
+                try:
+                    phases[name] = phases.get(name, 0.0) + float(value)
+                except ValueError:
+                    pass
+    return phases
+
+def last_server_timing():
+    """Server-side breakdown of this thread's last request as server_<phase>_ms columns"""
+    return {f"server_{name}_ms": ms for name, ms in getattr(_local, 'server_timing', {}).items()}
+
+def server_timing_breakdown(samples, latency_column):
+    """Mean per server phase next to mean client latency, over samples carrying server_*_ms columns"""
+    timed = [s for s in samples if s.get('server_total_ms') is not None]
+    if not timed:
+        return []
+    client_mean = sum(s[latency_column] for s in timed) / len(timed)
+    phases = sorted({key for s in timed for key in s if key.startswith('server_') and key.endswith('_ms')})
+    rows = []
+    for column in phases:
+        mean_ms = sum(s.get(column, 0.0) for s in timed) / len(timed)
+        rows.append({
+            'phase': column[len('server_'):-len('_ms')],
+            'requests_with_phase': sum(1 for s in timed if column in s),
+            'mean_ms': round(mean_ms, 2),
+            'share_of_client_latency_%': round(mean_ms / client_mean * 100, 1) if client_mean else None
+        })
+    server_total = sum(s['server_total_ms'] for s in timed) / len(timed)
+    rows.append({'phase': 'network_and_client', 'requests_with_phase': len(timed),
+                 'mean_ms': round(client_mean - server_total, 2),
+                 'share_of_client_latency_%': round((client_mean - server_total) / client_mean * 100, 1) if client_mean else None})
+    return rows
+
+def print_server_timing_breakdown(rows, title):
+    """Print a server_timing_breakdown table"""
+    if not rows:
+        return
+    print(f"\n⏱️  {title} - server-side breakdown (mean per request):")
+    for row in rows:
+        share = row['share_of_client_latency_%']
+        print(f"  {row['phase']:<28} {row['mean_ms']:>9.2f}ms  {'' if share is None else f'({share}% of client latency)'}")
+
+def observe_request(suite, endpoint, status, latency_ms, server_timing=None):
+    """
+    Report one finished request
+    status is the HTTP status code, or 'timeout' / 'error' when no response arrived
+    server_timing is the raw Server-Timing response header, if any
+    """
+    _local.server_timing = parse_server_timing(server_timing)
+    if not _sinks:
+        return
+    label = endpoint_label(endpoint)
+    worker = threading.current_thread().name
+    for sink in _sinks:
+        sink(suite, label, status, latency_ms, worker)
+
+def start_sinks():
+    """Start the sinks enabled on the command line; call from a script's entry point (idempotent)"""
+    if multiprocessing.parent_process() is not None:  # a worker process, e.g. a figure renderer
+        return
+
+    if DASHBOARD_ENABLED:
+        from live_dashboard import start_dashboard
+        start_dashboard()
+
+    if METRICS_ENABLED:
+        from metrics_exporter import start_exporter
+        start_exporter()
+
+    if STALL_PROBE_ENABLED:
+        from loop_stall_probe import start_probe
+        start_probe()
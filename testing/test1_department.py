@@ -1,6 +1,6 @@
 """
 CliCare Objective 1 - Department Assignment Integration Testing (COMPREHENSIVE ENHANCED)
-Run: python test1_department.py
+Run: python test1_department.py [--no-plots] [--dashboard] [--metrics] [--stall-probe]
 """
 
 import requests
@@ -11,10 +11,11 @@ import json
 import time
 from datetime import datetime, timedelta
 import os
-from sklearn.metrics import confusion_matrix, classification_report
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import seaborn as sns
+from plot_renderer import pyplot, figure_job, render_figures
+from results_store import append_samples
+from run_history import record_run, config_snapshot
+from confidence import summary_intervals, macro_score_intervals
+from telemetry import observe_request, start_sinks
 
 # ============================================================================
 # CONFIGURATION
@@ -22,10 +23,13 @@ import seaborn as sns
 
 API_BASE = "http://localhost:5000"
 OUTPUT_DIR = "objective1_comprehensive_results/department_assignment"
+SUITE_NAME = 'department_assignment'  # label for live telemetry (--dashboard)
 
 # Test configuration
 COMPREHENSIVE_TEST = True
 CLEANUP_AFTER_TEST = True
+USE_BATCH_PREDICTION = True  # Use read-only /api/department/predict-batch (no DB rows created)
+PREDICTION_BATCH_SIZE = 500  # Cases per batch request (server max: 1000)
 
 # ============================================================================
 # HELPER FUNCTIONS
@@ -47,12 +51,15 @@ def make_api_request(endpoint, method="GET", data=None, headers=None):
     try:
         url = f"{API_BASE}/{endpoint}"
         
+        request_start = time.perf_counter()
         if method == "GET":
             response = requests.get(url, headers=headers, timeout=15)
         elif method == "POST":
             response = requests.post(url, json=data, headers=headers, timeout=15)
         elif method == "DELETE":
             response = requests.delete(url, json=data, headers=headers, timeout=15)
+        observe_request(SUITE_NAME, endpoint, response.status_code, (time.perf_counter() - request_start) * 1000,
+                        response.headers.get('Server-Timing'))
         
         if response.status_code in [200, 201]:
             return response.json()
@@ -60,9 +67,11 @@ def make_api_request(endpoint, method="GET", data=None, headers=None):
             print(f"⚠️  API Error: {response.status_code} - {response.text[:200]}")
             return None
     except requests.exceptions.Timeout:
+        observe_request(SUITE_NAME, endpoint, 'timeout', None)
         print(f"⚠️  Request timeout for {endpoint}")
         return None
     except Exception as e:
+        observe_request(SUITE_NAME, endpoint, 'error', None)
         print(f"⚠️  Request failed: {e}")
         return None
 
@@ -257,8 +266,20 @@ def generate_department_assignment_test_cases():
     
     return test_cases
 
+def build_confusion_matrix(y_true, y_pred, labels):
+    """Build a confusion matrix (rows = actual, columns = predicted) without sklearn"""
+    label_index = {label: i for i, label in enumerate(labels)}
+    cm = np.zeros((len(labels), len(labels)), dtype=int)
+    
+    for actual, predicted in zip(y_true, y_pred):
+        if actual in label_index and predicted in label_index:
+            cm[label_index[actual], label_index[predicted]] += 1
+    
+    return cm
+
 def create_enhanced_confusion_matrix(cm, departments, output_path):
     """Create enhanced confusion matrix visualization matching uploaded image style"""
+    plt = pyplot()
     
     # Set up the figure with the exact style from the image
     fig, ax = plt.subplots(figsize=(16, 14))
@@ -317,6 +338,8 @@ def create_enhanced_confusion_matrix(cm, departments, output_path):
 
 def create_binary_confusion_matrix_diagram(output_path):
     """Create the 2x2 binary confusion matrix diagram like in the uploaded image"""
+    plt = pyplot()
+    import matplotlib.patches as mpatches
     
     fig, ax = plt.subplots(figsize=(10, 8))
     ax.set_xlim(0, 10)
@@ -393,15 +416,10 @@ def create_binary_confusion_matrix_diagram(output_path):
     
     print(f"✅ Binary confusion matrix diagram saved to {output_path}")
 
-def test_department_assignment():
-    """Test rule-based department assignment algorithm"""
-    print_section_header("4.1.1 RULE-BASED DEPARTMENT ASSIGNMENT TESTING")
-    
-    test_cases = generate_department_assignment_test_cases()
+def register_department_test_patients(test_cases):
+    """Run department assignment through full patient registration (creates DB rows)"""
     results = []
     
-    print(f"Testing {len(test_cases)} department assignment cases...")
-    
     for idx, test_case in enumerate(test_cases, 1):
         print(f"Test {idx}/{len(test_cases)}: {test_case['symptoms']} (Age: {test_case['age']})", end=' ... ')
         
@@ -463,6 +481,64 @@ def test_department_assignment():
         
         time.sleep(0.5)
     
+    return results
+
+def predict_departments_batch(test_cases):
+    """Run department assignment through the read-only batch prediction endpoint"""
+    results = []
+    total_batches = (len(test_cases) + PREDICTION_BATCH_SIZE - 1) // PREDICTION_BATCH_SIZE
+    
+    for batch_no, offset in enumerate(range(0, len(test_cases), PREDICTION_BATCH_SIZE), 1):
+        batch = test_cases[offset:offset + PREDICTION_BATCH_SIZE]
+        print(f"Batch {batch_no}/{total_batches}: {len(batch)} cases", end=' ... ')
+        
+        start_time = time.time()
+        batch_result = make_api_request(
+            "api/department/predict-batch",
+            method="POST",
+            data={"cases": [{"symptoms": tc['symptoms'], "age": tc['age']} for tc in batch]}
+        )
+        elapsed_ms = (time.time() - start_time) * 1000
+        
+        predictions = batch_result.get('predictions', []) if batch_result and batch_result.get('success') else []
+        predicted_by_index = {p['index']: p.get('recommendedDepartment', 'Unknown') for p in predictions}
+        
+        if predictions:
+            print(f"✅ {len(predictions)} predictions ({elapsed_ms:.0f}ms)")
+        else:
+            print("❌ API FAIL")
+        
+        for local_idx, test_case in enumerate(batch):
+            predicted = predicted_by_index.get(local_idx, 'API_ERROR')
+            results.append({
+                'test_case': offset + local_idx + 1,
+                'symptoms': ', '.join(test_case['symptoms']),
+                'age': test_case['age'],
+                'category': test_case['category'],
+                'expected_department': test_case['expected'],
+                'predicted_department': predicted,
+                'correct': predicted == test_case['expected'],
+                'patient_id': None
+            })
+    
+    correct = sum(1 for r in results if r['correct'])
+    print(f"Batch prediction complete: {correct}/{len(results)} correct")
+    
+    return results
+
+def test_department_assignment():
+    """Test rule-based department assignment algorithm"""
+    print_section_header("4.1.1 RULE-BASED DEPARTMENT ASSIGNMENT TESTING")
+    
+    test_cases = generate_department_assignment_test_cases()
+    
+    print(f"Testing {len(test_cases)} department assignment cases...")
+    
+    if USE_BATCH_PREDICTION:
+        results = predict_departments_batch(test_cases)
+    else:
+        results = register_department_test_patients(test_cases)
+    
     # Calculate metrics
     valid_results = [r for r in results if r['predicted_department'] != 'API_ERROR']
     total_valid = len(valid_results)
@@ -479,7 +555,7 @@ def test_department_assignment():
         departments = sorted(list(set(y_true + y_pred)))
         
         # Create confusion matrix
-        cm = confusion_matrix(y_true, y_pred, labels=departments)
+        cm = build_confusion_matrix(y_true, y_pred, departments)
         cm_df = pd.DataFrame(cm, index=departments, columns=departments)
         
         # Calculate per-department metrics
@@ -530,14 +606,12 @@ def test_department_assignment():
     # Export results
     results_df = pd.DataFrame(results)
     results_df.to_csv(f"{OUTPUT_DIR}/test_cases_results.csv", index=False)
+    append_samples('department_assignment', results_df, success_column='correct',
+                   endpoint="api/department/predict-batch" if USE_BATCH_PREDICTION else "api/patient/register")
     
     if valid_results:
         cm_df.to_csv(f"{OUTPUT_DIR}/confusion_matrix.csv")
         
-        # Create enhanced visualizations
-        create_enhanced_confusion_matrix(cm, departments, f"{OUTPUT_DIR}/confusion_matrix_heatmap.png")
-        create_binary_confusion_matrix_diagram(f"{OUTPUT_DIR}/confusion_matrix_binary_diagram.png")
-        
         # Create metrics summary table
         metrics_summary = pd.DataFrame([{
             'Metric': 'Accuracy',
@@ -598,11 +672,18 @@ def test_department_assignment():
         'f1_score': avg_f1 if valid_results else 0,
         'total_cases': len(test_cases),
         'valid_cases': total_valid,
-        'correct_predictions': correct_predictions
+        'correct_predictions': correct_predictions,
+        'confusion_matrix': cm if valid_results else None,
+        'departments': departments if valid_results else [],
+        'confidence_intervals': {
+            **summary_intervals(rates={'accuracy': (correct_predictions, total_valid)}),
+            'macro': macro_score_intervals(y_true, y_pred, departments) if valid_results else {}
+        }
     }
 
 def create_department_visualizations(dept_results, results_df):
     """Create department assignment performance visualization charts"""
+    plt = pyplot()
     
     # Set up the plotting style
     plt.style.use('default')
@@ -742,12 +823,20 @@ def generate_department_report(dept_results):
             'total_metrics': total_metrics,
             'pass_rate': overall_pass_rate,
             'status': 'PASS' if overall_pass_rate >= 80 else 'FAIL'
-        }
+        },
+        'confidence_intervals': dept_results['confidence_intervals']
     }
     
     # Export executive summary
     with open(f"{OUTPUT_DIR}/department_executive_summary.json", 'w') as f:
-        json.dump(executive_summary, f, indent=2)
+        json.dump(executive_summary, f, indent=2, default=str)
+    record_run('department_assignment', {
+        'accuracy': dept_results['accuracy'],
+        'precision': dept_results['precision'],
+        'recall': dept_results['recall'],
+        'f1_score': dept_results['f1_score'],
+        'pass_rate': overall_pass_rate
+    }, config=config_snapshot(globals()), status=executive_summary['overall_performance']['status'])
     
     # Print final report
     print(f"\n{'='*80}")
@@ -798,6 +887,18 @@ DELETE FROM outpatient WHERE name LIKE '%Dept Test Patient%';
     print(f"✅ Department assignment cleanup SQL saved to {OUTPUT_DIR}/department_cleanup_sql.sql")
     print("💡 Run the SQL commands to clean up test data from your database")
 
+def render_department_figures(dept_results):
+    """Render department figures"""
+    results_df = pd.read_csv(f"{OUTPUT_DIR}/test_cases_results.csv")
+    
+    figure_jobs = [figure_job(create_department_visualizations, dept_results, results_df)]
+    if dept_results['confusion_matrix'] is not None:
+        figure_jobs.append(figure_job(create_enhanced_confusion_matrix, dept_results['confusion_matrix'],
+                                      dept_results['departments'], f"{OUTPUT_DIR}/confusion_matrix_heatmap.png"))
+        figure_jobs.append(figure_job(create_binary_confusion_matrix_diagram,
+                                      f"{OUTPUT_DIR}/confusion_matrix_binary_diagram.png"))
+    render_figures(figure_jobs)
+
 def run_comprehensive_department_tests():
     """Run all department assignment tests"""
     
@@ -826,17 +927,11 @@ def run_comprehensive_department_tests():
         # Run department assignment tests
         dept_results = test_department_assignment()
         
-        # Load results for visualization
-        results_df = pd.read_csv(f"{OUTPUT_DIR}/test_cases_results.csv")
-        
         # Generate comprehensive report
         final_report = generate_department_report(dept_results)
         
-        # Generate visualization
-        try:
-            create_department_visualizations(dept_results, results_df)
-        except Exception as e:
-            print(f"⚠️ Visualization generation failed: {e}")
+        # Render all figures in parallel (skipped with --no-plots)
+        render_department_figures(dept_results)
         
         # Print completion message
         print(f"\n{'='*80}")
@@ -870,7 +965,7 @@ def run_comprehensive_department_tests():
         print(f"   5. Use data for research documentation")
         print(f"   6. Clean up test data from database if needed")
         
-        if CLEANUP_AFTER_TEST:
+        if CLEANUP_AFTER_TEST and not USE_BATCH_PREDICTION:
             cleanup_department_test_data()
         
         return final_report
@@ -889,6 +984,7 @@ def run_comprehensive_department_tests():
 # ============================================================================
 
 if __name__ == "__main__":
+    start_sinks()  # --dashboard / --metrics / --stall-probe
     try:
         print("\n" + "="*80)
         print("CLICARE OBJECTIVE 1 - DEPARTMENT ASSIGNMENT COMPREHENSIVE TESTING")
@@ -936,7 +1032,9 @@ if __name__ == "__main__":
         print(f"   • Formula explanations for all metrics")
         print(f"   • Per-department breakdown with TP/FP/FN/TN values")
         
-        if CLEANUP_AFTER_TEST:
+        if USE_BATCH_PREDICTION:
+            print(f"\n⚡ Batch mode: read-only predictions in batches of {PREDICTION_BATCH_SIZE}, no test data created.")
+        elif CLEANUP_AFTER_TEST:
             print("\n⚠️  Note: Test data will be created in your database.")
             print("   Cleanup SQL will be provided after testing.")
         
@@ -4,7 +4,7 @@ CliCare Objective 1 - OCR Technology Performance Testing (COMPREHENSIVE)
 Tests OCR accuracy on Philippine ID cards with comprehensive metrics
 Generates all required tables, matrices, and metrics for research documentation
 
-Run: python test_objective1_ocr_comprehensive.py
+Run: python test_objective1_ocr_comprehensive.py [--no-plots]
 """
 
 import pandas as pd
@@ -18,9 +18,11 @@ import base64
 from PIL import Image
 import io
 import random
-from sklearn.metrics import confusion_matrix, classification_report
-import matplotlib.pyplot as plt
-import seaborn as sns
+from plot_renderer import pyplot, figure_job, render_figures
+from telemetry import start_sinks
+from results_store import append_samples
+from run_history import record_run, config_snapshot
+from confidence import summary_intervals
 
 # ============================================================================
 # CONFIGURATION
@@ -358,6 +360,7 @@ def test_ocr_performance():
     # Export results
     results_df = pd.DataFrame(results)
     results_df.to_csv(f"{OUTPUT_DIR}/ocr_test_results.csv", index=False)
+    append_samples('ocr', results_df, success_column='correct_extraction')
     
     # Create test cases table for documentation
     test_cases_table = pd.DataFrame([
@@ -424,11 +427,14 @@ def test_ocr_performance():
         'character_recognition_rate': avg_char_accuracy,
         'field_extraction_rate': field_extraction_rate,
         'total_cases': total_cases,
-        'correct_extractions': correct_extractions
+        'correct_extractions': correct_extractions,
+        'successful_fields': successful_fields,
+        'character_accuracies': [r['character_accuracy'] for r in results]
     }
 
 def create_ocr_visualizations(ocr_results, results_df):
     """Create OCR performance visualization charts"""
+    plt = pyplot()
     
     # Set up the plotting style
     plt.style.use('default')
@@ -562,12 +568,25 @@ def generate_ocr_report(ocr_results):
             'total_metrics': total_metrics,
             'pass_rate': overall_pass_rate,
             'status': 'PASS' if overall_pass_rate >= 80 else 'FAIL'
-        }
+        },
+        'confidence_intervals': summary_intervals(
+            rates={
+                'ocr_accuracy': (ocr_results['correct_extractions'], ocr_results['total_cases']),
+                'fesr': (ocr_results['successful_fields'], ocr_results['total_cases'])
+            },
+            means={'crr': ocr_results['character_accuracies']}
+        )
     }
     
     # Export executive summary
     with open(f"{OUTPUT_DIR}/ocr_executive_summary.json", 'w') as f:
-        json.dump(executive_summary, f, indent=2)
+        json.dump(executive_summary, f, indent=2, default=str)
+    record_run('ocr', {
+        'ocr_accuracy': ocr_results['ocr_accuracy'],
+        'crr': ocr_results['character_recognition_rate'],
+        'fesr': ocr_results['field_extraction_rate'],
+        'pass_rate': overall_pass_rate
+    }, config=config_snapshot(globals()), status=executive_summary['overall_performance']['status'])
     
     # Print final report
     print(f"\n{'='*80}")
@@ -587,6 +606,11 @@ def generate_ocr_report(ocr_results):
     
     return executive_summary
 
+def render_ocr_figures(ocr_results):
+    """Render the OCR figure"""
+    results_df = pd.read_csv(f"{OUTPUT_DIR}/ocr_test_results.csv")
+    render_figures([figure_job(create_ocr_visualizations, ocr_results, results_df)])
+
 def run_comprehensive_ocr_tests():
     """Run all OCR technology tests"""
     
@@ -605,17 +629,11 @@ def run_comprehensive_ocr_tests():
         # Run OCR tests
         ocr_results = test_ocr_performance()
         
-        # Load results for visualization
-        results_df = pd.read_csv(f"{OUTPUT_DIR}/ocr_test_results.csv")
-        
         # Generate comprehensive report
         final_report = generate_ocr_report(ocr_results)
         
-        # Generate visualization
-        try:
-            create_ocr_visualizations(ocr_results, results_df)
-        except Exception as e:
-            print(f"⚠️ Visualization generation failed: {e}")
+        # Generate visualization (rendered off the main process, skipped with --no-plots)
+        render_ocr_figures(ocr_results)
         
         # Print completion message
         print(f"\n{'='*80}")
@@ -659,6 +677,7 @@ def run_comprehensive_ocr_tests():
 # ============================================================================
 
 if __name__ == "__main__":
+    start_sinks()  # --dashboard / --metrics / --stall-probe
     try:
         print("\n" + "="*80)
         print("CLICARE OBJECTIVE 1 - OCR TECHNOLOGY COMPREHENSIVE TESTING")
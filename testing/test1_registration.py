@@ -1,6 +1,6 @@
 """
 CliCare Objective 1 - Registration System Performance Testing
-Run: python test1_registration.py
+Run: python test1_registration.py [--no-plots] [--dashboard] [--metrics] [--stall-probe]
 """
 
 import requests
@@ -10,8 +10,11 @@ import json
 import time
 from datetime import datetime, timedelta
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+from plot_renderer import pyplot, figure_job, render_figures
+from results_store import append_samples
+from run_history import record_run, config_snapshot, latency_metrics
+from confidence import summary_intervals
+from telemetry import observe_request, last_server_timing, server_timing_breakdown, print_server_timing_breakdown, start_sinks
 
 # ============================================================================
 # CONFIGURATION
@@ -19,6 +22,7 @@ import seaborn as sns
 
 API_BASE = "http://localhost:5000"
 OUTPUT_DIR = "objective1_comprehensive_results/registration_performance"
+SUITE_NAME = 'registration'  # label for live telemetry (--dashboard)
 
 # Test configuration
 COMPREHENSIVE_TEST = True
@@ -44,12 +48,15 @@ def make_api_request(endpoint, method="GET", data=None, headers=None):
     try:
         url = f"{API_BASE}/{endpoint}"
         
+        request_start = time.perf_counter()
         if method == "GET":
             response = requests.get(url, headers=headers, timeout=15)
         elif method == "POST":
             response = requests.post(url, json=data, headers=headers, timeout=15)
         elif method == "DELETE":
             response = requests.delete(url, json=data, headers=headers, timeout=15)
+        observe_request(SUITE_NAME, endpoint, response.status_code, (time.perf_counter() - request_start) * 1000,
+                        response.headers.get('Server-Timing'))
         
         if response.status_code in [200, 201]:
             return response.json()
@@ -57,9 +64,11 @@ def make_api_request(endpoint, method="GET", data=None, headers=None):
             print(f"⚠️  API Error: {response.status_code} - {response.text[:200]}")
             return None
     except requests.exceptions.Timeout:
+        observe_request(SUITE_NAME, endpoint, 'timeout', None)
         print(f"⚠️  Request timeout for {endpoint}")
         return None
     except Exception as e:
+        observe_request(SUITE_NAME, endpoint, 'error', None)
         print(f"⚠️  Request failed: {e}")
         return None
 
@@ -73,6 +82,7 @@ def test_web_preregistration():
     
     total_attempts = 50
     successful = 0
+    samples = []
     
     for i in range(total_attempts):
         timestamp = int(time.time() * 1000000) + (i * 1000)
@@ -95,7 +105,11 @@ def test_web_preregistration():
             "expires_at": (datetime.now() + timedelta(days=1)).isoformat()
         }
         
+        start_time = time.time()
         result = make_api_request("api/temp-registration", method="POST", data=patient_data)
+        samples.append({'test_case': i+1, 'endpoint': "api/temp-registration",
+                        'response_time_ms': (time.time() - start_time) * 1000,
+                        'success': bool(result and result.get('success')), **last_server_timing()})
         
         if result and result.get('success'):
             successful += 1
@@ -110,7 +124,8 @@ def test_web_preregistration():
     return {
         'wprsr': wprsr,
         'successful': successful,
-        'total': total_attempts
+        'total': total_attempts,
+        'samples': samples
     }
 
 def test_kiosk_registration():
@@ -119,6 +134,7 @@ def test_kiosk_registration():
     
     total_sessions = 50
     completed = 0
+    samples = []
     
     for i in range(total_sessions):
         timestamp = int(time.time() * 1000000) + (i * 1000)
@@ -138,7 +154,11 @@ def test_kiosk_registration():
             "severity": "Moderate"
         }
         
+        start_time = time.time()
         result = make_api_request("api/patient/register", method="POST", data=patient_data)
+        samples.append({'test_case': i+1, 'endpoint': "api/patient/register",
+                        'response_time_ms': (time.time() - start_time) * 1000,
+                        'success': bool(result and result.get('success')), **last_server_timing()})
         
         if result and result.get('success'):
             completed += 1
@@ -153,7 +173,8 @@ def test_kiosk_registration():
     return {
         'hkrcr': hkrcr,
         'completed': completed,
-        'total': total_sessions
+        'total': total_sessions,
+        'samples': samples
     }
 
 def test_qr_code_verification():
@@ -163,6 +184,7 @@ def test_qr_code_verification():
     total_scans = 25
     successful_scans = 0
     temp_ids = []
+    samples = []
     
     # Create temp registrations first
     for i in range(total_scans):
@@ -193,7 +215,11 @@ def test_qr_code_verification():
     
     # Test QR verification
     for idx, temp_id in enumerate(temp_ids):
+        start_time = time.time()
         result = make_api_request(f"api/temp-registration/{temp_id}")
+        samples.append({'test_case': idx+1, 'endpoint': "api/temp-registration/:id",
+                        'response_time_ms': (time.time() - start_time) * 1000,
+                        'success': bool(result and result.get('success')), **last_server_timing()})
         if result and result.get('success'):
             successful_scans += 1
             print(f"  QR Test {idx+1}/{len(temp_ids)}: ✅ Success")
@@ -207,7 +233,8 @@ def test_qr_code_verification():
     return {
         'qrcva': qrcva,
         'successful_scans': successful_scans,
-        'total_scans': len(temp_ids)
+        'total_scans': len(temp_ids),
+        'samples': samples
     }
 
 def test_navigation_map_generation():
@@ -217,10 +244,16 @@ def test_navigation_map_generation():
     department_ids = list(range(1, 16))
     total_requests = len(department_ids) * 2
     successful_maps = 0
+    samples = []
     
     for dept_id in department_ids:
         for i in range(2):
+            start_time = time.time()
             result = make_api_request(f"api/navigation-steps/{dept_id}")
+            samples.append({'test_case': len(samples)+1, 'endpoint': "api/navigation-steps/:id",
+                            'department_id': dept_id,
+                            'response_time_ms': (time.time() - start_time) * 1000,
+                            'success': bool(result and result.get('success')), **last_server_timing()})
             if result and result.get('success'):
                 successful_maps += 1
             time.sleep(1.0)
@@ -230,7 +263,8 @@ def test_navigation_map_generation():
     return {
         'nmgsr': nmgsr,
         'successful': successful_maps,
-        'total': total_requests
+        'total': total_requests,
+        'samples': samples
     }
 
 def test_registration_system_performance():
@@ -282,16 +316,49 @@ def test_registration_system_performance():
     
     # Export results
     registration_metrics.to_csv(f"{OUTPUT_DIR}/metrics_summary.csv", index=False)
+    for stage, stage_results in [('web_preregistration', web_results), ('kiosk_registration', kiosk_results),
+                                 ('qr_code_verification', qr_results), ('navigation_map_generation', nav_results)]:
+        append_samples('registration', stage_results['samples'], stage=stage, latency_column='response_time_ms')
+    
+    # Server-side phase breakdown (Server-Timing) next to client latency
+    timing_rows = []
+    for stage, stage_results in [('web_preregistration', web_results), ('kiosk_registration', kiosk_results),
+                                 ('qr_code_verification', qr_results)]:
+        breakdown = server_timing_breakdown(stage_results['samples'], 'response_time_ms')
+        print_server_timing_breakdown(breakdown, stage)
+        timing_rows.extend({'stage': stage, **row} for row in breakdown)
+    if timing_rows:
+        pd.DataFrame(timing_rows).to_csv(f"{OUTPUT_DIR}/server_timing_breakdown.csv", index=False)
+    
+    latency = {}
+    for prefix, stage_results in [('web_registration', web_results), ('kiosk_registration', kiosk_results),
+                                  ('qr_verification', qr_results), ('navigation_map', nav_results)]:
+        latency.update(latency_metrics(prefix, [s['response_time_ms'] for s in stage_results['samples']]))
     
     return {
         'wprsr': web_results['wprsr'],
         'hkrcr': kiosk_results['hkrcr'],
         'qrcva': qr_results['qrcva'],
-        'nmgsr': nav_results['nmgsr']
+        'nmgsr': nav_results['nmgsr'],
+        'latency': latency,
+        'confidence_intervals': summary_intervals(
+            rates={
+                'wprsr': (web_results['successful'], web_results['total']),
+                'hkrcr': (kiosk_results['completed'], kiosk_results['total']),
+                'qrcva': (qr_results['successful_scans'], qr_results['total_scans']),
+                'nmgsr': (nav_results['successful'], nav_results['total'])
+            },
+            latencies={
+                stage: [s['response_time_ms'] for s in stage_results['samples']]
+                for stage, stage_results in [('web_registration', web_results), ('kiosk_registration', kiosk_results),
+                                             ('qr_verification', qr_results), ('navigation_map', nav_results)]
+            }
+        )
     }
 
 def create_registration_visualizations(reg_results):
     """Create performance visualization charts for registration system"""
+    plt = pyplot()
     
     # Set up the plotting style
     plt.style.use('default')
@@ -428,12 +495,21 @@ def generate_registration_report(reg_results):
             'total_metrics': total_metrics,
             'pass_rate': overall_pass_rate,
             'status': 'PASS' if overall_pass_rate >= 80 else 'FAIL'
-        }
+        },
+        'confidence_intervals': reg_results.get('confidence_intervals', {})
     }
     
     # Export executive summary
     with open(f"{OUTPUT_DIR}/registration_executive_summary.json", 'w') as f:
-        json.dump(executive_summary, f, indent=2)
+        json.dump(executive_summary, f, indent=2, default=str)
+    record_run('registration', {
+        'wprsr': reg_results['wprsr'],
+        'hkrcr': reg_results['hkrcr'],
+        'qrcva': reg_results['qrcva'],
+        'nmgsr': reg_results['nmgsr'],
+        'pass_rate': overall_pass_rate,
+        **reg_results.get('latency', {})
+    }, config=config_snapshot(globals()), status=executive_summary['overall_performance']['status'])
     
     # Print final report
     print(f"\n{'='*80}")
@@ -450,11 +526,8 @@ def generate_registration_report(reg_results):
     print(f"  Overall Pass Rate: {executive_summary['overall_performance']['pass_rate']:.2f}%")
     print(f"  System Status: {executive_summary['overall_performance']['status']}")
     
-    # Generate visualization
-    try:
-        create_registration_visualizations(reg_results)
-    except Exception as e:
-        print(f"⚠️ Visualization generation failed: {e}")
+    # Generate visualization (rendered off the main process, skipped with --no-plots)
+    render_figures([figure_job(create_registration_visualizations, reg_results)])
     
     return executive_summary
 
@@ -572,6 +645,7 @@ def run_comprehensive_registration_tests():
 # ============================================================================
 
 if __name__ == "__main__":
+    start_sinks()  # --dashboard / --metrics / --stall-probe
     try:
         print("\n" + "="*80)
         print("CLICARE OBJECTIVE 1 - REGISTRATION SYSTEM COMPREHENSIVE TESTING")
@@ -1,6 +1,6 @@
 """
 CliCare Objective 2 - Healthcare Provider Interface Testing (COMPREHENSIVE)
-Run: python test2_healthcare.py
+Run: python test2_healthcare.py [--no-plots] [--dashboard] [--metrics] [--stall-probe]
 """
 
 import requests
@@ -10,8 +10,11 @@ import json
 import time
 from datetime import datetime, timedelta
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+from plot_renderer import pyplot, figure_job, render_figures
+from results_store import append_samples
+from run_history import record_run, config_snapshot, latency_metrics
+from confidence import summary_intervals
+from telemetry import observe_request, last_server_timing, server_timing_breakdown, print_server_timing_breakdown, start_sinks
 
 # ============================================================================
 # CONFIGURATION
@@ -19,6 +22,7 @@ import seaborn as sns
 
 API_BASE = "http://localhost:5000"
 OUTPUT_DIR = "objective2_comprehensive_results/healthcare_interface"
+SUITE_NAME = 'healthcare_interface'  # label for live telemetry (--dashboard)
 
 # Test configuration
 COMPREHENSIVE_TEST = True
@@ -50,12 +54,15 @@ def make_api_request(endpoint, method="GET", data=None, headers=None):
     try:
         url = f"{API_BASE}/{endpoint}"
         
+        request_start = time.perf_counter()
         if method == "GET":
             response = requests.get(url, headers=headers, timeout=30)
         elif method == "POST":
             response = requests.post(url, json=data, headers=headers, timeout=30)
         elif method == "PATCH":
             response = requests.patch(url, json=data, headers=headers, timeout=30)
+        observe_request(SUITE_NAME, endpoint, response.status_code, (time.perf_counter() - request_start) * 1000,
+                        response.headers.get('Server-Timing'))
         
         if response.status_code in [200, 201]:
             return response.json()
@@ -63,9 +70,11 @@ def make_api_request(endpoint, method="GET", data=None, headers=None):
             print(f"⚠️  API Error: {response.status_code} - {response.text[:200]}")
             return None
     except requests.exceptions.Timeout:
+        observe_request(SUITE_NAME, endpoint, 'timeout', None)
         print(f"⚠️  Request timeout for {endpoint}")
         return None
     except Exception as e:
+        observe_request(SUITE_NAME, endpoint, 'error', None)
         print(f"⚠️  Request failed: {e}")
         return None
 
@@ -182,6 +191,7 @@ def test_lab_request_generation(token, staff_data):
             headers=headers
         )
         processing_time = (time.time() - start_time) * 1000  # Convert to ms
+        server_timing = last_server_timing()
         
         if result and result.get('success'):
             successful_requests += 1
@@ -195,7 +205,8 @@ def test_lab_request_generation(token, staff_data):
                 'request_id': result.get('labRequest', {}).get('request_id'),
                 'processing_time_ms': processing_time,
                 'success': True,
-                'status': 'Created successfully'
+                'status': 'Created successfully',
+                **server_timing
             })
         else:
             print(f"❌ Failed")
@@ -232,6 +243,12 @@ def test_lab_request_generation(token, staff_data):
     # Export results
     results_df = pd.DataFrame(results)
     results_df.to_csv(f"{OUTPUT_DIR}/lab_request_generation_results.csv", index=False)
+    append_samples('healthcare_interface', results_df, stage='lab_request_generation',
+                   endpoint="api/healthcare/lab-requests", latency_column='processing_time_ms', success_column='success')
+    breakdown = server_timing_breakdown(results, 'processing_time_ms')
+    print_server_timing_breakdown(breakdown, "Lab request generation")
+    if breakdown:
+        pd.DataFrame(breakdown).to_csv(f"{OUTPUT_DIR}/lab_request_server_timing.csv", index=False)
     
     if failed_requests:
         failed_df = pd.DataFrame(failed_requests)
@@ -273,6 +290,7 @@ def test_patient_history_retrieval(token, staff_data, lab_results):
             headers=headers
         )
         retrieval_time = (time.time() - start_time) * 1000
+        server_timing = last_server_timing()
         
         if result and result.get('success'):
             patient_data = result.get('patient')
@@ -293,7 +311,8 @@ def test_patient_history_retrieval(token, staff_data, lab_results):
                 'retrieved_correctly': is_correct,
                 'visit_count': len(visit_history),
                 'retrieval_time_ms': retrieval_time,
-                'data_access_time_under_3s': retrieval_time <= 3000
+                'data_access_time_under_3s': retrieval_time <= 3000,
+                **server_timing
             })
         else:
             print(f"❌ Retrieval failed")
@@ -303,7 +322,8 @@ def test_patient_history_retrieval(token, staff_data, lab_results):
                 'retrieved_correctly': False,
                 'visit_count': 0,
                 'retrieval_time_ms': retrieval_time,
-                'data_access_time_under_3s': False
+                'data_access_time_under_3s': False,
+                **server_timing
             })
         
         time.sleep(1.0)
@@ -332,17 +352,26 @@ def test_patient_history_retrieval(token, staff_data, lab_results):
     # Export results
     results_df = pd.DataFrame(results)
     results_df.to_csv(f"{OUTPUT_DIR}/patient_history_retrieval_results.csv", index=False)
+    append_samples('healthcare_interface', results_df, stage='patient_history_retrieval',
+                   endpoint="api/healthcare/patient-history", latency_column='retrieval_time_ms',
+                   success_column='retrieved_correctly')
+    breakdown = server_timing_breakdown(results, 'retrieval_time_ms')
+    print_server_timing_breakdown(breakdown, "Patient history retrieval")
+    if breakdown:
+        pd.DataFrame(breakdown).to_csv(f"{OUTPUT_DIR}/patient_history_server_timing.csv", index=False)
     
     return {
         'phra': phra,
         'correct': correct_retrievals,
         'total': total_requests,
         'avg_retrieval_time': avg_retrieval_time,
-        'access_time_compliance': access_time_compliance
+        'access_time_compliance': access_time_compliance,
+        'results': results
     }
 
 def create_healthcare_interface_visualizations(lrgsr_results, phra_results):
     """Create healthcare interface performance visualization"""
+    plt = pyplot()
     
     plt.style.use('default')
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
@@ -473,12 +502,34 @@ def generate_healthcare_interface_report(lrgsr_results, phra_results):
             'total_metrics': total_metrics,
             'pass_rate': overall_pass_rate,
             'status': 'PASS' if overall_pass_rate >= 80 else 'FAIL'
-        }
+        },
+        'confidence_intervals': summary_intervals(
+            rates={
+                'lrgsr': (lrgsr_results['successful'], lrgsr_results['total']),
+                'phra': (phra_results['correct'], phra_results['total']),
+                'access_time_compliance': (sum(1 for r in phra_results.get('results', []) if r['data_access_time_under_3s']),
+                                           phra_results['total'])
+            },
+            latencies={
+                'lab_request': [r['processing_time_ms'] for r in lrgsr_results['results']],
+                'patient_history': [r['retrieval_time_ms'] for r in phra_results.get('results', [])]
+            }
+        )
     }
     
     # Export executive summary
     with open(f"{OUTPUT_DIR}/healthcare_interface_executive_summary.json", 'w') as f:
-        json.dump(executive_summary, f, indent=2)
+        json.dump(executive_summary, f, indent=2, default=str)
+    record_run('healthcare_interface', {
+        'lrgsr': lrgsr_results['lrgsr'],
+        'phra': phra_results['phra'],
+        'avg_processing_time_ms': lrgsr_results['avg_processing_time'],
+        'avg_retrieval_time_ms': phra_results['avg_retrieval_time'],
+        'access_time_compliance': phra_results['access_time_compliance'],
+        'pass_rate': overall_pass_rate,
+        **latency_metrics('lab_request', [r['processing_time_ms'] for r in lrgsr_results['results']]),
+        **latency_metrics('patient_history', [r['retrieval_time_ms'] for r in phra_results.get('results', [])])
+    }, config=config_snapshot(globals()), status=executive_summary['overall_performance']['status'])
     
     # Create metrics summary
     metrics_summary = pd.DataFrame([{
@@ -561,6 +612,10 @@ def cleanup_healthcare_interface_test_data():
     print(f"✅ Healthcare interface cleanup SQL saved to {OUTPUT_DIR}/healthcare_interface_cleanup_sql.sql")
     print("💡 Run the SQL commands to clean up test data from your database")
 
+def render_healthcare_interface_figures(lrgsr_results, phra_results):
+    """Render the healthcare interface figure"""
+    render_figures([figure_job(create_healthcare_interface_visualizations, lrgsr_results, phra_results)])
+
 def run_comprehensive_healthcare_interface_tests():
     """Run all healthcare provider interface tests"""
     
@@ -599,11 +654,8 @@ def run_comprehensive_healthcare_interface_tests():
         # Generate comprehensive report
         final_report = generate_healthcare_interface_report(lrgsr_results, phra_results)
         
-        # Generate visualization
-        try:
-            create_healthcare_interface_visualizations(lrgsr_results, phra_results)
-        except Exception as e:
-            print(f"⚠️ Visualization generation failed: {e}")
+        # Generate visualization (rendered off the main process, skipped with --no-plots)
+        render_healthcare_interface_figures(lrgsr_results, phra_results)
         
         # Print completion message
         print(f"\n{'='*80}")
@@ -649,6 +701,7 @@ def run_comprehensive_healthcare_interface_tests():
 # ============================================================================
 
 if __name__ == "__main__":
+    start_sinks()  # --dashboard / --metrics / --stall-probe
     try:
         print("\n" + "="*80)
         print("CLICARE OBJECTIVE 2 - HEALTHCARE PROVIDER INTERFACE TESTING")
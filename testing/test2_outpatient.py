@@ -1,6 +1,6 @@
 """
 CliCare Objective 2 - Document Upload Performance Testing
-Run: python test2_outpatient.py
+Run: python test2_outpatient.py [--concurrent] [--no-plots] [--dashboard] [--metrics] [--stall-probe]
 """
 
 import requests
@@ -10,12 +10,17 @@ import json
 import time
 import random
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-from io import BytesIO
-from PIL import Image
+import sys
+from plot_renderer import pyplot, figure_job, render_figures
+from results_store import append_samples
+from run_history import record_run, config_snapshot, latency_metrics
+from confidence import summary_intervals
+from telemetry import observe_request, start_sinks
+from upload_stream import MultipartStream, DiskFile, client_rss_mb, upload_dir_usage, device_write_mb
+from upload_corpus import corpus_path, warm_corpus, corpus_stats
 from pathlib import Path
 
 # ============================================================================
@@ -24,6 +29,7 @@ from pathlib import Path
 
 API_BASE = "http://localhost:5000"
 OUTPUT_DIR = "objective2_comprehensive_results/document_upload"
+SUITE_NAME = 'document_upload'  # label for live telemetry (--dashboard)
 SAMPLE_FILES_DIR = "sample_files"  # must contain 'valid' and 'invalid' subfolders
 
 # Test configuration
@@ -38,6 +44,19 @@ UPLOAD_RATE_RANGE_MBPS = (0.5, 5.0)  # MB/s
 BASE_LATENCY_RANGE = (0.03, 0.25)  # seconds
 TIME_TARGET_MS = 10000  # 10 seconds
 
+# Concurrent stress mode (--concurrent or CLICARE_CONCURRENT_UPLOADS=1)
+CONCURRENT_STRESS = '--concurrent' in sys.argv or os.environ.get('CLICARE_CONCURRENT_UPLOADS') == '1'
+PARALLEL_UPLOADS = int(os.environ.get('CLICARE_PARALLEL_UPLOADS', '16'))
+STRESS_TOTAL_UPLOADS = 200
+STRESS_SIZE_MIX = [  # (size bucket, file size MB, share of uploads)
+    ('small', 0.2, 0.40),
+    ('medium', 1.5, 0.35),
+    ('large', 5, 0.20),
+    ('near_limit', 9.5, 0.05),
+]
+STRESS_ENDPOINTS = ('api/patient/upload-lab-result', 'api/patient/upload-lab-result-by-test')
+UPLOAD_DIR = "uploads/lab-results"  # the server's multer destination, when run from the server's directory
+
 # TEST PATIENT CONFIGURATION
 TEST_PATIENT = {
     "patientId": "PAT712161759",
@@ -45,6 +64,27 @@ TEST_PATIENT = {
     "contactType": "email"
 }
 
+# Synthetic test scenarios (used if realistic mode is off or no files found)
+SYNTHETIC_SCENARIOS = [
+    ('test_result.pdf', 'application/pdf', 1, True, 'PDF lab result'),
+    ('lab_report.jpg', 'image/jpeg', 2, True, 'JPEG scan'),
+    ('scan_result.png', 'image/png', 1.5, True, 'PNG image'),
+    ('medical_doc.pdf', 'application/pdf', 3, True, 'Large PDF'),
+    ('xray_image.jpg', 'image/jpeg', 4, True, 'Large JPEG'),
+    ('ultrasound.png', 'image/png', 2.5, True, 'Ultrasound image'),
+    ('blood_test.pdf', 'application/pdf', 0.5, True, 'Small PDF'),
+    ('ct_scan.jpg', 'image/jpeg', 5, True, 'CT scan'),
+    ('test_file.txt', 'text/plain', 1, False, 'Text file - not allowed'),
+    ('result.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 1, False, 'Excel - not allowed'),
+    ('document.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 1, False, 'Word - not allowed'),
+    ('video.mp4', 'video/mp4', 2, False, 'Video - not allowed'),
+    ('audio.mp3', 'audio/mpeg', 1, False, 'Audio - not allowed'),
+    ('large_file.pdf', 'application/pdf', 9, True, 'Large file near limit'),
+    ('very_large.jpg', 'image/jpeg', 11, False, 'File exceeds 10MB'),
+    ('tiny_file.pdf', 'application/pdf', 0.1, True, 'Very small file'),
+]
+CORPUS_SEEDS = 4  # content variants per (format, size) in the synthetic upload corpus
+
 # Valid file extensions for uploads
 VALID_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg'}
 
@@ -62,18 +102,24 @@ def print_section_header(title):
     print(title.center(80))
     print("="*80 + "\n")
 
-def make_api_request(endpoint, method="GET", data=None, headers=None, files=None, timeout=60):
-    """Make API request with error handling"""
+def make_api_request(endpoint, method="GET", data=None, headers=None, files=None, multipart=None, timeout=60):
+    """Make API request with error handling (multipart: a streamed MultipartStream body)"""
     try:
         url = f"{API_BASE}/{endpoint}"
         
+        request_start = time.perf_counter()
         if method == "GET":
             response = requests.get(url, headers=headers, timeout=timeout)
         elif method == "POST":
-            if files:
+            if multipart is not None:
+                response = requests.post(url, data=multipart, timeout=timeout,
+                                         headers={**(headers or {}), 'Content-Type': multipart.content_type})
+            elif files:
                 response = requests.post(url, data=data, files=files, headers=headers, timeout=timeout)
             else:
                 response = requests.post(url, json=data, headers=headers, timeout=timeout)
+        observe_request(SUITE_NAME, endpoint, response.status_code, (time.perf_counter() - request_start) * 1000,
+                        response.headers.get('Server-Timing'))
         
         if response.status_code in [200, 201]:
             return response.json()
@@ -81,9 +127,11 @@ def make_api_request(endpoint, method="GET", data=None, headers=None, files=None
             print(f"⚠️  API Error: {response.status_code} - {response.text[:200]}")
             return None
     except requests.exceptions.Timeout:
+        observe_request(SUITE_NAME, endpoint, 'timeout', None)
         print(f"⚠️  Request timeout for {endpoint}")
         return None
     except Exception as e:
+        observe_request(SUITE_NAME, endpoint, 'error', None)
         print(f"⚠️  Request failed: {e}")
         return None
 
@@ -161,15 +209,9 @@ def human_think_delay():
     time.sleep(delay)
     return delay
 
-def simulate_network_delay_seconds(file_size_mb):
-    """Simulate network latency based on file size and connection speed"""
-    base = random.uniform(*BASE_LATENCY_RANGE)
-    upload_rate = random.uniform(*UPLOAD_RATE_RANGE_MBPS)  # MB/s
-    transfer_time = file_size_mb / upload_rate
-    jitter = random.uniform(-0.1, 0.3) * transfer_time
-    delay = max(0.0, base + transfer_time + jitter)
-    time.sleep(delay)
-    return delay
+def pick_network_profile():
+    """Upload rate (MB/s) and base latency (s) of one client connection"""
+    return random.uniform(*UPLOAD_RATE_RANGE_MBPS), random.uniform(*BASE_LATENCY_RANGE)
 
 def file_size_mb_from_path(path):
     """Get file size in MB"""
@@ -195,6 +237,20 @@ def is_valid_format(path):
     """Check if file has a valid extension"""
     return Path(path).suffix.lower() in VALID_EXTENSIONS
 
+def corpus_specs():
+    """(filename, size MB, seed) of every synthetic and stress upload file"""
+    files = [(filename, size_mb) for filename, _, size_mb, _, _ in SYNTHETIC_SCENARIOS]
+    files += [(f"stress.{extension}", size_mb) for _, size_mb, _ in STRESS_SIZE_MIX for extension in ('pdf', 'jpg', 'png')]
+    return [(filename, size_mb, seed) for filename, size_mb in files for seed in range(CORPUS_SEEDS)]
+
+def warm_upload_corpus():
+    """Generate any missing synthetic upload files once, in parallel, before the timed uploads"""
+    start = time.perf_counter()
+    created = warm_corpus(corpus_specs())
+    files, apparent_mb, allocated_mb = corpus_stats()
+    print(f"📦 Upload corpus: {files} files ({created} generated in {time.perf_counter() - start:.2f}s), "
+          f"{apparent_mb:.0f}MB apparent, {allocated_mb:.2f}MB on disk")
+
 def create_test_lab_request(token, patient_id, index):
     """Create a test lab request for upload testing"""
     headers = {"Authorization": f"Bearer {token}"}
@@ -216,31 +272,6 @@ def create_test_lab_request(token, patient_id, index):
         'status': 'pending'
     }
 
-def generate_test_file(filename, file_size_mb=1):
-    """Generate synthetic test file content"""
-    file_size = int(file_size_mb * 1024 * 1024)
-    
-    if filename.endswith('.pdf'):
-        content = b'%PDF-1.4\n' + b'X' * (file_size - 10) + b'\n%%EOF'
-    elif filename.endswith(('.jpg', '.jpeg')):
-        img = Image.new('RGB', (100, 100), color='red')
-        img_bytes = BytesIO()
-        img.save(img_bytes, format='JPEG')
-        content = img_bytes.getvalue()
-        if len(content) < file_size:
-            content += b'X' * (file_size - len(content))
-    elif filename.endswith('.png'):
-        img = Image.new('RGB', (100, 100), color='blue')
-        img_bytes = BytesIO()
-        img.save(img_bytes, format='PNG')
-        content = img_bytes.getvalue()
-        if len(content) < file_size:
-            content += b'X' * (file_size - len(content))
-    else:
-        content = b'X' * file_size
-    
-    return content
-
 # ============================================================================
 # DOCUMENT UPLOAD PERFORMANCE TESTING (COMBINED MODE)
 # ============================================================================
@@ -288,25 +319,9 @@ def test_document_upload_performance(token, patient_id):
         use_realistic = False
         print("🔧 SYNTHETIC MODE: Generating test files")
     
-    # Synthetic test scenarios (used if realistic mode is off or no files found)
-    synthetic_scenarios = [
-        ('test_result.pdf', 'application/pdf', 1, True, 'PDF lab result'),
-        ('lab_report.jpg', 'image/jpeg', 2, True, 'JPEG scan'),
-        ('scan_result.png', 'image/png', 1.5, True, 'PNG image'),
-        ('medical_doc.pdf', 'application/pdf', 3, True, 'Large PDF'),
-        ('xray_image.jpg', 'image/jpeg', 4, True, 'Large JPEG'),
-        ('ultrasound.png', 'image/png', 2.5, True, 'Ultrasound image'),
-        ('blood_test.pdf', 'application/pdf', 0.5, True, 'Small PDF'),
-        ('ct_scan.jpg', 'image/jpeg', 5, True, 'CT scan'),
-        ('test_file.txt', 'text/plain', 1, False, 'Text file - not allowed'),
-        ('result.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 1, False, 'Excel - not allowed'),
-        ('document.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 1, False, 'Word - not allowed'),
-        ('video.mp4', 'video/mp4', 2, False, 'Video - not allowed'),
-        ('audio.mp3', 'audio/mpeg', 1, False, 'Audio - not allowed'),
-        ('large_file.pdf', 'application/pdf', 9, True, 'Large file near limit'),
-        ('very_large.jpg', 'image/jpeg', 11, False, 'File exceeds 10MB'),
-        ('tiny_file.pdf', 'application/pdf', 0.1, True, 'Very small file'),
-    ]
+    if not use_realistic:
+        warm_upload_corpus()
+    
     
     print(f"\nTesting {total_uploads} document upload attempts...")
     print(f"Patient ID: {patient_id}\n")
@@ -329,7 +344,8 @@ def test_document_upload_performance(token, patient_id):
                 'format_compatible': False,
                 'upload_time_ms': 0,
                 'user_delay_s': 0,
-                'simulated_network_delay_ms': 0,
+                'upload_rate_mbps': None,
+                'base_latency_ms': 0,
                 'measured_request_time_ms': 0,
                 'end_to_end_ms': 0,
                 'under_10s': False,
@@ -348,9 +364,9 @@ def test_document_upload_performance(token, patient_id):
             mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
             description = f"Real file: {filename}"
             
-            # Simulate user behavior
+            # Simulate user behavior; the upload itself is paced at the client's rate
             user_delay = human_think_delay()
-            simulated_network_delay = simulate_network_delay_seconds(file_size_mb)
+            upload_rate_mbps, base_latency_s = pick_network_profile()
             
             # Perform upload with retry logic
             attempt = 0
@@ -361,24 +377,22 @@ def test_document_upload_performance(token, patient_id):
             while attempt <= MAX_RETRIES:
                 attempt += 1
                 try:
-                    with open(file_path, 'rb') as fh:
-                        files = {
-                            'labResultFile': (filename, fh, mimetype)
-                        }
-                        upload_data = {
-                            'labRequestId': str(lab_request['request_id']),
-                            'patientId': patient_id
-                        }
-                        
-                        start_time = time.time()
-                        result = make_api_request(
-                            "api/patient/upload-lab-result",
-                            method="POST",
-                            data=upload_data,
-                            files=files,
-                            headers=headers
-                        )
-                        measured_request_time_ms = (time.time() - start_time) * 1000
+                    # Streamed from disk a chunk at a time; a new body per attempt
+                    body = MultipartStream(
+                        {'labRequestId': str(lab_request['request_id']), 'patientId': patient_id},
+                        {'labResultFile': DiskFile(file_path, mimetype, filename)},
+                        rate_mbps=upload_rate_mbps,
+                        latency_s=base_latency_s
+                    )
+                    
+                    start_time = time.time()
+                    result = make_api_request(
+                        "api/patient/upload-lab-result",
+                        method="POST",
+                        multipart=body,
+                        headers=headers
+                    )
+                    measured_request_time_ms = (time.time() - start_time) * 1000
                     
                     if result and result.get('success'):
                         success = True
@@ -391,34 +405,28 @@ def test_document_upload_performance(token, patient_id):
                     if attempt <= MAX_RETRIES:
                         time.sleep(0.5 * (2 ** (attempt - 1)))
             
-            end_to_end_ms = (simulated_network_delay * 1000) + measured_request_time_ms
+            end_to_end_ms = measured_request_time_ms
             
         # SYNTHETIC MODE: Generate test files
         else:
-            scenario = synthetic_scenarios[i % len(synthetic_scenarios)]
+            scenario = SYNTHETIC_SCENARIOS[i % len(SYNTHETIC_SCENARIOS)]
             filename, mimetype, file_size_mb, should_succeed, description = scenario
+            seed = (i // len(SYNTHETIC_SCENARIOS)) % CORPUS_SEEDS
             
             user_delay = 0
-            simulated_network_delay = 0
-            
-            # Generate test file
-            file_content = generate_test_file(filename, file_size_mb)
-            
-            files = {
-                'labResultFile': (filename, BytesIO(file_content), mimetype)
-            }
+            upload_rate_mbps, base_latency_s = None, 0
             
-            upload_data = {
-                'labRequestId': str(lab_request['request_id']),
-                'patientId': patient_id
-            }
+            # Streamed from the pre-generated corpus; nothing is encoded or held in memory per upload
+            body = MultipartStream(
+                {'labRequestId': str(lab_request['request_id']), 'patientId': patient_id},
+                {'labResultFile': DiskFile(corpus_path(filename, file_size_mb, seed), mimetype, filename)}
+            )
             
             start_time = time.time()
             result = make_api_request(
                 "api/patient/upload-lab-result",
                 method="POST",
-                data=upload_data,
-                files=files,
+                multipart=body,
                 headers=headers
             )
             measured_request_time_ms = (time.time() - start_time) * 1000
@@ -447,7 +455,8 @@ def test_document_upload_performance(token, patient_id):
             'format_compatible': format_compatible,
             'upload_time_ms': measured_request_time_ms,
             'user_delay_s': user_delay,
-            'simulated_network_delay_ms': int(simulated_network_delay * 1000) if use_realistic else 0,
+            'upload_rate_mbps': round(upload_rate_mbps, 2) if upload_rate_mbps else None,
+            'base_latency_ms': int(base_latency_s * 1000),
             'measured_request_time_ms': int(measured_request_time_ms),
             'end_to_end_ms': int(end_to_end_ms),
             'under_10s': end_to_end_ms <= TIME_TARGET_MS,
@@ -455,6 +464,7 @@ def test_document_upload_performance(token, patient_id):
             'patient_id': patient_id,
             'lab_request_id': lab_request['request_id'],
             'is_system_failure': False,
+            'client_rss_mb': client_rss_mb()[0],
             'mode': 'realistic' if use_realistic else 'synthetic'
         })
         
@@ -485,6 +495,7 @@ def test_document_upload_performance(token, patient_id):
     valid_upload_times = [r['end_to_end_ms'] for r in valid_tests if r['end_to_end_ms'] > 0]
     avg_upload_time = np.mean(valid_upload_times) if valid_upload_times else 0
     processing_time_compliance = sum(1 for r in valid_tests if r['under_10s']) / len(valid_tests) * 100 if valid_tests else 0
+    client_rss, client_peak_rss = client_rss_mb()
     
     # Print results
     print(f"\n{'='*80}")
@@ -520,16 +531,23 @@ def test_document_upload_performance(token, patient_id):
     print(f"Processing Time Compliance: {processing_time_compliance:.2f}%")
     print(f"Status: {'✅ PASS' if avg_upload_time <= TIME_TARGET_MS else '❌ FAIL'}")
     
+    if client_peak_rss is not None:
+        print(f"\n📊 CLIENT MEMORY (streamed uploads):")
+        print(f"Harness RSS: {client_rss or 0:.1f}MB now, {client_peak_rss:.1f}MB peak")
+    
     # Export results
     results_df = pd.DataFrame(results)
     results_df.to_csv(f"{OUTPUT_DIR}/document_upload_results.csv", index=False)
+    append_samples('document_upload', results_df, endpoint="api/patient/upload-lab-result",
+                   latency_column='end_to_end_ms', success_column='upload_successful')
     
     with open(f"{OUTPUT_DIR}/document_upload_results.json", 'w') as f:
         json.dump({
             'generated_at': datetime.utcnow().isoformat() + 'Z',
             'mode': 'realistic' if use_realistic else 'synthetic',
+            'client_peak_rss_mb': client_peak_rss,
             'results': results
-        }, f, indent=2)
+        }, f, indent=2, default=str)
     
     # Create format analysis
     valid_results_df = results_df[~results_df['is_system_failure']]
@@ -553,17 +571,152 @@ def test_document_upload_performance(token, patient_id):
         'overall_success_rate': overall_success_rate,
         'successful': total_successful_operations,
         'total': total_tests,
+        'successful_valid_uploads': successful_valid_uploads,
         'valid_attempts': len(valid_uploads),
         'setup_failures': setup_failures,
         'avg_upload_time': avg_upload_time,
         'processing_time_compliance': processing_time_compliance,
+        'client_peak_rss_mb': client_peak_rss,
         'system_status': 'PASS' if overall_success_rate >= 95 and ffcr >= 98 and avg_upload_time <= TIME_TARGET_MS else 'FAIL',
         'results': results,
         'mode': 'realistic' if use_realistic else 'synthetic'
     }
 
+# ============================================================================
+# CONCURRENT UPLOAD STRESS (--concurrent)
+# ============================================================================
+
+def plan_stress_uploads(total_uploads):
+    """(endpoint, size bucket, size MB, filename, mimetype) per upload, following STRESS_SIZE_MIX"""
+    buckets = [bucket for bucket, _, _ in STRESS_SIZE_MIX]
+    sizes = {bucket: size for bucket, size, _ in STRESS_SIZE_MIX}
+    shares = [share for _, _, share in STRESS_SIZE_MIX]
+    formats = [('pdf', 'application/pdf'), ('jpg', 'image/jpeg'), ('png', 'image/png')]
+    plan = []
+    for i, bucket in enumerate(random.choices(buckets, weights=shares, k=total_uploads)):
+        extension, mimetype = formats[i % len(formats)]
+        plan.append((STRESS_ENDPOINTS[i % len(STRESS_ENDPOINTS)], bucket, sizes[bucket],
+                     f"stress_{bucket}_{i}.{extension}", mimetype))
+    return plan
+
+def stress_upload(i, upload, token, patient_id):
+    """One upload of the stress run; never raises"""
+    endpoint, bucket, size_mb, filename, mimetype = upload
+    fields = {'labRequestId': str(1 + i % 50), 'patientId': patient_id}  # same lab requests as the sequential test
+    if endpoint.endswith('by-test'):
+        fields['testName'] = 'Complete Blood Count'
+    source = DiskFile(corpus_path(filename, size_mb, i % CORPUS_SEEDS), mimetype, filename)
+    body = MultipartStream(fields, {'labResultFile': source})
+
+    start = time.perf_counter()
+    try:
+        response = requests.post(f"{API_BASE}/{endpoint}", data=body, timeout=120,
+                                 headers={'Authorization': f'Bearer {token}', 'Content-Type': body.content_type})
+        status = response.status_code
+        server_timing = response.headers.get('Server-Timing')
+    except requests.exceptions.RequestException:
+        status, server_timing = 'error', None
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    observe_request(SUITE_NAME, endpoint, status, elapsed_ms if status != 'error' else None, server_timing)
+
+    return {
+        'upload': i + 1,
+        'endpoint': endpoint,
+        'size_bucket': bucket,
+        'file_size_mb': round(len(body) / (1024 * 1024), 3),
+        'status': status,
+        'uploaded': status in (200, 201),
+        'response_time_ms': round(elapsed_ms, 1)
+    }
+
+def test_concurrent_upload_stress(token, patient_id, parallel=PARALLEL_UPLOADS, total_uploads=STRESS_TOTAL_UPLOADS):
+    """Whole-clinic upload burst: `parallel` uploads in flight across both lab-result endpoints"""
+    print_section_header("CONCURRENT UPLOAD STRESS")
+    print(f"{total_uploads} uploads, {parallel} in parallel, size mix: "
+          + ", ".join(f"{bucket} {size}MB ({share:.0%})" for bucket, size, share in STRESS_SIZE_MIX))
+
+    plan = plan_stress_uploads(total_uploads)
+    warm_upload_corpus()
+    watch_dir = os.path.isdir(UPLOAD_DIR)
+    if not watch_dir:
+        print(f"⚠️  {UPLOAD_DIR} not found - run from the server's directory to measure disk I/O")
+    files_before, mb_before = upload_dir_usage(UPLOAD_DIR) if watch_dir else (None, None)
+    device_before = device_write_mb(UPLOAD_DIR) if watch_dir else None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        results = list(pool.map(lambda item: stress_upload(item[0], item[1], token, patient_id), enumerate(plan)))
+    wall_s = time.perf_counter() - start
+
+    files_after, mb_after = upload_dir_usage(UPLOAD_DIR) if watch_dir else (None, None)
+    device_after = device_write_mb(UPLOAD_DIR) if watch_dir else None
+    client_rss, client_peak_rss = client_rss_mb()
+
+    results_df = pd.DataFrame(results)
+    uploaded = results_df[results_df['uploaded']]
+    uploaded_mb = uploaded['file_size_mb'].sum()
+
+    by_size = []
+    for bucket, _, _ in STRESS_SIZE_MIX:
+        group = results_df[results_df['size_bucket'] == bucket]
+        ok = group[group['uploaded']]
+        latencies = ok['response_time_ms'].to_numpy(dtype=float)
+        by_size.append({
+            'size_bucket': bucket,
+            'uploads': len(group),
+            'uploaded': len(ok),
+            'p50_ms': round(np.percentile(latencies, 50), 1) if latencies.size else None,
+            'p95_ms': round(np.percentile(latencies, 95), 1) if latencies.size else None,
+            'max_ms': round(latencies.max(), 1) if latencies.size else None
+        })
+    by_size_df = pd.DataFrame(by_size)
+
+    rejections = results_df.loc[~results_df['uploaded'], 'status'].astype(str).value_counts().to_dict()
+    summary = {
+        'parallel_uploads': parallel,
+        'total_uploads': total_uploads,
+        'uploaded': len(uploaded),
+        'rejections': rejections,
+        'wall_s': round(wall_s, 2),
+        'uploaded_mb': round(uploaded_mb, 2),
+        'throughput_mb_per_s': round(uploaded_mb / wall_s, 2) if wall_s else None,
+        'upload_dir_new_files': files_after - files_before if watch_dir else None,
+        'upload_dir_growth_mb': round(mb_after - mb_before, 2) if watch_dir else None,
+        'device_write_mb': round(device_after - device_before, 2) if None not in (device_before, device_after) else None,
+        'device_write_mb_per_s': round((device_after - device_before) / wall_s, 2)
+                                 if None not in (device_before, device_after) and wall_s else None,
+        'client_peak_rss_mb': client_peak_rss
+    }
+
+    print(f"\n{'SIZE':<12} {'N':>5} {'OK':>5} {'P50':>9} {'P95':>9} {'MAX':>9}")
+    for row in by_size:
+        fmt = lambda v: '-' if v is None else f"{v:.0f}ms"
+        print(f"{row['size_bucket']:<12} {row['uploads']:>5} {row['uploaded']:>5} {fmt(row['p50_ms']):>9} "
+              f"{fmt(row['p95_ms']):>9} {fmt(row['max_ms']):>9}")
+    print(f"\n📊 Throughput: {summary['uploaded_mb']}MB in {summary['wall_s']}s = {summary['throughput_mb_per_s']} MB/s")
+    print(f"📊 Server-side rejections: {rejections if rejections else 'none'}")
+    if watch_dir:
+        device = (f", device writes {summary['device_write_mb']}MB ({summary['device_write_mb_per_s']} MB/s)"
+                  if summary['device_write_mb'] is not None else "")
+        print(f"📊 {UPLOAD_DIR}: +{summary['upload_dir_new_files']} files, +{summary['upload_dir_growth_mb']}MB{device}")
+    if client_peak_rss is not None:
+        print(f"📊 Harness RSS: {client_peak_rss:.1f}MB peak")
+
+    results_df.to_csv(f"{OUTPUT_DIR}/concurrent_upload_results.csv", index=False)
+    by_size_df.to_csv(f"{OUTPUT_DIR}/concurrent_upload_by_size.csv", index=False)
+    with open(f"{OUTPUT_DIR}/concurrent_upload_summary.json", 'w') as f:
+        json.dump({
+            'generated_at': datetime.utcnow().isoformat() + 'Z',
+            'size_mix': [{'size_bucket': b, 'size_mb': s, 'share': w} for b, s, w in STRESS_SIZE_MIX],
+            'summary': summary,
+            'by_size': by_size
+        }, f, indent=2, default=str)
+
+    return {**summary, 'by_size': by_size}
+
 def create_document_upload_visualizations(upload_results):
     """Create document upload performance visualization"""
+    plt = pyplot()
     
     plt.style.use('default')
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
@@ -675,12 +828,30 @@ def generate_document_upload_report(upload_results):
             'total_metrics': total_metrics,
             'pass_rate': overall_pass_rate,
             'status': 'PASS' if overall_pass_rate >= 80 else 'FAIL'
-        }
+        },
+        'confidence_intervals': summary_intervals(
+            rates={
+                'dusr': (upload_results['successful_valid_uploads'], upload_results['valid_attempts']),
+                'ffcr': (upload_results['successful'], upload_results['total'])
+            },
+            latencies={
+                'upload': [r['end_to_end_ms'] for r in upload_results['results'] if not r.get('is_system_failure')]
+            }
+        )
     }
     
     # Export executive summary
     with open(f"{OUTPUT_DIR}/document_upload_executive_summary.json", 'w') as f:
-        json.dump(executive_summary, f, indent=2)
+        json.dump(executive_summary, f, indent=2, default=str)
+    record_run('document_upload', {
+        'dusr': upload_results['dusr'],
+        'ffcr': upload_results['ffcr'],
+        'avg_upload_time_ms': upload_results['avg_upload_time'],
+        'processing_time_compliance': upload_results['processing_time_compliance'],
+        'pass_rate': overall_pass_rate,
+        **latency_metrics('upload', [r['end_to_end_ms'] for r in upload_results['results']
+                                     if not r.get('is_system_failure')])
+    }, config=config_snapshot(globals()), status=executive_summary['overall_performance']['status'])
     
     # Create metrics summary
     metrics_summary = pd.DataFrame([{
@@ -726,6 +897,10 @@ def generate_document_upload_report(upload_results):
     
     return executive_summary
 
+def render_document_upload_figures(upload_results):
+    """Render the document upload figure"""
+    render_figures([figure_job(create_document_upload_visualizations, upload_results)])
+
 def run_comprehensive_document_upload_tests():
     """Run all document upload performance tests"""
     
@@ -765,15 +940,14 @@ def run_comprehensive_document_upload_tests():
         
         # Run tests
         upload_results = test_document_upload_performance(token, patient_data['patient_id'])
+        if CONCURRENT_STRESS:
+            upload_results['concurrent_stress'] = test_concurrent_upload_stress(token, patient_data['patient_id'])
         
         # Generate comprehensive report
         final_report = generate_document_upload_report(upload_results)
         
-        # Generate visualization
-        try:
-            create_document_upload_visualizations(upload_results)
-        except Exception as e:
-            print(f"⚠️ Visualization generation failed: {e}")
+        # Generate visualization (rendered off the main process, skipped with --no-plots)
+        render_document_upload_figures(upload_results)
         
         # Print completion message
         print(f"\n{'='*80}")
@@ -790,6 +964,8 @@ def run_comprehensive_document_upload_tests():
         print(f"   • Metrics Summary: {OUTPUT_DIR}/metrics_summary.csv")
         print(f"   • Executive Summary: {OUTPUT_DIR}/document_upload_executive_summary.json")
         print(f"   • Performance Chart: {OUTPUT_DIR}/document_upload_visualization.png")
+        if CONCURRENT_STRESS:
+            print(f"   • Concurrent Stress: {OUTPUT_DIR}/concurrent_upload_summary.json")
         
         return final_report
         
@@ -807,6 +983,7 @@ def run_comprehensive_document_upload_tests():
 # ============================================================================
 
 if __name__ == "__main__":
+    start_sinks()  # --dashboard / --metrics / --stall-probe
     try:
         print("\n" + "="*80)
         print("CLICARE OBJECTIVE 2 - DOCUMENT UPLOAD PERFORMANCE TESTING")
@@ -821,7 +998,7 @@ if __name__ == "__main__":
         
         if USE_REALISTIC_MODE:
             print("   ✓ Use REALISTIC files from sample_files/ directory")
-            print("   ✓ Simulate user behavior (think time, network delays)")
+            print("   ✓ Simulate user think time and shape upload bandwidth per client")
             print("   ✓ Implement retry logic for failed uploads")
         else:
             print("   ✓ Use SYNTHETIC generated test files")
@@ -882,7 +1059,7 @@ if __name__ == "__main__":
             if USE_REALISTIC_MODE:
                 print(f"\n🎯 REALISTIC MODE INSIGHTS:")
                 print(f"   • User behavior simulation: Included")
-                print(f"   • Network latency simulation: Included")
+                print(f"   • Upload bandwidth shaping: {UPLOAD_RATE_RANGE_MBPS[0]}-{UPLOAD_RATE_RANGE_MBPS[1]} MB/s")
                 print(f"   • Retry logic: Enabled (max {MAX_RETRIES} retries)")
                 print(f"   • Real file testing: Complete")
         
@@ -1,6 +1,6 @@
 """
 CliCare - Chatbot Performance Testing
-python test3_chatbot.py
+python test3_chatbot.py [--dashboard] [--metrics] [--stall-probe]
 """
 
 import requests
@@ -10,6 +10,10 @@ import json
 import time
 from datetime import datetime, timedelta
 import os
+from results_store import append_samples
+from run_history import record_run, config_snapshot, latency_metrics
+from confidence import summary_intervals
+from telemetry import observe_request, start_sinks
 
 # ============================================================================
 # CONFIGURATION
@@ -17,12 +21,14 @@ import os
 
 API_BASE = "http://localhost:5000"
 OUTPUT_DIR = "chatbot_test_results/performance"
+SUITE_NAME = 'chatbot'  # label for live telemetry (--dashboard)
 
 # ⚠️ AGGRESSIVE RATE LIMITING CONFIGURATION
 DELAY_BETWEEN_REQUESTS = 8  # seconds (7.5 requests per minute - SAFE)
 MAX_REQUESTS_PER_MINUTE = 7  # Conservative limit (Gemini free tier: 15 RPM)
 RETRY_ATTEMPTS = 3
 EXPONENTIAL_BACKOFF_BASE = 45  # Start with 45s wait on rate limit
+CONFIRM_BEFORE_START = True  # Set False for unattended runs (run_all.py)
 
 # Test credentials
 TEST_ADMIN = {
@@ -88,10 +94,13 @@ def make_request(endpoint, method="GET", data=None, headers=None, retry_count=0)
     try:
         url = f"{API_BASE}/{endpoint}"
         
+        request_start = time.perf_counter()
         if method == "GET":
             response = requests.get(url, headers=headers, timeout=45)
         elif method == "POST":
             response = requests.post(url, json=data, headers=headers, timeout=45)
+        observe_request(SUITE_NAME, endpoint, response.status_code, (time.perf_counter() - request_start) * 1000,
+                        response.headers.get('Server-Timing'))
         
         # Handle rate limit (429)
         if response.status_code == 429:
@@ -122,9 +131,11 @@ def make_request(endpoint, method="GET", data=None, headers=None, retry_count=0)
             return None
             
     except requests.exceptions.Timeout:
+        observe_request(SUITE_NAME, endpoint, 'timeout', None)
         print(f"\n⚠️  Timeout")
         return None
     except Exception as e:
+        observe_request(SUITE_NAME, endpoint, 'error', None)
         print(f"\n⚠️  Error: {e}")
         return None
     
@@ -274,7 +285,8 @@ def test_chatbot_performance(token):
     print(f"⏳ Delay per request: {DELAY_BETWEEN_REQUESTS}s")
     print(f"🔄 Retry attempts: {RETRY_ATTEMPTS}\n")
     
-    input("Press ENTER to start testing (this will take a while)...")
+    if CONFIRM_BEFORE_START:
+        input("Press ENTER to start testing (this will take a while)...")
     
     results = []
     response_times = []
@@ -367,6 +379,8 @@ def test_chatbot_performance(token):
     
     # Export results
     df.to_csv(f"{OUTPUT_DIR}/performance_results.csv", index=False)
+    append_samples('chatbot', df, endpoint="api/admin/analyze-data",
+                   latency_column='response_time_ms', success_column='understood')
     
     # Summary by category
     category_summary = df.groupby('category').agg({
@@ -387,11 +401,26 @@ def test_chatbot_performance(token):
         'nlur': nlur,
         'avg_response_time_ms': avg_time,
         'time_compliance': time_compliance,
-        'status': 'PASS' if (qra >= 85 and nlur >= 90 and avg_time <= 5000) else 'FAIL'
+        'status': 'PASS' if (qra >= 85 and nlur >= 90 and avg_time <= 5000) else 'FAIL',
+        'confidence_intervals': summary_intervals(
+            rates={
+                'qra': (helpful_count, total),
+                'nlur': (understood_count, total),
+                'time_compliance': (under_5s_count, total)
+            },
+            latencies={'chatbot_response': df['response_time_ms'].tolist()}
+        )
     }
     
     with open(f"{OUTPUT_DIR}/summary.json", 'w') as f:
-        json.dump(summary, f, indent=2)
+        json.dump(summary, f, indent=2, default=str)
+    record_run('chatbot', {
+        'qra': qra,
+        'nlur': nlur,
+        'avg_response_time_ms': avg_time,
+        'time_compliance': time_compliance,
+        **latency_metrics('chatbot_response', df['response_time_ms'].tolist())
+    }, config=config_snapshot(globals()), status=summary['status'])
     
     print(f"\n✅ Results saved to: {OUTPUT_DIR}/")
     
@@ -402,6 +431,7 @@ def test_chatbot_performance(token):
 # ============================================================================
 
 if __name__ == "__main__":
+    start_sinks()  # --dashboard / --metrics / --stall-probe
     print_header("CLICARE - CHATBOT PERFORMANCE TESTING")
     print("🎯 Tests: Response Quality, Speed, Understanding")
     print("🛡️  WITH AGGRESSIVE RATE LIMITING")
@@ -1,7 +1,7 @@
 """
 CliCare Objective 3 - Data Privacy Compliance Testing (50 TEST CASES)
 Tests chatbot privacy protection and AI response anonymization
-Run: python test3_privacy.py
+Run: python test3_privacy.py [--dashboard] [--metrics] [--stall-probe]
 """
 
 import requests
@@ -11,6 +11,10 @@ import time
 import re
 from datetime import datetime, timedelta
 import os
+from results_store import append_samples
+from run_history import record_run, config_snapshot, latency_metrics
+from confidence import summary_intervals
+from telemetry import observe_request, start_sinks
 
 # ============================================================================
 # CONFIGURATION
@@ -18,12 +22,14 @@ import os
 
 API_BASE = "http://localhost:5000"
 OUTPUT_DIR = "objective3_comprehensive_results/privacy_compliance"
+SUITE_NAME = 'privacy_compliance'  # label for live telemetry (--dashboard)
 
 # ⚠️ OPTIMIZED RATE LIMITING - Safe for 50 requests
 DELAY_BETWEEN_REQUESTS = 5  # ✅ REDUCED from 8s to 5s
 MAX_REQUESTS_PER_MINUTE = 10  # ✅ INCREASED from 7 to 10 (still under 15 limit)
 RETRY_ATTEMPTS = 3
 EXPONENTIAL_BACKOFF_BASE = 30  # ✅ REDUCED from 45s to 30s
+CONFIRM_BEFORE_START = True  # Set False for unattended runs (run_all.py)
 
 TEST_ADMIN = {
     "healthadminid": "ADMIN001",
@@ -75,10 +81,13 @@ def make_request(endpoint, method="GET", data=None, headers=None, retry_count=0)
     try:
         url = f"{API_BASE}/{endpoint}"
         
+        request_start = time.perf_counter()
         if method == "GET":
             response = requests.get(url, headers=headers, timeout=45)
         elif method == "POST":
             response = requests.post(url, json=data, headers=headers, timeout=45)
+        observe_request(SUITE_NAME, endpoint, response.status_code, (time.perf_counter() - request_start) * 1000,
+                        response.headers.get('Server-Timing'))
         
         if response.status_code == 429:
             if retry_count < RETRY_ATTEMPTS:
@@ -107,6 +116,7 @@ def make_request(endpoint, method="GET", data=None, headers=None, retry_count=0)
             return None
             
     except Exception as e:
+        observe_request(SUITE_NAME, endpoint, 'error', None)
         print(f"\n⚠️  Error: {e}")
         return None
 
@@ -322,7 +332,8 @@ def test_chatbot_privacy_compliance(token):
     print(f"\n🎯 TARGET: 100% PAVR (Zero PII Leakage)")
     print(f"📋 Compliance: RA 10173 + DOH AO 2020-0030\n")
     
-    input("Press ENTER to start privacy compliance testing...")
+    if CONFIRM_BEFORE_START:
+        input("Press ENTER to start privacy compliance testing...")
     
     results = []
     
@@ -333,6 +344,7 @@ def test_chatbot_privacy_compliance(token):
         smart_rate_limit()
         
         # Make AI request
+        start = time.time()
         ai_response = make_request(
             "api/admin/analyze-data",
             method="POST",
@@ -342,6 +354,7 @@ def test_chatbot_privacy_compliance(token):
             },
             headers=headers
         )
+        response_time = (time.time() - start) * 1000
         
         if ai_response is None:
             print(f"❌ No response")
@@ -354,7 +367,8 @@ def test_chatbot_privacy_compliance(token):
                 'properly_anonymized': False,
                 'leaked_items': 'N/A',
                 'compliance_status': 'Error',
-                'response_preview': ''
+                'response_preview': '',
+                'response_time_ms': response_time
             })
             continue
         
@@ -397,7 +411,8 @@ def test_chatbot_privacy_compliance(token):
             'properly_anonymized': properly_anonymized,
             'leaked_items': ', '.join(leaked_items) if leaked_items else 'None',
             'compliance_status': compliance_status,
-            'response_preview': response_text[:150]
+            'response_preview': response_text[:150],
+            'response_time_ms': response_time
         })
     
     # Calculate metrics
@@ -437,6 +452,8 @@ def test_chatbot_privacy_compliance(token):
     
     # Export results
     df.to_csv(f"{OUTPUT_DIR}/privacy_compliance_results.csv", index=False)
+    append_samples('privacy_compliance', df.assign(compliant=df['compliance_status'] == 'COMPLIANT'),
+                   endpoint="api/admin/analyze-data", latency_column='response_time_ms', success_column='compliant')
     
     type_summary = df.groupby('type').agg({
         'leaked_pii': 'sum',
@@ -465,11 +482,21 @@ def test_chatbot_privacy_compliance(token):
         'leaked_count': leaked_count,
         'status': 'PASS' if pavr == 100 else 'FAIL',
         'critical_incidents': leaked_count > 0,
-        'compliance': 'RA 10173 + DOH AO 2020-0030'
+        'compliance': 'RA 10173 + DOH AO 2020-0030',
+        'confidence_intervals': summary_intervals(
+            rates={'pavr': (compliant_count, total)},
+            latencies={'privacy_response': df['response_time_ms'].tolist()}
+        )
     }
     
     with open(f"{OUTPUT_DIR}/privacy_compliance_summary.json", 'w') as f:
-        json.dump(summary, f, indent=2)
+        json.dump(summary, f, indent=2, default=str)
+    record_run('privacy_compliance', {
+        'pavr': pavr,
+        'compliant_count': compliant_count,
+        'leaked_count': leaked_count,
+        **latency_metrics('privacy_response', df['response_time_ms'].tolist())
+    }, config=config_snapshot(globals()), status=summary['status'])
     
     print(f"\n✅ Results saved to: {OUTPUT_DIR}/")
     
@@ -480,6 +507,7 @@ def test_chatbot_privacy_compliance(token):
 # ============================================================================
 
 if __name__ == "__main__":
+    start_sinks()  # --dashboard / --metrics / --stall-probe
     print_header("CLICARE OBJECTIVE 3 - DATA PRIVACY COMPLIANCE TESTING")
     print("🎯 50+ Test Cases - AI Chatbot Privacy Protection")
     print("📋 Compliance: RA 10173 + DOH AO 2020-0030")
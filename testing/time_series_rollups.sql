@@ -0,0 +1,228 @@
+-- CliCare - Daily rollups for /api/admin/time-series-stats
+-- Run once in the Supabase SQL editor (or psql against the local stand-in).
+--
+-- admin_daily_rollup keeps one counter per (metric, bucket_date, window_date):
+--   bucket_date  the date the dashboard plots the row under
+--   window_date  the date the route filters on (registration_date,
+--                pre_registration.created_date, queue.created_time)
+-- Triggers keep it current; completed queue rows also record the bucket they
+-- were counted under in admin_rollup_completed, so the decrement always hits
+-- the same bucket as the increment. admin_time_series_stats(period) groups it by
+-- day / week / year in one query, so the route no longer downloads and
+-- buckets every raw row on each dashboard load.
+--
+-- The table and the write functions are private to the database owner (RLS on,
+-- no policies, EXECUTE revoked), so the API roles the server's key maps to can
+-- only call admin_time_series_stats, which reads the table as its owner.
+
+CREATE TABLE IF NOT EXISTS admin_daily_rollup (
+  metric       text    NOT NULL,   -- 'registrations' | 'appointments' | 'completed'
+  bucket_date  date    NOT NULL,
+  window_date  date    NOT NULL,
+  n            integer NOT NULL DEFAULT 0,
+  PRIMARY KEY (metric, window_date, bucket_date)
+);
+
+-- One row per counted completed queue row (the id columns take queue's column types)
+CREATE TABLE IF NOT EXISTS admin_rollup_completed AS
+  SELECT queue_id, visit_id, NULL::date AS bucket_date, NULL::date AS window_date FROM queue WHERE false;
+CREATE UNIQUE INDEX IF NOT EXISTS admin_rollup_completed_queue_id ON admin_rollup_completed (queue_id);
+CREATE INDEX IF NOT EXISTS admin_rollup_completed_visit_id ON admin_rollup_completed (visit_id);
+
+ALTER TABLE admin_daily_rollup ENABLE ROW LEVEL SECURITY;
+ALTER TABLE admin_rollup_completed ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON admin_daily_rollup, admin_rollup_completed FROM public, anon, authenticated;
+
+CREATE OR REPLACE FUNCTION bump_admin_rollup(p_metric text, p_bucket date, p_window date, p_delta integer)
+RETURNS void LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+  INSERT INTO admin_daily_rollup (metric, bucket_date, window_date, n)
+  SELECT p_metric, p_bucket, p_window, p_delta
+  WHERE p_bucket IS NOT NULL AND p_window IS NOT NULL
+  ON CONFLICT (metric, window_date, bucket_date) DO UPDATE SET n = admin_daily_rollup.n + EXCLUDED.n;
+$$;
+
+-- ----------------------------------------------------------------------------
+-- registrations: outpatient rows by registration_date
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION rollup_outpatient() RETURNS trigger LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM bump_admin_rollup('registrations', OLD.registration_date, OLD.registration_date, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM bump_admin_rollup('registrations', NEW.registration_date, NEW.registration_date, 1);
+  END IF;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS outpatient_admin_rollup ON outpatient;
+CREATE TRIGGER outpatient_admin_rollup
+  AFTER INSERT OR DELETE OR UPDATE OF registration_date ON outpatient
+  FOR EACH ROW EXECUTE FUNCTION rollup_outpatient();
+
+-- ----------------------------------------------------------------------------
+-- appointments: non-expired pre_registration rows, plotted on
+-- scheduled_date / preferred_date / created_date, filtered on created_date
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION rollup_pre_registration() RETURNS trigger LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status <> 'expired' THEN
+    PERFORM bump_admin_rollup('appointments',
+      COALESCE(OLD.scheduled_date, OLD.preferred_date, OLD.created_date), OLD.created_date, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status <> 'expired' THEN
+    PERFORM bump_admin_rollup('appointments',
+      COALESCE(NEW.scheduled_date, NEW.preferred_date, NEW.created_date), NEW.created_date, 1);
+  END IF;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS pre_registration_admin_rollup ON pre_registration;
+CREATE TRIGGER pre_registration_admin_rollup
+  AFTER INSERT OR DELETE OR UPDATE OF status, scheduled_date, preferred_date, created_date ON pre_registration
+  FOR EACH ROW EXECUTE FUNCTION rollup_pre_registration();
+
+-- ----------------------------------------------------------------------------
+-- completed: completed queue rows that have a visit row (the route's
+-- visit!inner join), plotted on visit_date (created_time when it is empty),
+-- filtered on created_time
+-- ----------------------------------------------------------------------------
+-- Takes back whatever the queue row was counted as, then counts its current state
+CREATE OR REPLACE FUNCTION sync_completed_rollup(p_queue_id anyelement) RETURNS void LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+  r record;
+BEGIN
+  FOR r IN DELETE FROM admin_rollup_completed WHERE queue_id = p_queue_id
+           RETURNING bucket_date, window_date LOOP
+    PERFORM bump_admin_rollup('completed', r.bucket_date, r.window_date, -1);
+  END LOOP;
+  FOR r IN INSERT INTO admin_rollup_completed (queue_id, visit_id, bucket_date, window_date)
+           SELECT q.queue_id, q.visit_id, COALESCE(v.visit_date, q.created_time::date), q.created_time::date
+           FROM queue q JOIN visit v ON v.visit_id = q.visit_id
+           WHERE q.queue_id = p_queue_id AND q.status = 'completed' AND q.created_time IS NOT NULL
+           RETURNING bucket_date, window_date LOOP
+    PERFORM bump_admin_rollup('completed', r.bucket_date, r.window_date, 1);
+  END LOOP;
+END $$;
+
+CREATE OR REPLACE FUNCTION rollup_queue() RETURNS trigger LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    IF OLD.status = 'completed' THEN
+      PERFORM sync_completed_rollup(OLD.queue_id);
+    END IF;
+  ELSIF NEW.status = 'completed' OR (TG_OP = 'UPDATE' AND OLD.status = 'completed') THEN
+    PERFORM sync_completed_rollup(NEW.queue_id);
+  END IF;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS queue_admin_rollup ON queue;
+CREATE TRIGGER queue_admin_rollup
+  AFTER INSERT OR DELETE OR UPDATE OF status, visit_id, created_time ON queue
+  FOR EACH ROW EXECUTE FUNCTION rollup_queue();
+
+-- A removed visit (e.g. by cleanupUnusedQueueAndVisits) drops its queue rows from
+-- the join; a changed visit_date moves them to another bucket
+CREATE OR REPLACE FUNCTION rollup_visit() RETURNS trigger LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+  q record;
+BEGIN
+  FOR q IN SELECT queue_id FROM admin_rollup_completed WHERE visit_id = OLD.visit_id LOOP
+    PERFORM sync_completed_rollup(q.queue_id);
+  END LOOP;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS visit_admin_rollup ON visit;
+CREATE TRIGGER visit_admin_rollup
+  AFTER DELETE OR UPDATE OF visit_date ON visit
+  FOR EACH ROW EXECUTE FUNCTION rollup_visit();
+
+-- ----------------------------------------------------------------------------
+-- Backfill (idempotent: rebuilds the table from the source rows)
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION rebuild_admin_daily_rollup() RETURNS void LANGUAGE sql AS $$
+  TRUNCATE admin_daily_rollup, admin_rollup_completed;
+
+  INSERT INTO admin_daily_rollup (metric, bucket_date, window_date, n)
+  SELECT 'registrations', registration_date, registration_date, count(*)
+  FROM outpatient
+  WHERE registration_date IS NOT NULL
+  GROUP BY registration_date;
+
+  INSERT INTO admin_daily_rollup (metric, bucket_date, window_date, n)
+  SELECT 'appointments', COALESCE(scheduled_date, preferred_date, created_date), created_date, count(*)
+  FROM pre_registration
+  WHERE status <> 'expired' AND created_date IS NOT NULL
+  GROUP BY 2, 3;
+
+  INSERT INTO admin_rollup_completed (queue_id, visit_id, bucket_date, window_date)
+  SELECT q.queue_id, q.visit_id, COALESCE(v.visit_date, q.created_time::date), q.created_time::date
+  FROM queue q JOIN visit v ON v.visit_id = q.visit_id
+  WHERE q.status = 'completed' AND q.created_time IS NOT NULL;
+
+  INSERT INTO admin_daily_rollup (metric, bucket_date, window_date, n)
+  SELECT 'completed', bucket_date, window_date, count(*)
+  FROM admin_rollup_completed
+  GROUP BY bucket_date, window_date;
+$$;
+
+SELECT rebuild_admin_daily_rollup();
+
+-- ----------------------------------------------------------------------------
+-- RPC used by the route: same windows and buckets as the JavaScript version
+--   daily   last 30 days, one row per day
+--   weekly  last 12 weeks, weeks starting on Sunday
+--   yearly  last 5 years
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION admin_time_series_stats(p_period text)
+RETURNS TABLE (bucket_date date, registrations integer, appointments integer, completed integer)
+LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public AS $$
+  WITH params AS (
+    SELECT (now() AT TIME ZONE 'UTC')::date AS today
+  ),
+  buckets AS (
+    SELECT CASE p_period
+             WHEN 'daily'  THEN today - g
+             WHEN 'weekly' THEN (today - g * 7) - extract(dow FROM today - g * 7)::integer
+             ELSE make_date(extract(year FROM today)::integer - g, 1, 1)
+           END AS bucket_date
+    FROM params, generate_series(0, CASE p_period WHEN 'daily' THEN 29 WHEN 'weekly' THEN 11 ELSE 4 END) AS g
+  ),
+  rolled AS (
+    SELECT CASE p_period
+             WHEN 'daily'  THEN r.bucket_date
+             WHEN 'weekly' THEN r.bucket_date - extract(dow FROM r.bucket_date)::integer
+             ELSE date_trunc('year', r.bucket_date)::date
+           END AS bucket_date,
+           r.metric,
+           sum(r.n)::integer AS n
+    FROM admin_daily_rollup r, params
+    WHERE r.window_date >= params.today - CASE p_period WHEN 'daily' THEN 30 WHEN 'weekly' THEN 84 ELSE 5 * 365 END
+    GROUP BY 1, 2
+  )
+  SELECT b.bucket_date,
+         COALESCE(sum(r.n) FILTER (WHERE r.metric = 'registrations'), 0)::integer,
+         COALESCE(sum(r.n) FILTER (WHERE r.metric = 'appointments'), 0)::integer,
+         COALESCE(sum(r.n) FILTER (WHERE r.metric = 'completed'), 0)::integer
+  FROM buckets b
+  LEFT JOIN rolled r ON r.bucket_date = b.bucket_date
+  GROUP BY b.bucket_date
+  ORDER BY b.bucket_date;
+$$;
+
+-- ----------------------------------------------------------------------------
+-- Privileges: only the read RPC is callable through the API
+-- ----------------------------------------------------------------------------
+REVOKE EXECUTE ON FUNCTION bump_admin_rollup(text, date, date, integer), rebuild_admin_daily_rollup(),
+  sync_completed_rollup(anyelement), rollup_outpatient(), rollup_pre_registration(), rollup_queue(),
+  rollup_visit()
+  FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION admin_time_series_stats(text) FROM public;
+GRANT EXECUTE ON FUNCTION admin_time_series_stats(text) TO anon, authenticated;
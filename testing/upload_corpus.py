@@ -0,0 +1,131 @@
+"""
+CliCare Testing - Synthetic Upload Corpus Cache
+Synthetic upload files kept on disk, keyed by (format, size, seed), so upload
+runs stream them from the cache (upload_stream.DiskFile, a chunk at a time)
+instead of regenerating PIL images and padded PDFs on every iteration.
+
+Each file is the format's real header (a small JPEG / PNG encoded with a
+seed-dependent colour, or a PDF header) followed by a sparse hole up to the
+requested size and the format's trailer. The hole reads back as zeros and
+takes no disk blocks on filesystems with sparse-file support, so a corpus of
+hundreds of multi-MB files costs a few KB of disk. Entries are written to a
+temporary name and renamed into place, so an interrupted or concurrent fill
+never leaves a truncated entry behind.
+
+  python upload_corpus.py --warm      # fill the cache for test2_outpatient's scenarios
+  python upload_corpus.py --stats     # apparent vs allocated size
+  python upload_corpus.py --clear
+"""
+
+import argparse
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CORPUS_DIR = os.environ.get('CLICARE_UPLOAD_CORPUS', ".upload_corpus")
+CORPUS_WORKERS = min(8, os.cpu_count() or 1)
+
+# ============================================================================
+# GENERATION
+# ============================================================================
+
+def _extension(filename):
+    return os.path.splitext(filename)[1].lower().lstrip('.') or 'bin'
+
+def corpus_key(filename, file_size_mb, seed=0):
+    """Cache file name for (format, size, seed)"""
+    return f"{_extension(filename)}_{int(file_size_mb * 1024 * 1024)}_{seed}.{_extension(filename)}"
+
+def _image_header(image_format, seed):
+    img_bytes = BytesIO()
+    color = ((seed * 97) % 256, (seed * 57 + 80) % 256, (seed * 23 + 160) % 256)
+    Image.new('RGB', (100, 100), color=color).save(img_bytes, format=image_format)
+    return img_bytes.getvalue()
+
+def _layout(extension, file_size, seed):
+    """(head, tail) of a corpus file; the rest is a hole"""
+    if extension == 'pdf':
+        return b'%PDF-1.4\n', b'\n%%EOF'
+    if extension in ('jpg', 'jpeg'):
+        return _image_header('JPEG', seed), b''
+    if extension == 'png':
+        return _image_header('PNG', seed), b''
+    return b'', b''
+
+def _write_entry(path, extension, file_size, seed):
+    head, tail = _layout(extension, file_size, seed)
+    size = max(file_size, len(head) + len(tail))
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(head)
+        if tail:
+            f.seek(size - len(tail))
+            f.write(tail)
+        else:
+            f.truncate(size)  # extends with a hole
+    os.replace(temp_path, path)
+
+def corpus_path(filename, file_size_mb, seed=0):
+    """Path of the cached file, generated on a miss"""
+    path = os.path.join(CORPUS_DIR, corpus_key(filename, file_size_mb, seed))
+    if not os.path.exists(path):
+        os.makedirs(CORPUS_DIR, exist_ok=True)
+        _write_entry(path, _extension(filename), int(file_size_mb * 1024 * 1024), seed)
+    return path
+
+def warm_corpus(specs, workers=CORPUS_WORKERS):
+    """Generate every missing (filename, size MB, seed) entry in parallel; returns how many were created"""
+    missing = {corpus_key(*spec): spec for spec in specs
+               if not os.path.exists(os.path.join(CORPUS_DIR, corpus_key(*spec)))}
+    if missing:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda spec: corpus_path(*spec), missing.values()))
+    return len(missing)
+
+def corpus_stats():
+    """(files, apparent MB, allocated MB) of the cache"""
+    files, apparent, allocated = 0, 0, 0
+    if os.path.isdir(CORPUS_DIR):
+        with os.scandir(CORPUS_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    files += 1
+                    apparent += stat.st_size
+                    # st_blocks is not available on Windows; count the file as fully allocated there
+                    allocated += getattr(stat, 'st_blocks', stat.st_size // 512) * 512
+    return files, apparent / (1024 * 1024), allocated / (1024 * 1024)
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the synthetic upload corpus cache")
+    parser.add_argument('--warm', action='store_true', help="Generate test2_outpatient's synthetic scenarios")
+    parser.add_argument('--stats', action='store_true')
+    parser.add_argument('--clear', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.clear:
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+        print(f"🧹 Removed {CORPUS_DIR}/")
+    if args.warm:
+        from test2_outpatient import corpus_specs
+        created = warm_corpus(corpus_specs())
+        print(f"✅ {created} corpus files generated in {CORPUS_DIR}/")
+    if args.stats or args.warm:
+        files, apparent, allocated = corpus_stats()
+        print(f"📦 {files} files, {apparent:.1f}MB apparent, {allocated:.2f}MB on disk")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+CliCare Testing - Streaming Multipart Uploads
+Builds multipart/form-data request bodies that are produced while the request
+is sent instead of being assembled in memory first:
+
+  SyntheticFile  synthetic lab-result content (PDF / JPEG / PNG header plus
+                 padding), generated a chunk at a time
+  DiskFile       a file on disk, read a chunk at a time
+
+MultipartStream is a file-like body with a known length, so requests sends a
+Content-Length header and reads the body in small blocks: memory per upload
+stays at about one chunk whatever the file size. client_rss_mb() reports the
+harness's own resident memory so upload runs can show the client is not the
+memory bottleneck; upload_dir_usage() and device_write_mb() measure what the
+server's upload directory took in.
+
+With rate_mbps / latency_s the body is shaped like a slow client: the first
+body byte waits latency_s and reads are paced so no more than rate_mbps has
+been handed to the socket at any point. The server really receives the bytes
+that slowly (to within the socket send buffer, a few hundred KB on loopback),
+so its upload handling is measured under slow-client conditions instead of
+adding a simulated delay to a loopback-speed request.
+
+    body = MultipartStream({'labRequestId': '1'},
+                           {'labResultFile': SyntheticFile('scan.jpg', 'image/jpeg', 4)})
+    requests.post(url, data=body, headers={'Content-Type': body.content_type})
+"""
+
+import mimetypes
+import os
+import sys
+import time
+import uuid
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CHUNK_SIZE = 64 * 1024
+_PADDING = b'X' * CHUNK_SIZE
+
+# ============================================================================
+# FILE SOURCES
+# ============================================================================
+
+@lru_cache(maxsize=None)
+def _image_bytes(image_format, color):
+    """A small encoded image, built once per format"""
+    img_bytes = BytesIO()
+    Image.new('RGB', (100, 100), color=color).save(img_bytes, format=image_format)
+    return img_bytes.getvalue()
+
+def synthetic_layout(filename, file_size):
+    """(head, padding bytes, tail) of a synthetic file of about `file_size` bytes"""
+    if filename.endswith('.pdf'):
+        return b'%PDF-1.4\n', max(0, file_size - 10), b'\n%%EOF'
+    if filename.endswith(('.jpg', '.jpeg')):
+        head = _image_bytes('JPEG', 'red')
+        return head, max(0, file_size - len(head)), b''
+    if filename.endswith('.png'):
+        head = _image_bytes('PNG', 'blue')
+        return head, max(0, file_size - len(head)), b''
+    return b'', file_size, b''
+
+class SyntheticFile:
+    """Synthetic upload content produced on the fly"""
+
+    def __init__(self, filename, mimetype, file_size_mb):
+        self.filename = filename
+        self.mimetype = mimetype
+        self._head, self._padding, self._tail = synthetic_layout(filename, int(file_size_mb * 1024 * 1024))
+        self.size = len(self._head) + self._padding + len(self._tail)
+
+    def chunks(self):
+        yield self._head
+        remaining = self._padding
+        while remaining > 0:
+            n = min(remaining, CHUNK_SIZE)
+            yield _PADDING if n == CHUNK_SIZE else _PADDING[:n]
+            remaining -= n
+        yield self._tail
+
+class DiskFile:
+    """A file on disk, streamed in chunks"""
+
+    def __init__(self, path, mimetype=None, filename=None):
+        self.path = path
+        self.filename = filename or os.path.basename(path)
+        self.mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.size = os.path.getsize(path)
+
+    def chunks(self):
+        # Plain reads rather than mmap: mapped pages count towards this process's RSS,
+        # which would make client_rss_mb() grow by the size of every file in flight
+        with open(self.path, 'rb') as fh:
+            for block in iter(lambda: fh.read(CHUNK_SIZE), b''):
+                yield block
+
+# ============================================================================
+# MULTIPART BODY
+# ============================================================================
+
+class MultipartStream:
+    """File-like multipart/form-data body; single use (build a new one per attempt)"""
+
+    def __init__(self, fields=None, files=None, boundary=None, rate_mbps=None, latency_s=0.0):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.bytes_read = 0
+        self.rate_bytes_per_s = rate_mbps * 1024 * 1024 if rate_mbps else None
+        self.latency_s = latency_s
+        self.started_at = None      # perf_counter when the first body byte was read
+        self.finished_at = None     # perf_counter when the last body byte was read
+
+        segments = []
+        for name, value in (fields or {}).items():
+            segments.append(self._part_header(name) + str(value).encode() + b'\r\n')
+        for name, source in (files or {}).items():
+            segments.append(self._part_header(name, source.filename, source.mimetype))
+            segments.append(source)
+            segments.append(b'\r\n')
+        segments.append(f"--{self.boundary}--\r\n".encode())
+
+        self._length = sum(len(s) if isinstance(s, bytes) else s.size for s in segments)
+        self._chunks = self._iter_chunks(segments)
+        self._buffer = b''
+        self._offset = 0
+
+    def _part_header(self, name, filename=None, mimetype=None):
+        disposition = f'form-data; name="{name}"'
+        if filename is None:
+            return f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+        return (f'--{self.boundary}\r\nContent-Disposition: {disposition}; filename="{filename}"\r\n'
+                f"Content-Type: {mimetype}\r\n\r\n").encode()
+
+    @staticmethod
+    def _iter_chunks(segments):
+        for segment in segments:
+            if isinstance(segment, bytes):
+                yield segment
+            else:
+                yield from segment.chunks()
+
+    def __len__(self):
+        return self._length
+
+    def achieved_mbps(self):
+        """Body throughput actually handed to the socket, in MB/s"""
+        if self.started_at is None or not self.bytes_read:
+            return None
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return self.bytes_read / (1024 * 1024) / elapsed if elapsed > 0 else None
+
+    def read(self, size=-1):
+        """Up to `size` bytes of the body (b'' at the end), paced when shaped"""
+        if self.started_at is None:
+            if self.latency_s:
+                time.sleep(self.latency_s)
+            self.started_at = time.perf_counter()
+
+        data = self._next_bytes(size)
+        if not data:
+            if self.finished_at is None:
+                self.finished_at = time.perf_counter()
+            return data
+
+        self.bytes_read += len(data)
+        if self.rate_bytes_per_s:
+            delay = self.started_at + self.bytes_read / self.rate_bytes_per_s - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def _next_bytes(self, size):
+        if size is None or size < 0:
+            rest = self._buffer[self._offset:] + b''.join(self._chunks)
+            self._buffer, self._offset = b'', 0
+            return rest
+
+        while self._offset >= len(self._buffer):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return b''
+            self._buffer, self._offset = chunk, 0
+
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+# ============================================================================
+# CLIENT MEMORY AND UPLOAD DIRECTORY
+# ============================================================================
+
+def client_rss_mb():
+    """(current, peak) resident memory of this process in MB; None where unavailable"""
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(status['VmRSS'].split()[0]) / 1024, int(status['VmHWM'].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        pass
+    if resource is None:
+        return None, None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB elsewhere
+    return None, peak_mb
+
+def upload_dir_usage(path):
+    """(files, MB) currently in an upload directory"""
+    files, size = 0, 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    files += 1
+                    size += entry.stat().st_size
+            except OSError:  # removed while scanning
+                pass
+    return files, size / (1024 * 1024)
+
+def device_write_mb(path):
+    """MB written so far to the block device holding `path` (Linux /proc/diskstats); None elsewhere"""
+    try:
+        device = os.stat(path).st_dev
+        with open('/proc/diskstats') as f:
+            for line in f:
+                fields = line.split()
+                if int(fields[0]) == os.major(device) and int(fields[1]) == os.minor(device):
+                    return int(fields[9]) * 512 / (1024 * 1024)  # sectors written
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    return None